@@ -0,0 +1,141 @@
+"""Contrôle d'admission : refuser tôt et à peu de frais plutôt que saturer le nœud.
+
+Chaque création de salle et chaque WebSocket de jeu passe par l'`AdmissionController`
+avant tout travail (allocation de salle, `websocket.accept()`). Les limites : nombre total
+de salles, nombre de connexions, cadence de création par client (seau à jetons) et budget
+mémoire (RSS du processus). Un refus indique un code HTTP et un délai de nouvel essai.
+"""
+import os
+import time
+from typing import Dict, NamedTuple, Optional
+
+from metrics import ADMISSION_REJECTIONS
+
+LOOPBACK = ("127.0.0.1", "::1", "localhost")
+
+
+class Rejection(NamedTuple):
+    status: int          # 429 (client trop rapide) ou 503 (nœud saturé)
+    reason: str
+    retry_after: int     # secondes
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(self.retry_after)}
+
+
+def client_key(host: Optional[str], forwarded_for: Optional[str]) -> str:
+    """Adresse du client ; derrière le routeur local, celle qu'il a transmise dans X-Forwarded-For"""
+    if forwarded_for and (host is None or host in LOOPBACK):
+        return forwarded_for.split(",")[0].strip()
+    return host or "unknown"
+
+
+def rss_bytes() -> int:
+    """Mémoire résidente du processus (Linux), 0 si indisponible"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated = now
+
+
+class AdmissionController:
+    def __init__(self, max_rooms: int = 1000, max_connections: int = 2000, create_per_minute: float = 30.0,
+                 create_burst: int = 10, memory_budget_mb: float = 0.0, retry_after: int = 10,
+                 max_clients: int = 10000):
+        self.max_rooms = max_rooms
+        self.max_connections = max_connections
+        self.rate = create_per_minute / 60.0
+        self.burst = max(1, create_burst)
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.retry_after = retry_after
+        self.max_clients = max_clients
+        self.connections = 0
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._rss = 0
+        self._rss_read = 0.0
+        self.rejected: Dict[str, int] = {}
+
+    def _reject(self, endpoint: str, status: int, reason: str, retry_after: int) -> Rejection:
+        ADMISSION_REJECTIONS.inc(1, endpoint, reason)
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        return Rejection(status, reason, max(1, retry_after))
+
+    def memory_used(self) -> int:
+        """RSS relue au plus deux fois par seconde (une lecture de /proc par requête serait inutile)"""
+        now = time.monotonic()
+        if now - self._rss_read > 0.5:
+            self._rss = rss_bytes()
+            self._rss_read = now
+        return self._rss
+
+    def _over_memory(self) -> bool:
+        return self.memory_budget > 0 and self.memory_used() > self.memory_budget
+
+    def _take_token(self, client: str) -> float:
+        """Consomme un jeton du client ; retourne 0 ou le délai (s) avant le prochain jeton"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            if len(self._buckets) >= self.max_clients:
+                self._prune(now)
+            bucket = self._buckets[client] = TokenBucket(self.burst, now)
+        else:
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        if bucket.tokens < 1.0:
+            return (1.0 - bucket.tokens) / self.rate
+        bucket.tokens -= 1.0
+        return 0.0
+
+    def _prune(self, now: float) -> None:
+        # Un seau redevenu plein est identique à un seau neuf : on peut l'oublier
+        full_after = self.burst / self.rate
+        stale = [client for client, bucket in self._buckets.items() if now - bucket.updated >= full_after]
+        for client in stale:
+            del self._buckets[client]
+        if len(self._buckets) >= self.max_clients:
+            self._buckets.clear()
+
+    def check_room(self, client: str, rooms: int) -> Optional[Rejection]:
+        """None si la création d'une salle est admise"""
+        if self.max_rooms > 0 and rooms >= self.max_rooms:
+            return self._reject("room", 503, "rooms", self.retry_after)
+        if self._over_memory():
+            return self._reject("room", 503, "memory", self.retry_after)
+        wait = self._take_token(client)
+        if wait > 0:
+            return self._reject("room", 429, "rate", int(wait) + 1)
+        return None
+
+    def check_connection(self) -> Optional[Rejection]:
+        """None si une nouvelle WebSocket de jeu est admise (elle doit ensuite être comptée)"""
+        if self.max_connections > 0 and self.connections >= self.max_connections:
+            return self._reject("websocket", 503, "connections", self.retry_after)
+        if self._over_memory():
+            return self._reject("websocket", 503, "memory", self.retry_after)
+        return None
+
+    def stats(self) -> Dict:
+        return {
+            "connections": self.connections,
+            "max_connections": self.max_connections,
+            "max_rooms": self.max_rooms,
+            "create_per_minute": round(self.rate * 60.0, 3),
+            "create_burst": self.burst,
+            "memory_budget_bytes": self.memory_budget,
+            "memory_used_bytes": self.memory_used(),
+            "tracked_clients": len(self._buckets),
+            "rejected": dict(self.rejected),
+        }
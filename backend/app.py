@@ -1,26 +1,104 @@
 from curses import echo
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, Response
 import json
 import asyncio
 import base64
-import numpy as np
-from PIL import Image, ImageFilter
 import random
 import os
+from contextlib import asynccontextmanager
 from typing import Dict, List
 import uuid
-import logging
+import weakref
+import math
+import sys
+import time
 from datetime import datetime
 
+from admission import AdmissionController, client_key, rss_bytes
+from assets import DISPLAY_SIZE, nearest_level
+from debuglog import (
+    DEBUG_AEROPORT, DEBUG_WEBSOCKET, DEBUG_IMAGE_PROCESSING,
+    console, debug_aeroport, debug_websocket, debug_image_processing, writer as log_writer,
+)
+from encoders import FORMAT_JPEG, AdaptiveQuality, mime_type, negotiate
+from frame_cache import FrameCache
+from heartbeat import Heartbeat
+from lobby import STATUSES, LobbyIndex
+from memory import SKIP_TYPES, AllocationTracer, deep_sizeof, task_summary, transport_buffer
+from metrics import (
+    BROADCAST_SECONDS, COMMAND_SECONDS, CONTENT_TYPE as METRICS_CONTENT_TYPE, WEBSOCKET_SEND_SECONDS,
+    command_label, registry as metrics_registry,
+)
+from pacing import CommandQueue, FramePacer
+from scheduler import Scheduler, Timer
+from sharding import ShardMembership
+from scenes import scene_catalog
+from spectators import SpectatorHub, parse_watch
+from ticks import RoomTicker, wants_ticks
+from variants import IMMUTABLE, VariantStore
+from snapshot import read_snapshot, write_snapshot
+from render import FrameRenderer, RenderExecutor
+from recorder import SessionRecorder
+from protocol import (
+    PROTOCOL_BINARY, FRAME_MOVE, FRAME_STATE, FORMAT_CODES,
+    negotiated_protocol, pack_frame, receive_command,
+)
+
 # Configuration des variables d'environnement
-DEBUG_MODE = os.getenv('DEBUG_MODE', 'false').lower() == 'true'
-LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 BACKEND_HOST = os.getenv('BACKEND_HOST', '0.0.0.0')
 BACKEND_PORT = int(os.getenv('BACKEND_PORT', '8000'))
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
 BACKEND_URL = os.getenv('BACKEND_URL', f'http://localhost:{BACKEND_PORT}')
+# Cache des frames encodées : budget mémoire (Mo) et pas de la grille de la loupe (px)
+FRAME_CACHE_MB = float(os.getenv('FRAME_CACHE_MB', '64'))
+FRAME_CACHE_GRID = int(os.getenv('FRAME_CACHE_GRID', '4'))
+# Rendu hors boucle d'événements : 'thread' | 'process' | 'inline', nombre de workers, rendus en vol par connexion
+RENDER_EXECUTOR = os.getenv('RENDER_EXECUTOR', 'thread').lower()
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', '0')) or None
+RENDER_MAX_INFLIGHT = int(os.getenv('RENDER_MAX_INFLIGHT', '2'))
+# Cadence maximale des frames de déplacement par connexion (0 = illimitée) et taille de la file de commandes
+FRAME_MAX_FPS = float(os.getenv('FRAME_MAX_FPS', '30'))
+COMMAND_QUEUE_MAX = int(os.getenv('COMMAND_QUEUE_MAX', '256'))
+# Adaptation de la qualité : plancher de qualité et temps d'envoi visé par frame (ms)
+FRAME_MIN_QUALITY = int(os.getenv('FRAME_MIN_QUALITY', '40'))
+FRAME_TARGET_SEND_MS = float(os.getenv('FRAME_TARGET_SEND_MS', '40'))
+# Diffusion aux salles : délai max par envoi (s) et échecs consécutifs avant éviction d'une connexion
+BROADCAST_SEND_TIMEOUT = float(os.getenv('BROADCAST_SEND_TIMEOUT', '2'))
+BROADCAST_MAX_FAILURES = int(os.getenv('BROADCAST_MAX_FAILURES', '3'))
+# Durée de l'alarme (s) et délai de grâce avant suppression d'une salle vide (s)
+ALARM_DURATION = int(os.getenv('ALARM_DURATION', '60'))
+ROOM_GRACE_SECONDS = float(os.getenv('ROOM_GRACE_SECONDS', '30'))
+# Instantanés des salles pour le redémarrage à chaud (chemin vide = désactivé) et période de sauvegarde (s)
+SNAPSHOT_PATH = os.getenv('SNAPSHOT_PATH', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'rooms.snapshot'))
+SNAPSHOT_INTERVAL = float(os.getenv('SNAPSHOT_INTERVAL', '15'))
+# Lobby : taille maximale d'une page de GET /lobby/rooms et messages en attente par abonné du flux
+LOBBY_PAGE_MAX = int(os.getenv('LOBBY_PAGE_MAX', '200'))
+LOBBY_QUEUE_MAX = int(os.getenv('LOBBY_QUEUE_MAX', '256'))
+
+SPECTATOR_MAX_PER_ROOM = int(os.getenv('SPECTATOR_MAX_PER_ROOM', '50'))
+SPECTATOR_MAX_FPS = float(os.getenv('SPECTATOR_MAX_FPS', '10'))
+SPECTATOR_SEND_TIMEOUT = float(os.getenv('SPECTATOR_SEND_TIMEOUT', '1'))
+SPECTATOR_QUEUE_MAX = int(os.getenv('SPECTATOR_QUEUE_MAX', '32'))
+
+MAX_ROOMS = int(os.getenv('MAX_ROOMS', '1000'))
+MAX_CONNECTIONS = int(os.getenv('MAX_CONNECTIONS', '2000'))
+ROOM_CREATE_PER_MINUTE = float(os.getenv('ROOM_CREATE_PER_MINUTE', '30'))
+ROOM_CREATE_BURST = int(os.getenv('ROOM_CREATE_BURST', '10'))
+MEMORY_BUDGET_MB = float(os.getenv('MEMORY_BUDGET_MB', '0'))
+ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', '10'))
+
+HEARTBEAT_INTERVAL = float(os.getenv('HEARTBEAT_INTERVAL', '15'))
+HEARTBEAT_TIMEOUT = float(os.getenv('HEARTBEAT_TIMEOUT', '45'))
+
+RECORD_DIR = os.getenv('RECORD_DIR', '')
+RECORD_FLUSH_INTERVAL = float(os.getenv('RECORD_FLUSH_INTERVAL', '1'))
+# Boucle de salle à cadence fixe (Hz) pour les clients ?sync=tick ; 0 = désactivée
+ROOM_TICK_RATE = float(os.getenv('ROOM_TICK_RATE', '0'))
+# Profondeur de pile de tracemalloc (0 = désactivé) pour /memory/tracemalloc
+MEMORY_TRACEMALLOC = int(os.getenv('MEMORY_TRACEMALLOC', '0'))
 
 app = FastAPI()
 
@@ -45,41 +123,39 @@ app.mount(
 )
 
 
-if DEBUG_MODE:
-    logging.basicConfig(
-        level=getattr(logging, LOG_LEVEL.upper()),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler('logs/backend_debug.log'),
-            logging.StreamHandler()
-        ]
-    )
-    logger = logging.getLogger(__name__)
-
-    def debug_log(category, message, data=None):
-        timestamp = datetime.now().isoformat()
-        log_message = f"[{timestamp}] [BACKEND-{category}] {message}"
-        if data:
-            logger.info(f"{log_message} | Data: {json.dumps(data, default=str)}")
-        else:
-            logger.info(log_message)
-
-    def debug_aeroport(message, data=None): debug_log('AEROPORT', message, data)
-    def debug_websocket(message, data=None): debug_log('WEBSOCKET', message, data)
-    def debug_game_embed(message, data=None): debug_log('GAME-EMBED', message, data)
-    def debug_image_processing(message, data=None): debug_log('IMAGE-PROCESSING', message, data)
-else:
-    def debug_aeroport(message, data=None): pass
-    def debug_websocket(message, data=None): pass
-    def debug_game_embed(message, data=None): pass
-    def debug_image_processing(message, data=None): pass
+# Variantes redimensionnées des images statiques (/variants/...)
+variant_store = VariantStore()
+DESKTOP_WALLPAPER = "os-x-mountain-lion-3840x2160-24066.jpg"
 
 game_rooms: Dict[str, Dict] = {}
-room_deletion_tasks = {}
+room_deletion_tasks = {}  # room_id -> échéance de suppression (Timer de l'ordonnanceur)
+# Appartenance des salles à ce worker (lancement multi-processus via launcher.py)
+shard = ShardMembership.from_env()
+# Échéances de toutes les salles (alarmes, suppression des salles vides) : une seule tâche de fond
+scheduler = Scheduler()
+frame_cache = FrameCache(max_bytes=int(FRAME_CACHE_MB * 1024 * 1024), grid=FRAME_CACHE_GRID)
+render_executor = RenderExecutor(RENDER_EXECUTOR, RENDER_WORKERS)
+# Salles publiques indexées par état, tenues à jour à chaque changement (GET /rooms, /lobby/*)
+lobby = LobbyIndex(LOBBY_QUEUE_MAX)
+# Battements de cœur des WebSockets de jeu ouvertes (RTT par connexion)
+heartbeats = set()
+# Fermetures de connexions évincées en cours (gardées référencées jusqu'à leur fin)
+closing_tasks = set()
+# Files de commandes des joueurs connectés (comptées dans /memory/stats)
+command_queues = weakref.WeakSet()
+# Traces d'allocation (MEMORY_TRACEMALLOC) : démarrées le plus tôt possible pour tout voir
+allocation_tracer = AllocationTracer(MEMORY_TRACEMALLOC)
+allocation_tracer.start()
+# Journal des commandes reçues (RECORD_DIR), ouvert au démarrage
+recorder = None
+admission = AdmissionController(MAX_ROOMS, MAX_CONNECTIONS, ROOM_CREATE_PER_MINUTE, ROOM_CREATE_BURST,
+                                MEMORY_BUDGET_MB, ADMISSION_RETRY_AFTER)
 
 class GameRoom:
-    def __init__(self, room_id: str, is_private: bool = False, solo: bool = False, game_type: str = "drone"):
+    def __init__(self, room_id: str, is_private: bool = False, solo: bool = False, game_type: str = "drone",
+                 scene_id: str = None):
         self.room_id = room_id
+        self.scene_id = scene_id or scene_catalog.default
         self.players = {}
         self.connections = []
         self.can_see_drone = {} 
@@ -108,268 +184,287 @@ class GameRoom:
         # État d'alarme persistant par salle
         self.alarm_state = {
             "active": False,
-            "remaining": 60,
+            "remaining": ALARM_DURATION,
             "start_time": None,
             "timer_task": None
         }
+        # Échecs d'envoi consécutifs par connexion et temps de diffusion des messages
+        self.send_failures = {}
+        self.broadcast_stats = {"count": 0, "evictions": 0, "last_ms": 0.0, "max_ms": 0.0, "total_ms": 0.0}
+        # Spectateurs : reçoivent les frames déjà encodées des joueurs, sans rendu supplémentaire
+        self.spectators = SpectatorHub(room_id, SPECTATOR_MAX_PER_ROOM, SPECTATOR_MAX_FPS,
+                                       SPECTATOR_SEND_TIMEOUT, SPECTATOR_QUEUE_MAX)
+        # Clients ?sync=tick : état diffusé par deltas, une fois par tick
+        self.ticker = RoomTicker(self, ROOM_TICK_RATE, BROADCAST_SEND_TIMEOUT, BROADCAST_MAX_FAILURES,
+                                 on_frame=share_frame) if ROOM_TICK_RATE > 0 else None
         self.images = self.load_images()   
     
     def load_images(self):
-        """Charge les images de base"""
-        current_dir = os.path.dirname(os.path.dirname(__file__))
-        p_base = os.path.join(current_dir, "images", "sky.png")
-        p_nvg = os.path.join(current_dir, "images", "sky_night_vision.png")
-        p_therm = os.path.join(current_dir, "images", "sky_thermal.png")
-        p_therm_nodrone = os.path.join(current_dir, "images", "sky_non_dron_thermal.png")
-        
-        debug_image_processing("Loading images from directory", {
-            "current_dir": current_dir,
-            "base_exists": os.path.exists(p_base),
-            "nvg_exists": os.path.exists(p_nvg),
-            "thermal_exists": os.path.exists(p_therm),
-            "thermal_nodrone_exists": os.path.exists(p_therm_nodrone)
-        })
-        
-        print(f"Chargement des images depuis: {current_dir}")
-        print(f"Base: {p_base} - Existe: {os.path.exists(p_base)}")
-        print(f"NVG: {p_nvg} - Existe: {os.path.exists(p_nvg)}")
-        print(f"Thermal: {p_therm} - Existe: {os.path.exists(p_therm)}")
-        print(f"Thermal (no-drone): {p_therm_nodrone} - Existe: {os.path.exists(p_therm_nodrone)}")
-        
-        base = np.asarray(Image.open(p_base).convert("RGB"))
-        nvg = np.asarray(Image.open(p_nvg).convert("RGB"))
-        therm = np.asarray(Image.open(p_therm).convert("RGB"))
-        # Image thermique officielle SANS DRONE fournie par l'utilisateur
-        therm_nodrone = np.asarray(Image.open(p_therm_nodrone).convert("RGB"))
-        
-        # S'assurer que toutes les images ont la même taille
-        if nvg.shape != base.shape:
-            nvg = np.resize(nvg, base.shape)
-        if therm.shape != base.shape:
-            therm = np.resize(therm, base.shape)
-        if therm_nodrone.shape != base.shape:
-            therm_nodrone = np.resize(therm_nodrone, base.shape)
-        
-        print(f"Images chargées - Base: {base.shape}, NVG: {nvg.shape}, Thermal: {therm.shape}")
-
-        debug_image_processing("Images loaded successfully", {
-            "base_shape": base.shape,
-            "nvg_shape": nvg.shape,
-            "thermal_shape": therm.shape,
-            "thermal_nodrone_shape": therm_nodrone.shape
-        })
-
-        target_size = (512, 512)
-        base_small = np.asarray(Image.fromarray(base.astype('uint8')).resize(target_size, Image.Resampling.LANCZOS))
-        nvg_small = np.asarray(Image.fromarray(nvg.astype('uint8')).resize(target_size, Image.Resampling.LANCZOS))
-        therm_small = np.asarray(Image.fromarray(therm.astype('uint8')).resize(target_size, Image.Resampling.LANCZOS))
-        therm_small_nodrone = np.asarray(Image.fromarray(therm_nodrone.astype('uint8')).resize(target_size, Image.Resampling.LANCZOS))
-        
-        debug_image_processing("Images resized to 512x512", {
-            "target_size": target_size,
-            "base_small_shape": base_small.shape,
-            "nvg_small_shape": nvg_small.shape,
-            "therm_small_shape": therm_small.shape,
-            "therm_small_nodrone_shape": therm_small_nodrone.shape
-        })
+        """Retourne les calques de la scène de la salle, partagés par toutes ses salles (lecture seule).
+        La salle garde une référence sur la scène jusqu'à sa suppression (release_scene)
+        """
+        # Référence prise avant la lecture : une scène référencée n'est jamais évincée
+        scene_catalog.acquire(self.scene_id)
+        try:
+            images = scene_catalog.images(self.scene_id)
+        except Exception:
+            scene_catalog.release(self.scene_id)
+            raise
+        if DEBUG_IMAGE_PROCESSING:
+            debug_image_processing("Shared scene images attached to room", {
+                "room_id": self.room_id,
+                "scene_id": self.scene_id,
+                "layers": len(images)
+            })
+        return images
 
-        return {
-            "base": base,
-            "nvg": nvg,
-            "thermal": therm,
-            "base_small": base_small,
-            "nvg_small": nvg_small,
-            "thermal_small": therm_small,
-            "thermal_nodrone": therm_nodrone,
-            "thermal_small_nodrone": therm_small_nodrone,
-        }
+    def release_scene(self):
+        """La salle est supprimée : sa scène peut être évincée si plus aucune salle ne l'utilise"""
+        self.images = None
+        scene_catalog.release(self.scene_id)
     
-    def get_image_data(self, player_id, mode):
-        """Retourne l'image encodée en base64 (512x512) avec superposition dans le foyer.
-        Les coordonnées (x,y) sont attendues dans l'espace 512x512 pour coller au rendu à l'écran.
+    def frame_key(self, player_id, mode, size: int = DISPLAY_SIZE):
+        """Clé de cache d'une frame : (scène, mode, calque visible dans la loupe, niveau de pyramide,
+        position de la loupe convertie dans ce niveau et alignée sur la grille)
         """
-        player = self.game_state[f"player{player_id}"]
-        pos = player["position"]
-
-        debug_image_processing("Generating image data", {
-            "player_id": player_id,
-            "mode": mode,
-            "position": pos,
-            "can_see_drone": self.can_see_drone.get(player_id, True),
-            "solo": getattr(self, 'solo', False)
-        })
-
-        img = self.images["base_small"].copy()
-
-        overlay_img = None
         if mode == "NVG":
-            overlay_img = self.images["nvg_small"].copy()
-            debug_image_processing("Using NVG overlay", {"player_id": player_id})
+            layer = "nvg_small"
         elif mode == "THERMAL":
-            if getattr(self, 'solo', False):
-                # Solo: toujours l'image thermique avec drone, pas de version sans drone
-                overlay_img = self.images["thermal_small"].copy()
-                debug_image_processing("Using thermal overlay (solo mode)", {"player_id": player_id})
+            # Solo: toujours l'image thermique avec drone, pas de version sans drone
+            if getattr(self, 'solo', False) or self.can_see_drone.get(player_id, True):
+                layer = "thermal_small"
             else:
-                can_see = self.can_see_drone.get(player_id, True)
-                overlay_img = self.images["thermal_small"].copy() if can_see else self.images["thermal_small_nodrone"].copy()
-                debug_image_processing("Using thermal overlay (multiplayer)", {
-                    "player_id": player_id,
-                    "can_see_drone": can_see,
-                    "overlay_type": "with_drone" if can_see else "without_drone"
-                })
+                layer = "thermal_small_nodrone"
+        else:
+            return (self.scene_id, mode, None, size, None, None)
+        pos = self.game_state[f"player{player_id}"]["position"]
+        scale = size / DISPLAY_SIZE
+        return (self.scene_id, mode, layer, size,
+                frame_cache.snap(pos["x"] * scale), frame_cache.snap(pos["y"] * scale))
 
-        if overlay_img is not None:
-            lens_size = 60
-            x0 = max(0, int(pos["x"] - lens_size / 2))
-            y0 = max(0, int(pos["y"] - lens_size / 2))
-            x1 = min(img.shape[1], x0 + lens_size)
-            y1 = min(img.shape[0], y0 + lens_size)
-            img[y0:y1, x0:x1] = overlay_img[y0:y1, x0:x1]
-            
-            debug_image_processing("Overlay applied", {
-                "player_id": player_id,
-                "lens_size": lens_size,
-                "overlay_region": {"x0": x0, "y0": y0, "x1": x1, "y1": y1}
-            })
+    def _to_data_url(self, jpeg_bytes, fmt: str = FORMAT_JPEG):
+        img_str = base64.b64encode(jpeg_bytes).decode()
+        return f"data:{mime_type(fmt)};base64,{img_str}"
 
-        return self._encode_image(img)
+    def register_click(self, player_id, x, y) -> bool:
+        """Clic en coordonnées de référence (512) : vrai, et un point marqué, si le drone est détecté"""
+        if not self.check_drone_detection(player_id, x, y):
+            return False
+        self.game_state[f"player{player_id}"]["score"] += 1
+        return True
 
-    def _encode_image(self, img_np):
-        import io
-        pil_img = Image.fromarray(img_np.astype('uint8'))
-        buffer = io.BytesIO()
-        pil_img.save(buffer, format='JPEG', quality=85, optimize=True)
-        img_str = base64.b64encode(buffer.getvalue()).decode()
-        return f"data:image/jpeg;base64,{img_str}"
-    
-    def is_drone_pixel(self, px):
-        """Heuristique de pixels chauds (thermique) - détection du triangle jaune - IDENTIQUE à main.py"""
-        r, g, b = px.astype(np.float32) / 255.0
-        # Détection plus sensible pour les pixels jaunes/oranges du drone
-        bright = (r + g + b) / 3.0 > 0.4  # Seuil plus bas
-        # Détection des couleurs chaudes (jaune/orange/rouge)
-        warm = (r > 0.5) and (g > 0.3) and (b < 0.6) and (r >= g * 0.8)
-        # Détection spécifique du jaune/orange
-        yellow_orange = (r > 0.6) and (g > 0.4) and (b < 0.4)
-        return bright and (warm or yellow_orange)
-    
     def check_drone_detection(self, player_id, x, y):
         """Vérifie si le drone est détecté à la position donnée - IDENTIQUE à main.py"""
-        debug_aeroport("Drone detection check started", {
-            "player_id": player_id,
-            "click_position": {"x": x, "y": y},
-            "player_mode": self.game_state[f"player{player_id}"]["mode"],
-            "can_see_drone": self.can_see_drone.get(player_id, True)
-        })
-        
-        if self.game_state[f"player{player_id}"]["mode"] != "THERMAL":
-            debug_aeroport("Drone detection failed - not in thermal mode", {
+        if DEBUG_AEROPORT:
+            debug_aeroport("Drone detection check started", {
                 "player_id": player_id,
-                "current_mode": self.game_state[f"player{player_id}"]["mode"]
+                "click_position": {"x": x, "y": y},
+                "player_mode": self.game_state[f"player{player_id}"]["mode"],
+                "can_see_drone": self.can_see_drone.get(player_id, True)
             })
+        
+        if self.game_state[f"player{player_id}"]["mode"] != "THERMAL":
+            if DEBUG_AEROPORT:
+                debug_aeroport("Drone detection failed - not in thermal mode", {
+                    "player_id": player_id,
+                    "current_mode": self.game_state[f"player{player_id}"]["mode"]
+                })
             return False
         # Si ce joueur ne peut pas voir le drone, il ne peut pas le détecter
         if not self.can_see_drone.get(player_id, True):
-            debug_aeroport("Drone detection failed - player cannot see drone", {
-                "player_id": player_id,
-                "can_see_drone": self.can_see_drone.get(player_id, True)
-            })
+            if DEBUG_AEROPORT:
+                debug_aeroport("Drone detection failed - player cannot see drone", {
+                    "player_id": player_id,
+                    "can_see_drone": self.can_see_drone.get(player_id, True)
+                })
             return False
             
-        # Les clics viennent de l'affichage 512x512 → convertir en coordonnées de l'image d'origine
-        therm = self.images["thermal"]
-        therm_small = self.images["thermal_small"]
-        sx = float(therm.shape[1]) / float(therm_small.shape[1])
-        sy = float(therm.shape[0]) / float(therm_small.shape[0])
-
-        xb = int(round(float(x) * sx))
-        yb = int(round(float(y) * sy))
-
-        k = 6
-        y0 = max(0, int(yb - k))
-        y1 = min(therm.shape[0], int(yb + k + 1))
-        x0 = max(0, int(xb - k))
-        x1 = min(therm.shape[1], int(xb + k + 1))
-        
-        region = therm[y0:y1, x0:x1, :]
-        matches = sum(self.is_drone_pixel(region[i, j]) for i in range(region.shape[0]) for j in range(region.shape[1]))
-        
-        debug_aeroport("Drone detection analysis", {
-            "player_id": player_id,
-            "click_position_512": {"x": x, "y": y},
-            "click_position_base": {"x": xb, "y": yb},
-            "scale_factors": {"sx": sx, "sy": sy},
-            "search_region": {"x0": x0, "y0": y0, "x1": x1, "y1": y1},
-            "matches_found": matches,
-            "threshold": 5
-        })
+        # Les clics viennent de l'affichage 512x512 → convertir en coordonnées de l'image d'origine.
+        # Le masque des pixels chauds (assets.drone_pixel_mask) est précalculé : le comptage est une somme de rectangle.
+        detector = scene_catalog.detector(self.scene_id, "thermal")
+        matches = detector.count(x, y)
         
-        print(f"Debug: Clic à ({x}, {y}) → ({xb}, {yb}) base, matches trouvés: {matches}")
-        if matches >= 5:
-            print("Drone détecté !")
-            debug_aeroport("Drone detection successful", {
+        if DEBUG_AEROPORT:
+            xb, yb = (int(v) for v in detector.to_base(x, y))
+            k = detector.radius
+            debug_aeroport("Drone detection analysis", {
                 "player_id": player_id,
-                "matches": matches,
-                "position": {"x": x, "y": y}
+                "click_position_512": {"x": x, "y": y},
+                "click_position_base": {"x": xb, "y": yb},
+                "scale_factors": {"sx": detector.sx, "sy": detector.sy},
+                "search_region": {
+                    "x0": max(0, xb - k), "y0": max(0, yb - k),
+                    "x1": min(detector.width, xb + k + 1), "y1": min(detector.height, yb + k + 1)
+                },
+                "matches_found": matches,
+                "threshold": detector.threshold
             })
+        
+        if matches >= detector.threshold:
+            if DEBUG_AEROPORT:
+                debug_aeroport("Drone detection successful", {
+                    "player_id": player_id,
+                    "matches": matches,
+                    "position": {"x": x, "y": y}
+                })
             return True
         else:
-            print(f"Pas assez de matches ({matches} < 5)")
-            debug_aeroport("Drone detection failed - insufficient matches", {
-                "player_id": player_id,
-                "matches": matches,
-                "required": 5
-            })
+            if DEBUG_AEROPORT:
+                debug_aeroport("Drone detection failed - insufficient matches", {
+                    "player_id": player_id,
+                    "matches": matches,
+                    "required": detector.threshold
+                })
             return False
     
     async def broadcast_to_room(self, message):
-        """Envoie un message à tous les joueurs de la salle"""
-        debug_websocket("Broadcasting message to room", {
-            "room_id": self.room_id,
-            "message_type": message.get("type"),
-            "connections_count": len(self.connections)
-        })
-        
-        for connection in self.connections:
+        """Envoie un message à tous les joueurs de la salle (sérialisé une fois, envois concurrents)"""
+        connections = list(self.connections)
+        if DEBUG_WEBSOCKET:
+            debug_websocket("Broadcasting message to room", {
+                "room_id": self.room_id,
+                "message_type": message.get("type"),
+                "connections_count": len(connections)
+            })
+        if not connections and not self.spectators:
+            return
+
+        started = time.perf_counter()
+        payload = json.dumps(message)
+        # Jamais bloquant : déposé dans la file de chaque spectateur
+        self.spectators.publish_event(payload)
+        results = await asyncio.gather(
+            *(asyncio.wait_for(connection.send_text(payload), BROADCAST_SEND_TIMEOUT) for connection in connections),
+            return_exceptions=True
+        )
+        for connection, result in zip(connections, results):
+            if isinstance(result, BaseException):
+                strikes = self.send_failures.get(connection, 0) + 1
+                self.send_failures[connection] = strikes
+                if DEBUG_WEBSOCKET:
+                    debug_websocket("Failed to send message", {
+                        "error": repr(result),
+                        "message_type": message.get("type"),
+                        "consecutive_failures": strikes
+                    })
+                if strikes >= BROADCAST_MAX_FAILURES:
+                    self.evict_connection(connection)
+            else:
+                self.send_failures.pop(connection, None)
+
+        elapsed = time.perf_counter() - started
+        BROADCAST_SECONDS.observe(elapsed)
+        elapsed_ms = elapsed * 1000.0
+        self.broadcast_stats["count"] += 1
+        self.broadcast_stats["last_ms"] = elapsed_ms
+        self.broadcast_stats["max_ms"] = max(self.broadcast_stats["max_ms"], elapsed_ms)
+        self.broadcast_stats["total_ms"] += elapsed_ms
+        if DEBUG_WEBSOCKET:
+            debug_websocket("Broadcast completed", {
+                "room_id": self.room_id,
+                "message_type": message.get("type"),
+                "fanout_ms": round(elapsed_ms, 3)
+            })
+
+    def evict_connection(self, connection):
+        """Retire une connexion lente ou en échec ; sa boucle de réception fera le nettoyage habituel"""
+        if connection in self.connections:
+            self.connections.remove(connection)
+        self.send_failures.pop(connection, None)
+        self.broadcast_stats["evictions"] += 1
+        console(f"⚠️ Connexion évincée de la salle {self.room_id} après {BROADCAST_MAX_FAILURES} échecs d'envoi")
+
+        async def close_quietly():
             try:
-                await connection.send_text(json.dumps(message))
-                debug_websocket("Message sent successfully", {
-                    "message_type": message.get("type")
-                })
-            except Exception as e:
-                debug_websocket("Failed to send message", {
-                    "error": str(e),
-                    "message_type": message.get("type")
-                })
+                await asyncio.wait_for(connection.close(code=1011), BROADCAST_SEND_TIMEOUT)
+            except Exception:
+                pass
+        task = asyncio.create_task(close_quietly())
+        closing_tasks.add(task)
+        task.add_done_callback(closing_tasks.discard)
     
     async def start_alarm_timer(self):
-        """Démarre le timer d'alarme de 60 secondes"""
-        if self.alarm_state["timer_task"]:
-            self.alarm_state["timer_task"].cancel()
-        
-        self.alarm_state["active"] = True
-        self.alarm_state["remaining"] = 60
+        """Démarre le timer d'alarme de 60 secondes (échéance confiée à l'ordonnanceur partagé)"""
         self.alarm_state["start_time"] = datetime.now()
-        
-        async def countdown():
-            for remaining in range(60, 0, -1):
-                self.alarm_state["remaining"] = remaining
-                await asyncio.sleep(1)
-            
-            # Temps écoulé - déclencher l'écran bleu
-            self.alarm_state["active"] = False
-            await self.broadcast_to_room({
-                "type": "alarm_timeout",
-                "message": "Temps écoulé - système compromis"
+        self._arm_alarm(ALARM_DURATION)
+        if DEBUG_WEBSOCKET:
+            debug_websocket("Alarm timer started", {
+                "room_id": self.room_id,
+                "remaining": ALARM_DURATION
             })
-        
-        self.alarm_state["timer_task"] = asyncio.create_task(countdown())
-        debug_websocket("Alarm timer started", {
-            "room_id": self.room_id,
-            "remaining": 60
+
+    def _arm_alarm(self, duration):
+        self.alarm_state["active"] = True
+        self.alarm_state["remaining"] = math.ceil(duration)
+        # Une clé existante est remplacée : redéclencher l'alarme repart de zéro
+        self.alarm_state["timer_task"] = scheduler.schedule(duration, self._on_alarm_timeout, key=("alarm", self.room_id))
+
+    async def _on_alarm_timeout(self):
+        # Temps écoulé - déclencher l'écran bleu
+        self.alarm_state["active"] = False
+        self.alarm_state["remaining"] = 0
+        self.alarm_state["timer_task"] = None
+        await self.broadcast_to_room({
+            "type": "alarm_timeout",
+            "message": "Temps écoulé - système compromis"
         })
+
+    def alarm_remaining(self):
+        """Secondes restantes avant la fin de l'alarme (arrondi supérieur, comme l'ancien compte à rebours)"""
+        timer = self.alarm_state["timer_task"]
+        if self.alarm_state["active"] and timer is not None:
+            self.alarm_state["remaining"] = math.ceil(timer.remaining())
+        return self.alarm_state["remaining"]
     
+    def to_snapshot(self):
+        """État sérialisable de la salle (sans images, sockets ni tâches)"""
+        alarm_deadline = None
+        if self.alarm_state["active"] and self.alarm_state["timer_task"] is not None:
+            alarm_deadline = time.time() + self.alarm_state["timer_task"].remaining()
+        start_time = self.alarm_state["start_time"]
+        return {
+            "room_id": self.room_id,
+            "is_private": self.is_private,
+            "solo": self.solo,
+            "game_type": self.game_type,
+            "scene_id": self.scene_id,
+            "game_state": self.game_state,
+            "player_names": self.player_names,
+            "can_see_drone": self.can_see_drone,
+            "first_assigned": self.first_assigned,
+            "secret_assigned": self.secret_assigned,
+            "alarm": {
+                "deadline": alarm_deadline,
+                "start_time": start_time.isoformat() if start_time else None,
+            },
+        }
+
+    @classmethod
+    def from_snapshot(cls, data):
+        """Recrée une salle depuis un instantané ; l'échéance d'alarme est recalée sur l'heure murale"""
+        scene_id = data.get("scene_id")
+        if scene_id not in scene_catalog:
+            # Scène retirée du manifeste depuis l'instantané
+            scene_id = None
+        room = cls(data["room_id"], is_private=data["is_private"], solo=data["solo"], game_type=data["game_type"],
+                   scene_id=scene_id)
+        room.game_state = data["game_state"]
+        room.player_names = {int(pid): name for pid, name in data["player_names"].items()}
+        room.can_see_drone = {int(pid): bool(v) for pid, v in data["can_see_drone"].items()}
+        room.first_assigned = data["first_assigned"]
+        room.secret_assigned = data["secret_assigned"]
+        alarm = data.get("alarm") or {}
+        if alarm.get("start_time"):
+            room.alarm_state["start_time"] = datetime.fromisoformat(alarm["start_time"])
+        if alarm.get("deadline") is not None:
+            remaining = alarm["deadline"] - time.time()
+            if remaining > 0:
+                room._arm_alarm(remaining)
+            else:
+                # L'alarme a expiré pendant l'arrêt du serveur
+                room.alarm_state["remaining"] = 0
+        return room
+
     async def stop_alarm_timer(self):
         """Arrête le timer d'alarme"""
         if self.alarm_state["timer_task"]:
@@ -377,43 +472,364 @@ class GameRoom:
             self.alarm_state["timer_task"] = None
         
         self.alarm_state["active"] = False
-        self.alarm_state["remaining"] = 60
-        debug_websocket("Alarm timer stopped", {
-            "room_id": self.room_id
-        })
+        self.alarm_state["remaining"] = ALARM_DURATION
+        if DEBUG_WEBSOCKET:
+            debug_websocket("Alarm timer stopped", {
+                "room_id": self.room_id
+            })
+
+def new_room_id(prefix: str = "") -> str:
+    """Identifiant de salle libre, appartenant à ce worker quand les salles sont réparties"""
+    while True:
+        room_id = f"{prefix}{str(uuid.uuid4())[:8]}"
+        if room_id not in game_rooms and shard.owns(room_id):
+            return room_id
+
+def sync_lobby(room: "GameRoom"):
+    """Reporte dans l'index du lobby le nombre de joueurs et l'état d'une salle publique"""
+    if not room.is_private:
+        lobby.update(room.room_id, len(room.players), room.game_state["game_started"], room.game_type)
+
+@app.on_event("startup")
+async def start_background_services():
+    """Décode les images de scène avant d'accepter la première salle, puis démarre les services de fond"""
+    global recorder
+    await asyncio.get_running_loop().run_in_executor(None, scene_catalog.preload)
+    render_executor.start()
+    scheduler.start()
+    if SNAPSHOT_PATH:
+        restore_rooms()
+        scheduler.schedule(SNAPSHOT_INTERVAL, periodic_snapshot, key=("snapshot",))
+    if RECORD_DIR:
+        recorder = SessionRecorder.in_directory(RECORD_DIR, shard.shard_id or "session")
+        console(f"⏺️ Enregistrement des commandes dans {recorder.path}")
+        scheduler.schedule(RECORD_FLUSH_INTERVAL, flush_recorder, key=("recorder",))
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    scheduler.stop()
+    if SNAPSHOT_PATH:
+        write_snapshot(SNAPSHOT_PATH, snapshot_rooms())
+    if recorder is not None:
+        recorder.close()
+    log_writer.flush()
+    render_executor.shutdown()
+
+def flush_recorder():
+    """Vide le tampon du journal de commandes (au pire RECORD_FLUSH_INTERVAL secondes perdues sur un crash)"""
+    recorder.flush()
+    if recorder.enabled:
+        scheduler.schedule(RECORD_FLUSH_INTERVAL, flush_recorder, key=("recorder",))
 
 @app.get("/")
 async def root():
     return {"message": "Escape Game API"}
 
+@app.get("/assets/stats")
+async def get_assets_stats():
+    """Empreinte mémoire, temps de chargement et usage des scènes"""
+    return scene_catalog.stats()
+
+@app.get("/scenes")
+async def list_scenes():
+    """Scènes disponibles pour la création de salle"""
+    return {"scenes": scene_catalog.listing()}
+
+metrics_registry.gauge("game_rooms", "Salles existantes", lambda: len(game_rooms))
+metrics_registry.gauge("websocket_connections", "Connexions WebSocket ouvertes",
+                       lambda: sum(len(room.connections) for room in game_rooms.values()))
+metrics_registry.gauge("room_deletions_pending", "Salles vides en attente de suppression", lambda: len(room_deletion_tasks))
+metrics_registry.gauge("alarms_active", "Alarmes en cours",
+                       lambda: sum(1 for room in game_rooms.values() if room.alarm_state["active"]))
+metrics_registry.gauge("scheduler_timers_pending", "Échéances en attente dans l'ordonnanceur", lambda: scheduler.pending)
+metrics_registry.gauge("frame_cache_hits_total", "Frames servies depuis le cache", lambda: frame_cache.hits, kind="counter")
+metrics_registry.gauge("frame_cache_misses_total", "Frames rendues faute d'entrée en cache", lambda: frame_cache.misses, kind="counter")
+metrics_registry.gauge("frame_cache_evictions_total", "Frames évincées du cache", lambda: frame_cache.evictions, kind="counter")
+metrics_registry.gauge("lobby_subscribers", "Clients abonnés au flux du lobby", lambda: lobby.subscribers)
+metrics_registry.gauge("spectators", "Spectateurs connectés",
+                       lambda: sum(len(room.spectators) for room in game_rooms.values()))
+metrics_registry.gauge("frame_cache_bytes", "Octets occupés par le cache de frames", lambda: frame_cache.nbytes)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Métriques au format texte Prometheus"""
+    return Response(content=metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/scheduler/stats")
+async def get_scheduler_stats():
+    """Échéances en attente dans l'ordonnanceur partagé (alarmes, suppressions de salles)"""
+    return scheduler.stats()
+
+@app.get("/admission/stats")
+async def get_admission_stats():
+    """Limites d'admission, occupation courante et refus par motif"""
+    return admission.stats()
+
+@app.get("/connections/stats")
+async def get_connection_stats():
+    """RTT et inactivité de chaque WebSocket de jeu (battement de cœur)"""
+    return {
+        "heartbeat_interval_s": HEARTBEAT_INTERVAL,
+        "heartbeat_timeout_s": HEARTBEAT_TIMEOUT,
+        "connections": sorted((hb.stats() for hb in heartbeats), key=lambda c: c["connection"]),
+    }
+
+@app.get("/ticks/stats")
+async def get_tick_stats():
+    """Boucles de tick actives (ROOM_TICK_RATE) : versions, durées et messages par salle"""
+    return {
+        "rate_hz": ROOM_TICK_RATE,
+        "rooms": {room_id: room.ticker.stats() for room_id, room in game_rooms.items()
+                  if room.ticker is not None and len(room.ticker)},
+    }
+
+@app.get("/variants/stats")
+async def get_variant_stats():
+    """Cache disque des variantes d'images"""
+    return variant_store.stats()
+
+@app.get("/variants/{root}/{path:path}")
+async def get_variant(request: Request, root: str, path: str, w: int = 0, format: str = None, v: str = None):
+    """Image de /images ou /static/assets redimensionnée (?w=) et recompressée (?format= ou en-tête Accept)"""
+    try:
+        variant = await variant_store.get(root, path, w, format, request.headers.get("accept"))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Une URL versionnée ne change jamais de contenu ; sinon le navigateur revalide par ETag
+    headers = {"ETag": variant.etag, "Cache-Control": IMMUTABLE if v == variant.version else "no-cache"}
+    if format is None:
+        headers["Vary"] = "Accept"
+    if variant.etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(variant.path, media_type=variant.media_type, headers=headers)
+
+def memory_report(top: int = 10) -> Dict:
+    """Octets résidents estimés par catégorie ; un objet partagé n'est compté qu'une fois
+    (les calques de scène, référencés par toutes les salles, ne le sont que dans image_assets)
+    """
+    seen = set()
+    # Ce qui est compté dans une autre catégorie ou partagé par tout le processus
+    room_skip = SKIP_TYPES + (SpectatorHub, RoomTicker, Timer, FrameRenderer)
+    rooms = []
+    for room in list(game_rooms.values()):
+        size = deep_sizeof([room], seen, room_skip)
+        if room.ticker is not None:
+            size += deep_sizeof([room.ticker.state], seen)
+        rooms.append({"room_id": room.room_id, "bytes": size, "players": len(room.players),
+                      "spectators": len(room.spectators)})
+    rooms.sort(key=lambda r: -r["bytes"])
+    room_bytes = sum(r["bytes"] for r in rooms)
+    # Tables des salles : un dict ne rend pas sa mémoire quand il se vide
+    index_bytes = sys.getsizeof(game_rooms) + sys.getsizeof(room_deletion_tasks) + deep_sizeof([lobby], seen)
+
+    websockets = [ws for room in game_rooms.values() for ws in room.connections]
+    websockets += [s.websocket for room in game_rooms.values() for s in room.spectators.spectators]
+    write_buffers = sum(transport_buffer(ws) for ws in websockets)
+    queue_bytes = deep_sizeof(list(command_queues), seen)
+    spectator_bytes = deep_sizeof([room.spectators for room in game_rooms.values()], seen)
+
+    tasks = task_summary()
+    assets = scene_catalog.stats()
+    cache = frame_cache.stats()
+    categories = {
+        "image_assets": {
+            "bytes": assets["resident_bytes"],
+            "scenes": {scene_id: scene["resident_bytes"] for scene_id, scene in assets["scenes"].items()},
+        },
+        "frame_cache": {"bytes": cache["nbytes"], "entries": cache["entries"]},
+        "rooms": {
+            "bytes": room_bytes + index_bytes,
+            "count": len(rooms),
+            "state_bytes": room_bytes,
+            "index_bytes": index_bytes,
+            "top": rooms[:max(0, top)],
+        },
+        "connections": {
+            "bytes": write_buffers + queue_bytes + spectator_bytes,
+            "websockets": len(websockets),
+            "transport_write_buffers": write_buffers,
+            "command_queues": queue_bytes,
+            "spectator_buffers": spectator_bytes,
+        },
+        "tasks": {
+            "bytes": tasks["bytes"],
+            "asyncio_tasks": tasks["count"],
+            "by_coroutine": tasks["by_coroutine"],
+            "scheduler": scheduler.stats(),
+            "room_deletions": len(room_deletion_tasks),
+            "heartbeats": len(heartbeats),
+        },
+    }
+    accounted = sum(category["bytes"] for category in categories.values())
+    rss = rss_bytes()
+    return {
+        "rss_bytes": rss,
+        "accounted_bytes": accounted,
+        "unaccounted_bytes": max(0, rss - accounted) if rss else None,
+        "categories": categories,
+        "tracemalloc": allocation_tracer.stats(),
+    }
+
+@app.get("/memory/stats")
+async def get_memory_stats(top: int = 10):
+    """Mémoire par catégorie : calques, cache de frames, salles, tampons des connexions, tâches"""
+    return memory_report(top)
+
+def tracemalloc_group(group_by: str) -> str:
+    if not allocation_tracer.tracing:
+        raise HTTPException(status_code=409, detail="tracemalloc inactif : démarrer avec MEMORY_TRACEMALLOC=<profondeur>")
+    if group_by not in ("lineno", "filename", "traceback"):
+        raise HTTPException(status_code=400, detail="group_by must be one of lineno, filename, traceback")
+    return group_by
+
+@app.get("/memory/tracemalloc")
+async def get_tracemalloc_stats():
+    return allocation_tracer.stats()
+
+@app.post("/memory/tracemalloc/snapshot")
+async def take_memory_snapshot(limit: int = 20, group_by: str = "lineno"):
+    """Instantané de référence pour /memory/tracemalloc/diff"""
+    group_by = tracemalloc_group(group_by)
+    return await asyncio.get_running_loop().run_in_executor(None, allocation_tracer.snapshot, limit, group_by)
+
+@app.get("/memory/tracemalloc/diff")
+async def get_memory_diff(limit: int = 20, group_by: str = "lineno", rebase: bool = False):
+    """Allocations apparues depuis l'instantané de référence (rebase=1 : l'état courant devient la référence)"""
+    group_by = tracemalloc_group(group_by)
+    return await asyncio.get_running_loop().run_in_executor(None, allocation_tracer.diff, limit, group_by, rebase)
+
+@app.get("/recorder/stats")
+async def get_recorder_stats():
+    """Journal des commandes en cours (RECORD_DIR)"""
+    return recorder.stats() if recorder is not None else {"enabled": False}
+
+@app.get("/frames/cache")
+async def get_frame_cache_stats():
+    """Compteurs du cache de frames encodées (hits, misses, évictions)"""
+    return frame_cache.stats()
+
+def not_modified(request: Request, etag: str):
+    """Réponse 304 si le client possède déjà cette version de l'index"""
+    if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
 @app.get("/rooms")
-async def get_rooms():
-    """Retourne la liste des salles disponibles"""
-    rooms_info = {}
-    for room_id, room in game_rooms.items():
-        if getattr(room, 'is_private', False):
-            continue  # ne pas lister les salles privées (solo)
-        rooms_info[room_id] = {
-            "players": len(room.players),
-            "game_started": room.game_state["game_started"]
-        }
-    return rooms_info
+async def get_rooms(request: Request):
+    """Retourne la liste des salles disponibles (salles publiques uniquement, depuis l'index du lobby)"""
+    etag = lobby.etag
+    return not_modified(request, etag) or Response(
+        content=lobby.legacy_body(), media_type="application/json", headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+@app.get("/lobby/rooms")
+async def get_lobby_rooms(request: Request, status: str = None, game_type: str = None, offset: int = 0, limit: int = 50):
+    """Page de salles publiques, filtrable par état (joinable, started, full) et par game_type"""
+    if status is not None and status not in STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(STATUSES)}")
+    etag = lobby.etag
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    page = lobby.page(status, game_type, max(0, offset), max(1, min(limit, LOBBY_PAGE_MAX)))
+    return Response(content=json.dumps(page), media_type="application/json",
+                    headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+@app.get("/lobby/stats")
+async def get_lobby_stats():
+    return lobby.stats()
+
+@app.websocket("/lobby/ws")
+async def lobby_feed(websocket: WebSocket):
+    """Flux du lobby : un instantané des salles publiques puis leurs changements (remplace le polling)"""
+    await websocket.accept()
+    game_type = websocket.query_params.get("game_type")
+    subscriber = lobby.subscribe(game_type)
+
+    async def wait_disconnect():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    watcher = asyncio.create_task(wait_disconnect())
+    try:
+        await websocket.send_text(lobby.snapshot(game_type))
+        while not watcher.done():
+            getter = asyncio.ensure_future(subscriber.queue.get())
+            await asyncio.wait({getter, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                getter.cancel()
+                break
+            payload = getter.result()
+            if payload is None:
+                # Abonné trop lent : fermer pour qu'il se resynchronise depuis un instantané
+                await websocket.close(code=1013)
+                break
+            await websocket.send_text(payload)
+    except Exception:
+        pass
+    finally:
+        lobby.unsubscribe(subscriber)
+        watcher.cancel()
+
+def admit_room(request: Request):
+    """Refuse la création d'une salle (429/503 + Retry-After) avant toute allocation"""
+    client = client_key(request.client.host if request.client else None, request.headers.get("x-forwarded-for"))
+    rejection = admission.check_room(client, len(game_rooms))
+    if rejection is not None:
+        if DEBUG_WEBSOCKET:
+            debug_websocket("Room creation rejected", {"client": client, "reason": rejection.reason})
+        raise HTTPException(status_code=rejection.status, detail=f"Serveur saturé ({rejection.reason})",
+                            headers=rejection.headers)
+
+def requested_scene(payload) -> str:
+    """Scène demandée à la création ({"scene": "<id>"}), la scène par défaut sinon ; 400 si inconnue"""
+    scene = payload.get("scene") if isinstance(payload, dict) else None
+    try:
+        return scene_catalog.resolve(scene)
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Scène inconnue: {scene}")
+
+@asynccontextmanager
+async def loaded_scene(scene_id: str):
+    """Scène chargée hors de la boucle d'événements si aucune salle ne l'a encore utilisée, et retenue
+    jusqu'à la création de la salle (qui prend sa propre référence) : elle ne peut pas être évincée
+    entre les deux, ce qui imposerait un rechargement synchrone sur la boucle
+    """
+    scene_catalog.acquire(scene_id)
+    try:
+        if not scene_catalog.registry(scene_id).loaded:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, scene_catalog.detector, scene_id)
+            except (OSError, ValueError) as e:
+                console(f"❌ Scène {scene_id} impossible à charger: {e}")
+                raise HTTPException(status_code=503, detail=f"Scène indisponible: {scene_id}")
+        yield
+    finally:
+        scene_catalog.release(scene_id)
 
 @app.post("/rooms")
-async def create_room(payload: Dict = None):
+async def create_room(request: Request, payload: Dict = None):
     """Crée une nouvelle salle de jeu"""
-    room_id = str(uuid.uuid4())[:8]
+    scene_id = requested_scene(payload)
+    admit_room(request)
+    room_id = new_room_id()
     game_type = (payload or {}).get("game_type", "drone") if isinstance(payload, dict) else "drone"
-    game_rooms[room_id] = GameRoom(room_id, game_type=game_type)
-    return {"room_id": room_id, "message": "Salle créée avec succès", "game_type": game_type}
+    async with loaded_scene(scene_id):
+        room = game_rooms[room_id] = GameRoom(room_id, game_type=game_type, scene_id=scene_id)
+    sync_lobby(room)
+    return {"room_id": room_id, "message": "Salle créée avec succès", "game_type": game_type, "scene": scene_id}
 
 @app.post("/rooms/private")
-async def create_private_room(payload: Dict = None):
+async def create_private_room(request: Request, payload: Dict = None):
     """Crée une salle privée (solo), non listée"""
-    room_id = f"solo-{str(uuid.uuid4())[:8]}"
+    scene_id = requested_scene(payload)
+    admit_room(request)
+    room_id = new_room_id("solo-")
     game_type = (payload or {}).get("game_type", "drone") if isinstance(payload, dict) else "drone"
-    game_rooms[room_id] = GameRoom(room_id, is_private=True, solo=True, game_type=game_type)
-    return {"room_id": room_id, "message": "Salle privée créée", "game_type": game_type}
+    async with loaded_scene(scene_id):
+        game_rooms[room_id] = GameRoom(room_id, is_private=True, solo=True, game_type=game_type, scene_id=scene_id)
+    return {"room_id": room_id, "message": "Salle privée créée", "game_type": game_type, "scene": scene_id}
 
 @app.get("/rooms/{room_id}")
 async def get_room(room_id: str):
@@ -426,69 +842,370 @@ async def get_room(room_id: str):
             "game_started": room.game_state["game_started"],
             "names": list(room.player_names.values()),
             "game_type": getattr(room, "game_type", "drone"),
+            "scene": room.scene_id,
         }
     raise HTTPException(status_code=404, detail="Room not found")
 
+def to_client_position(position: Dict, scale: float) -> Dict:
+    """Position de l'espace de référence (512) vers l'espace des frames du client"""
+    if scale == 1.0:
+        return position
+    return {"x": position["x"] * scale, "y": position["y"] * scale}
+
+def from_client_position(x, y, scale: float) -> Dict:
+    """Coordonnées envoyées par le client (espace de ses frames) vers l'espace de référence (512)"""
+    return {"x": float(x) / scale, "y": float(y) / scale}
+
+def client_game_state(game_state: Dict, scale: float) -> Dict:
+    if scale == 1.0:
+        return game_state
+    state = dict(game_state)
+    for key in ("player1", "player2"):
+        state[key] = dict(game_state[key], position=to_client_position(game_state[key]["position"], scale))
+    return state
+
+def wallpaper_message(viewport=None) -> Dict:
+    """Fond d'écran du jeu desktop, à la largeur de l'écran du client (pixels physiques) s'il l'a indiquée"""
+    try:
+        width = int(float(viewport or 0))
+    except (TypeError, ValueError):
+        width = 0
+    url = f"{BACKEND_URL}/images/{DESKTOP_WALLPAPER}"
+    if width > 0:
+        try:
+            url = BACKEND_URL + variant_store.url("images", DESKTOP_WALLPAPER, width)
+        except OSError:
+            pass
+    return {"type": "desktop_wallpaper", "url": url}
+
+def share_frame(room: GameRoom, player_id: int, position: Dict, image: bytes, renderer: FrameRenderer):
+    """Transmet aux spectateurs les octets déjà encodés pour le joueur ; quand les envois du joueur
+    se dégradent, un spectateur est délesté pour lui rendre de la bande passante
+    """
+    if not room.spectators:
+        return
+    room.spectators.publish_frame(player_id, position, image, renderer.params.format, renderer.size)
+    if renderer.quality.degraded:
+        room.spectators.shed()
+
+async def send_game_state(websocket: WebSocket, room: GameRoom, player_id: int, protocol: str, renderer: FrameRenderer,
+                          queue_depth: int = 0):
+    """Envoie l'état complet de la partie avec la frame courante du joueur"""
+    player = room.game_state[f"player{player_id}"]
+    message = {
+        "type": "game_state",
+        "player_id": player_id,
+        "game_state": client_game_state(room.game_state, renderer.scale),
+        "game_started": room.game_state["game_started"],
+        "frame_size": renderer.size,
+    }
+    params = renderer.params
+    image = await renderer.render(room.frame_key(player_id, player["mode"], renderer.size))
+    started = time.perf_counter()
+    if protocol == PROTOCOL_BINARY:
+        # Texte sans image, puis la frame brute dans un message binaire
+        await websocket.send_text(json.dumps(message))
+        await websocket.send_bytes(pack_frame(FRAME_STATE, player_id, to_client_position(player["position"], renderer.scale),
+                                              image, FORMAT_CODES[params.format]))
+    else:
+        message["image_data"] = room._to_data_url(image, params.format)
+        await websocket.send_text(json.dumps(message))
+    elapsed = time.perf_counter() - started
+    WEBSOCKET_SEND_SECONDS.observe(elapsed, protocol)
+    renderer.record_send(elapsed, queue_depth)
+    share_frame(room, player_id, to_client_position(player["position"], renderer.scale), image, renderer)
+
+async def send_frame(websocket: WebSocket, room: GameRoom, player_id: int, protocol: str, renderer: FrameRenderer,
+                     queue_depth: int = 0):
+    """Envoie la frame du joueur après un déplacement de la loupe"""
+    player = room.game_state[f"player{player_id}"]
+    params = renderer.params
+    image = await renderer.render(room.frame_key(player_id, player["mode"], renderer.size))
+    position = to_client_position(player["position"], renderer.scale)
+    started = time.perf_counter()
+    if protocol == PROTOCOL_BINARY:
+        await websocket.send_bytes(pack_frame(FRAME_MOVE, player_id, position, image, FORMAT_CODES[params.format]))
+    else:
+        await websocket.send_text(json.dumps({
+            "type": "frame",
+            "player_id": player_id,
+            "position": position,
+            "image_data": room._to_data_url(image, params.format),
+        }))
+    elapsed = time.perf_counter() - started
+    WEBSOCKET_SEND_SECONDS.observe(elapsed, protocol)
+    renderer.record_send(elapsed, queue_depth)
+    share_frame(room, player_id, position, image, renderer)
+
+def schedule_room_deletion(room_id: str, reason: str):
+    """Programme la suppression d'une salle vide après le délai de reconnexion"""
+    room_deletion_tasks[room_id] = scheduler.schedule(
+        ROOM_GRACE_SECONDS, expire_room, room_id, reason, key=("expire", room_id))
+
+def expire_room(room_id: str, reason: str):
+    """Supprime la salle si personne ne s'est reconnecté pendant le délai de grâce"""
+    room_deletion_tasks.pop(room_id, None)
+    room = game_rooms.get(room_id)
+    if room is None or len(room.players) != 0:
+        return
+    if DEBUG_WEBSOCKET:
+        debug_websocket(reason, {"room_id": room_id})
+    # Nettoyer l'alarme avant de supprimer la salle
+    scheduler.cancel(("alarm", room_id))
+    room.spectators.close_all()
+    del game_rooms[room_id]
+    room.release_scene()
+    lobby.remove(room_id)
+
+def snapshot_rooms():
+    return [room.to_snapshot() for room in game_rooms.values()]
+
+async def periodic_snapshot():
+    """Sauvegarde l'état des salles (écriture hors boucle) puis reprogramme la suivante"""
+    try:
+        rooms = snapshot_rooms()
+        size = await asyncio.get_running_loop().run_in_executor(None, write_snapshot, SNAPSHOT_PATH, rooms)
+        if DEBUG_WEBSOCKET:
+            debug_websocket("Rooms snapshot written", {"rooms": len(rooms), "bytes": size})
+    except Exception as e:
+        console(f"❌ Échec de l'instantané des salles: {e}")
+    finally:
+        scheduler.schedule(SNAPSHOT_INTERVAL, periodic_snapshot, key=("snapshot",))
+
+def snapshot_files():
+    """Instantanés à relire au démarrage, du plus récent au plus ancien.
+    En mode multi-processus, chaque worker relit aussi ceux des autres shards et ne garde
+    que les salles qui lui appartiennent : un changement du nombre de workers ne perd rien.
+    """
+    paths = [SNAPSHOT_PATH] if os.path.exists(SNAPSHOT_PATH) else []
+    if shard.enabled:
+        directory = os.path.dirname(SNAPSHOT_PATH) or "."
+        if os.path.isdir(directory):
+            paths += [os.path.join(directory, name) for name in os.listdir(directory)
+                      if name.endswith(".snapshot") and os.path.join(directory, name) != SNAPSHOT_PATH]
+    return sorted(paths, key=os.path.getmtime, reverse=True)
+
+def restore_rooms():
+    """Recharge les salles des instantanés ; elles attendent la reconnexion des joueurs"""
+    started = time.perf_counter()
+    restored = 0
+    for path in snapshot_files():
+        snapshot = read_snapshot(path)
+        if not snapshot:
+            continue
+        for data in snapshot["rooms"]:
+            if data["room_id"] in game_rooms or not shard.owns(data["room_id"]):
+                continue
+            room = GameRoom.from_snapshot(data)
+            game_rooms[room.room_id] = room
+            sync_lobby(room)
+            schedule_room_deletion(room.room_id, "Restored room deleted - no players reconnected")
+            restored += 1
+    elapsed_ms = (time.perf_counter() - started) * 1000.0
+    console(f"♻️ {restored} salles restaurées en {elapsed_ms:.1f} ms")
+
+# Commandes reconnues (label des métriques ; les autres sont comptées sous "other")
+KNOWN_COMMANDS = frozenset({
+    "move", "click", "mode_change", "set_name", "switch_player", "get_alarm_state",
+    "trigger_alarm", "stop_alarm", "desktop_hello", "ack",
+})
+
+def is_pong(receiving: asyncio.Future) -> bool:
+    return receiving.exception() is None and receiving.result().get("type") == "pong"
+
+async def read_commands(websocket: WebSocket, commands: CommandQueue, heartbeat: Heartbeat, record=None):
+    """Lit en continu les commandes du client et les place dans la file du joueur (les pongs restent ici) ;
+    record(command) journalise chaque commande à sa réception, avant toute fusion
+    """
+    # File pleine : la commande reçue attend sa place pendant que la lecture continue, pour qu'un client
+    # occupé mais vivant (clics en rafale pendant des rendus lents) réponde toujours aux pings. La lecture
+    # ne s'arrête que si une deuxième commande arrive ; l'attente est alors d'une commande traitée.
+    held = None
+    receiving = None
+    try:
+        while True:
+            if receiving is None:
+                receiving = asyncio.ensure_future(receive_command(websocket))
+            if held is not None:
+                if commands.accepts(held) or (receiving.done() and not is_pong(receiving)):
+                    await commands.put(held)
+                    held = None
+                    continue
+                if not receiving.done():
+                    space = asyncio.ensure_future(commands.wait_space())
+                    await asyncio.wait({space, receiving}, return_when=asyncio.FIRST_COMPLETED)
+                    space.cancel()
+                    continue
+            command = await receiving
+            receiving = None
+            if command.get("type") == "pong":
+                heartbeat.pong(command)
+                continue
+            heartbeat.touch()
+            if record is not None:
+                record(command)
+            held = command
+    except Exception as e:
+        # Déconnexion ou message invalide : remonté à la boucle de traitement
+        commands.fail(e)
+    finally:
+        if receiving is not None:
+            receiving.cancel()
+
+async def serve_spectator(websocket: WebSocket, room: GameRoom, protocol: str):
+    """Connexion en lecture seule (?role=spectator&watch=1,2) : état initial, puis frames et événements
+    des joueurs suivis ; seul le message {"type": "watch", "players": [...]} est accepté du client
+    """
+    hub = room.spectators
+    if hub.full():
+        if DEBUG_WEBSOCKET:
+            debug_websocket("Spectator rejected - room at capacity", {"room_id": room.room_id, "spectators": len(hub)})
+        await websocket.close(code=1013)
+        return
+    spectator = hub.add(websocket, protocol, parse_watch(websocket.query_params.get("watch")))
+    if DEBUG_WEBSOCKET:
+        debug_websocket("Spectator joined", {"room_id": room.room_id, "watching": sorted(spectator.watching),
+                                             "spectators": len(hub)})
+    sender = heartbeat_task = None
+    heartbeat = Heartbeat(HEARTBEAT_INTERVAL, HEARTBEAT_TIMEOUT, f"{room.room_id}/spectator")
+    heartbeats.add(heartbeat)
+    try:
+        await websocket.send_text(json.dumps({
+            "type": "spectator_state",
+            "game_state": room.game_state,
+            "names": room.player_names,
+            "watching": sorted(spectator.watching),
+            "frame_sizes": hub.frame_sizes(spectator),
+        }))
+        sender = asyncio.create_task(hub.serve(spectator))
+        heartbeat_task = asyncio.create_task(heartbeat.run(
+            websocket.send_text, lambda: hub.drop(spectator, "sans réponse")))
+        while spectator in hub.spectators:
+            try:
+                # Réveil périodique : un spectateur délesté ou muet ne bloque pas cette boucle
+                message = await asyncio.wait_for(websocket.receive(), HEARTBEAT_INTERVAL or None)
+            except asyncio.TimeoutError:
+                continue
+            if message["type"] == "websocket.disconnect":
+                break
+            try:
+                command = json.loads(message.get("text") or "{}")
+            except ValueError:
+                continue
+            if command.get("type") == "pong":
+                heartbeat.pong(command)
+                continue
+            heartbeat.touch()
+            if command.get("type") == "watch":
+                spectator.watching = parse_watch(",".join(str(p) for p in command.get("players", [])))
+    except Exception as e:
+        if DEBUG_WEBSOCKET:
+            debug_websocket("Spectator connection closed", {"room_id": room.room_id, "error": repr(e)})
+    finally:
+        hub.remove(spectator)
+        heartbeats.discard(heartbeat)
+        for task in (sender, heartbeat_task):
+            if task is not None:
+                task.cancel()
+
 @app.websocket("/ws/{room_id}")
 async def websocket_endpoint(websocket: WebSocket, room_id: str):
-    debug_websocket("WebSocket connection attempt", {"room_id": room_id})
-    await websocket.accept()
-    
+    """Admission avant accept() : une salle inconnue ou un nœud saturé coûtent un refus de handshake"""
+    if DEBUG_WEBSOCKET:
+        debug_websocket("WebSocket connection attempt", {"room_id": room_id})
     if room_id not in game_rooms:
-        debug_websocket("WebSocket connection rejected - room not found", {"room_id": room_id})
+        if DEBUG_WEBSOCKET:
+            debug_websocket("WebSocket connection rejected - room not found", {"room_id": room_id})
         await websocket.close()
         return
-    
-    room = game_rooms[room_id]
+    rejection = admission.check_connection()
+    if rejection is not None:
+        if DEBUG_WEBSOCKET:
+            debug_websocket("WebSocket connection rejected - overloaded", {"room_id": room_id, "reason": rejection.reason})
+        await websocket.close(code=1013)
+        return
+    admission.connections += 1
+    try:
+        await websocket.accept()
+        room = game_rooms.get(room_id)
+        if room is None:
+            # Salle supprimée pendant la poignée de main
+            await websocket.close()
+            return
+        await websocket_session(websocket, room)
+    finally:
+        admission.connections -= 1
+
+async def websocket_session(websocket: WebSocket, room: GameRoom):
+    room_id = room.room_id
+    protocol = negotiated_protocol(websocket)
+    if websocket.query_params.get("role") == "spectator":
+        await serve_spectator(websocket, room, protocol)
+        return
     room.connections.append(websocket)
+    # Format et qualité demandés par le client (?format=webp&quality=70&optimize=0), adaptés ensuite à la charge ;
+    # taille des frames (?size=256|512|1024) arrondie au niveau de pyramide le plus proche
+    renderer = FrameRenderer(render_executor, frame_cache, RENDER_MAX_INFLIGHT, AdaptiveQuality(
+        negotiate(websocket.query_params), min_quality=FRAME_MIN_QUALITY, target_send_ms=FRAME_TARGET_SEND_MS),
+        size=nearest_level(websocket.query_params.get("size")))
+    reader_task = heartbeat_task = heartbeat = record = tick_client = None
     
     # Annuler la suppression de la salle si un joueur se reconnecte
     if room_id in room_deletion_tasks:
         room_deletion_tasks[room_id].cancel()
         del room_deletion_tasks[room_id]
-        debug_websocket("Room deletion cancelled - player reconnected", {"room_id": room_id})
+        if DEBUG_WEBSOCKET:
+            debug_websocket("Room deletion cancelled - player reconnected", {"room_id": room_id})
     
-    debug_websocket("WebSocket connection established", {
-        "room_id": room_id,
-        "total_connections": len(room.connections)
-    })
+    if DEBUG_WEBSOCKET:
+        debug_websocket("WebSocket connection established", {
+            "room_id": room_id,
+            "total_connections": len(room.connections)
+        })
     
     # Assigner un ID de joueur
     player_id = None
     if len(room.players) == 0:
         player_id = 1
-        debug_websocket("Player assigned ID 1", {"room_id": room_id})
+        if DEBUG_WEBSOCKET:
+            debug_websocket("Player assigned ID 1", {"room_id": room_id})
     elif len(room.players) == 1:
         # En solo, refuser un second joueur
         if getattr(room, 'is_private', False):
-            debug_websocket("WebSocket connection rejected - solo room full", {"room_id": room_id})
+            if DEBUG_WEBSOCKET:
+                debug_websocket("WebSocket connection rejected - solo room full", {"room_id": room_id})
             await websocket.close()
             return
         player_id = 2
         room.game_state["game_started"] = True
-        debug_websocket("Player assigned ID 2, game started", {"room_id": room_id})
+        if DEBUG_WEBSOCKET:
+            debug_websocket("Player assigned ID 2, game started", {"room_id": room_id})
     else:
-        debug_websocket("WebSocket connection rejected - room full", {"room_id": room_id})
+        if DEBUG_WEBSOCKET:
+            debug_websocket("WebSocket connection rejected - room full", {"room_id": room_id})
         await websocket.close()
         return
     
     room.players[player_id] = websocket
-    debug_websocket("Player registered", {
-        "room_id": room_id,
-        "player_id": player_id,
-        "total_players": len(room.players)
-    })
+    sync_lobby(room)
+    if DEBUG_WEBSOCKET:
+        debug_websocket("Player registered", {
+            "room_id": room_id,
+            "player_id": player_id,
+            "total_players": len(room.players)
+        })
 
     # Si c'est le premier joueur
     if len(room.players) == 1 and not room.first_assigned and not room.secret_assigned:
         # Toujours visible pour tous les joueurs (suppression du random)
         room.can_see_drone[player_id] = True
         room.first_assigned = True
-        debug_aeroport("First player drone visibility assigned", {
-            "player_id": player_id,
-            "can_see_drone": room.can_see_drone[player_id],
-            "solo_mode": getattr(room, 'solo', False)
-        })
+        if DEBUG_AEROPORT:
+            debug_aeroport("First player drone visibility assigned", {
+                "player_id": player_id,
+                "can_see_drone": room.can_see_drone[player_id],
+                "solo_mode": getattr(room, 'solo', False)
+            })
 
     # Lorsque 2 joueurs sont présents: tous les joueurs peuvent voir le drone
     if len(room.players) == 2 and not room.secret_assigned:
@@ -496,342 +1213,377 @@ async def websocket_endpoint(websocket: WebSocket, room_id: str):
         room.can_see_drone[1] = True
         room.can_see_drone[2] = True
         room.secret_assigned = True
-        debug_aeroport("Second player drone visibility assigned", {
-            "player1_can_see": room.can_see_drone.get(1, False),
-            "player2_can_see": room.can_see_drone.get(2, False)
-        })
+        if DEBUG_AEROPORT:
+            debug_aeroport("Second player drone visibility assigned", {
+                "player1_can_see": room.can_see_drone.get(1, False),
+                "player2_can_see": room.can_see_drone.get(2, False)
+            })
     
     try:
         # Envoyer l'état initial
         # For desktop game, send minimal hello and optional wallpaper; otherwise send current frame
-        if getattr(room, 'game_type', 'drone') == 'desktop':
-            current_state = {
-                "type": "desktop_wallpaper",
-                "url": f"{BACKEND_URL}/images/os-x-mountain-lion-3840x2160-24066.jpg"
-            }
-        else:
-            current_state = {
-                "type": "game_state",
-                "player_id": player_id,
-                "game_state": room.game_state,
-                "image_data": room.get_image_data(player_id, room.game_state[f"player{player_id}"]["mode"]),
-                "game_started": room.game_state["game_started"]
-            }
         try:
-            await websocket.send_text(json.dumps(current_state))
-            print(f"📤 État initial envoyé au joueur {player_id}")
-            debug_websocket("Initial state sent successfully", {
-                "player_id": player_id,
-                "room_id": room_id,
-                "game_type": getattr(room, 'game_type', 'drone')
-            })
+            if getattr(room, 'game_type', 'drone') == 'desktop':
+                await websocket.send_text(json.dumps(wallpaper_message(websocket.query_params.get("viewport"))))
+            else:
+                await send_game_state(websocket, room, player_id, protocol, renderer)
+            if DEBUG_WEBSOCKET:
+                debug_websocket("Initial state sent successfully", {
+                    "player_id": player_id,
+                    "room_id": room_id,
+                    "game_type": getattr(room, 'game_type', 'drone'),
+                    "protocol": protocol
+                })
         except Exception as send_err:
             # Client fermé avant l'envoi → nettoyer et sortir proprement
-            print(f"❌ Envoi état initial échoué: {send_err}")
-            debug_websocket("Failed to send initial state", {
-                "player_id": player_id,
-                "room_id": room_id,
-                "error": str(send_err)
-            })
+            console(f"❌ Envoi état initial échoué: {send_err}")
+            if DEBUG_WEBSOCKET:
+                debug_websocket("Failed to send initial state", {
+                    "player_id": player_id,
+                    "room_id": room_id,
+                    "error": str(send_err)
+                })
             if player_id in room.players:
                 del room.players[player_id]
             if websocket in room.connections:
                 room.connections.remove(websocket)
+            sync_lobby(room)
             return
         
+        # Synchronisation par ticks : déplacements et changements de mode publiés par la boucle de la salle
+        if room.ticker is not None and room.game_type != 'desktop' and wants_ticks(websocket):
+            tick_client = room.ticker.add(websocket, player_id, protocol, renderer)
+
+        # Les commandes sont lues en tâche de fond : les 'move' en attente fusionnent pendant un rendu
+        commands = CommandQueue(COMMAND_QUEUE_MAX)
+        command_queues.add(commands)
+        pacer = FramePacer(FRAME_MAX_FPS)
+        frame_pending = False
+        # Le RTT mesuré par le battement de cœur ralentit la cadence des frames sur les liens lents
+        heartbeat = Heartbeat(HEARTBEAT_INTERVAL, HEARTBEAT_TIMEOUT, f"{room_id}/{player_id}", on_rtt=pacer.set_rtt)
+        heartbeats.add(heartbeat)
+        record = None
+        if recorder is not None:
+            recorder.join(room, player_id, renderer.size, protocol, renderer.quality.preferred._asdict())
+            record = lambda command: recorder.command(room, player_id, command)
+        reader_task = asyncio.create_task(read_commands(websocket, commands, heartbeat, record))
+
+        def connection_dead():
+            """Client muet (TCP à moitié ouvert...) : même nettoyage qu'une déconnexion"""
+            console(f"💔 Joueur {player_id} de la salle {room_id} sans réponse depuis {HEARTBEAT_TIMEOUT:g} s")
+            if websocket in room.connections:
+                room.connections.remove(websocket)
+            commands.fail(WebSocketDisconnect(1001))
+        heartbeat_task = asyncio.create_task(heartbeat.run(websocket.send_text, connection_dead))
+
         while True:
-            # Attendre les commandes du client
-            data = await websocket.receive_text()
-            command = json.loads(data)
-            print(f"📥 Commande reçue: {command['type']}")
-            debug_websocket("Command received", {
-                "player_id": player_id,
-                "room_id": room_id,
-                "command_type": command['type'],
-                "command_data": command
-            })
+            # Attendre les commandes du client, ou l'échéance d'une frame retardée par la cadence
+            command = await commands.pop(pacer.delay() if frame_pending else None)
+            if command is None:
+                await send_frame(websocket, room, player_id, protocol, renderer, len(commands))
+                pacer.mark()
+                frame_pending = False
+                continue
+            handled_started = time.perf_counter()
+            handled_type = command_label(command.get("type"), KNOWN_COMMANDS)
+            try:
+                if DEBUG_WEBSOCKET:
+                    debug_websocket("Command received", {
+                        "player_id": player_id,
+                        "room_id": room_id,
+                        "command_type": command['type'],
+                        "command_data": command
+                    })
             
-            # Desktop specific light protocol
-            if getattr(room, 'game_type', 'drone') == 'desktop':
-                if command.get("type") == "desktop_hello":
-                    await websocket.send_text(json.dumps({"type": "desktop_wallpaper", "url": f"{BACKEND_URL}/images/os-x-mountain-lion-3840x2160-24066.jpg"}))
-                elif command.get("type") == "set_name":
+                # Desktop specific light protocol
+                if getattr(room, 'game_type', 'drone') == 'desktop':
+                    if command.get("type") == "desktop_hello":
+                        await websocket.send_text(json.dumps(wallpaper_message(
+                            command.get("viewport", websocket.query_params.get("viewport")))))
+                    elif command.get("type") == "set_name":
+                        desired = str(command.get("name", "")).strip()
+                        if len(desired) == 0:
+                            await websocket.send_text(json.dumps({"type": "name_status", "ok": False, "reason": "empty"}))
+                            continue
+                        desired = desired[:32]
+                        lower_names = {pid: n.lower() for pid, n in room.player_names.items()}
+                        if any(n == desired.lower() for pid, n in lower_names.items() if pid != player_id):
+                            await websocket.send_text(json.dumps({"type": "name_status", "ok": False, "reason": "duplicate"}))
+                            continue
+                        room.player_names[player_id] = desired
+                        await websocket.send_text(json.dumps({"type": "name_status", "ok": True, "name": desired}))
+                    elif command.get("type") == "get_alarm_state":
+                        # Envoyer l'état actuel de l'alarme au client
+                        if DEBUG_WEBSOCKET:
+                            debug_websocket("Alarm state requested (desktop)", {
+                                "player_id": player_id,
+                                "room_id": room_id,
+                                "current_alarm_state": room.alarm_state
+                            })
+                    
+                        await websocket.send_text(json.dumps({
+                            "type": "alarm_state",
+                            "active": room.alarm_state["active"],
+                            "remaining": room.alarm_remaining()
+                        }))
+                    elif command.get("type") == "trigger_alarm":
+                        # Déclencher l'alarme pour tous les joueurs de la salle
+                        if DEBUG_WEBSOCKET:
+                            debug_websocket("Global alarm triggered (desktop)", {
+                                "player_id": player_id,
+                                "room_id": room_id,
+                                "alarm_type": command.get("alarm_type", "audio_5")
+                            })
+                    
+                        # Démarrer le timer d'alarme côté serveur
+                        await room.start_alarm_timer()
+                    
+                        await room.broadcast_to_room({
+                            "type": "global_alarm",
+                            "triggered_by": player_id,
+                            "alarm_type": command.get("alarm_type", "audio_5"),
+                            "message": "Alerte système activée par un joueur"
+                        })
+                    elif command.get("type") == "stop_alarm":
+                        # Arrêter l'alarme pour tous les joueurs de la salle
+                        if DEBUG_WEBSOCKET:
+                            debug_websocket("Global alarm stopped (desktop)", {
+                                "player_id": player_id,
+                                "room_id": room_id,
+                                "stopped_by": command.get("stopped_by", "Unknown")
+                            })
+                    
+                        # Arrêter le timer d'alarme côté serveur
+                        await room.stop_alarm_timer()
+                    
+                        await room.broadcast_to_room({
+                            "type": "global_alarm_stop",
+                            "stopped_by": command.get("stopped_by", "Unknown"),
+                            "message": "Alerte système désactivée par un joueur"
+                        })
+                    continue
+
+                if command["type"] == "move":
+                    # Mettre à jour la position (reçue dans l'espace des frames du client, stockée en 512x512)
+                    new_position = from_client_position(command["position"]["x"], command["position"]["y"], renderer.scale)
+                    room.game_state[f"player{player_id}"]["position"] = new_position
+                
+                    if DEBUG_AEROPORT:
+                        debug_aeroport("Player movement", {
+                            "player_id": player_id,
+                            "room_id": room_id,
+                            "new_position": new_position,
+                            "player_mode": room.game_state[f"player{player_id}"]["mode"]
+                        })
+                
+                    # Renvoyer l'image mise à jour comme dans main.py, dans la limite de FRAME_MAX_FPS
+                    # (en synchronisation par ticks, c'est le prochain tick qui l'envoie)
+                    if tick_client is None:
+                        if pacer.delay() > 0:
+                            frame_pending = True
+                        else:
+                            await send_frame(websocket, room, player_id, protocol, renderer, len(commands))
+                            pacer.mark()
+                            frame_pending = False
+                    if DEBUG_WEBSOCKET:
+                        debug_websocket("Movement update sent", {
+                            "player_id": player_id,
+                            "room_id": room_id
+                        })
+                
+                elif command["type"] == "mode_change":
+                    old_mode = room.game_state[f"player{player_id}"]["mode"]
+                    new_mode = command["mode"]
+                    room.game_state[f"player{player_id}"]["mode"] = new_mode
+                
+                    if DEBUG_AEROPORT:
+                        debug_aeroport("Player mode change", {
+                            "player_id": player_id,
+                            "room_id": room_id,
+                            "old_mode": old_mode,
+                            "new_mode": new_mode
+                        })
+                
+                    # Envoyer la mise à jour (la frame jointe remplace une éventuelle frame en attente)
+                    if tick_client is None:
+                        await send_game_state(websocket, room, player_id, protocol, renderer, len(commands))
+                        pacer.mark()
+                        frame_pending = False
+                    if DEBUG_WEBSOCKET:
+                        debug_websocket("Mode change update sent", {
+                            "player_id": player_id,
+                            "room_id": room_id,
+                            "new_mode": new_mode
+                        })
+                
+                elif command["type"] == "click":
+                    if DEBUG_AEROPORT:
+                        debug_aeroport("Click event received", {
+                            "player_id": player_id,
+                            "room_id": room_id,
+                            "click_position": {"x": command["x"], "y": command["y"]},
+                            "player_mode": room.game_state[f"player{player_id}"]["mode"]
+                        })
+                
+                    click = from_client_position(command["x"], command["y"], renderer.scale)
+                    if room.register_click(player_id, click["x"], click["y"]):
+                        new_score = room.game_state[f"player{player_id}"]["score"]
+                        old_score = new_score - 1
+                    
+                        if DEBUG_AEROPORT:
+                            debug_aeroport("Drone detection successful - score updated", {
+                                "player_id": player_id,
+                                "room_id": room_id,
+                                "old_score": old_score,
+                                "new_score": new_score,
+                                "click_position": {"x": command["x"], "y": command["y"]}
+                            })
+                    
+                        # Notifier tous les joueurs de la salle
+                        await room.broadcast_to_room({
+                            "type": "drone_detected",
+                            "player_id": player_id,
+                            "position": command,
+                            "new_score": room.game_state[f"player{player_id}"]["score"]
+                        })
+                    else:
+                        if DEBUG_AEROPORT:
+                            debug_aeroport("Drone detection failed", {
+                                "player_id": player_id,
+                                "room_id": room_id,
+                                "click_position": {"x": command["x"], "y": command["y"]}
+                            })
+                elif command["type"] == "set_name":
                     desired = str(command.get("name", "")).strip()
                     if len(desired) == 0:
                         await websocket.send_text(json.dumps({"type": "name_status", "ok": False, "reason": "empty"}))
                         continue
+                    # Limiter longueur
                     desired = desired[:32]
+                    # Unicité (insensible à la casse)
                     lower_names = {pid: n.lower() for pid, n in room.player_names.items()}
                     if any(n == desired.lower() for pid, n in lower_names.items() if pid != player_id):
                         await websocket.send_text(json.dumps({"type": "name_status", "ok": False, "reason": "duplicate"}))
                         continue
                     room.player_names[player_id] = desired
                     await websocket.send_text(json.dumps({"type": "name_status", "ok": True, "name": desired}))
-                elif command.get("type") == "get_alarm_state":
-                    # Envoyer l'état actuel de l'alarme au client
-                    debug_websocket("Alarm state requested (desktop)", {
-                        "player_id": player_id,
-                        "room_id": room_id,
-                        "current_alarm_state": room.alarm_state
-                    })
                     
+                elif command["type"] == "ack":
+                    # Dernière version de l'état reçue par le client : base de ses prochains deltas
+                    if tick_client is not None:
+                        tick_client.ack(command.get("version"))
+
+                elif command["type"] == "switch_player":
+                    room.game_state["current_player"] = 2 if room.game_state["current_player"] == 1 else 1
+                    await room.broadcast_to_room({
+                        "type": "player_switched",
+                        "current_player": room.game_state["current_player"]
+                    })
+            
+                elif command["type"] == "get_alarm_state":
+                    # Envoyer l'état actuel de l'alarme au client
+                    if DEBUG_WEBSOCKET:
+                        debug_websocket("Alarm state requested", {
+                            "player_id": player_id,
+                            "room_id": room_id,
+                            "current_alarm_state": room.alarm_state
+                        })
+                
                     await websocket.send_text(json.dumps({
                         "type": "alarm_state",
                         "active": room.alarm_state["active"],
-                        "remaining": room.alarm_state["remaining"]
+                        "remaining": room.alarm_remaining()
                     }))
-                elif command.get("type") == "trigger_alarm":
+            
+                elif command["type"] == "trigger_alarm":
                     # Déclencher l'alarme pour tous les joueurs de la salle
-                    debug_websocket("Global alarm triggered (desktop)", {
-                        "player_id": player_id,
-                        "room_id": room_id,
-                        "alarm_type": command.get("alarm_type", "audio_5")
-                    })
-                    
+                    if DEBUG_WEBSOCKET:
+                        debug_websocket("Global alarm triggered", {
+                            "player_id": player_id,
+                            "room_id": room_id,
+                            "alarm_type": command.get("alarm_type", "audio_5")
+                        })
+                
                     # Démarrer le timer d'alarme côté serveur
                     await room.start_alarm_timer()
-                    
+                
                     await room.broadcast_to_room({
                         "type": "global_alarm",
                         "triggered_by": player_id,
                         "alarm_type": command.get("alarm_type", "audio_5"),
                         "message": "Alerte système activée par un joueur"
                     })
-                elif command.get("type") == "stop_alarm":
+            
+                elif command["type"] == "stop_alarm":
                     # Arrêter l'alarme pour tous les joueurs de la salle
-                    debug_websocket("Global alarm stopped (desktop)", {
-                        "player_id": player_id,
-                        "room_id": room_id,
-                        "stopped_by": command.get("stopped_by", "Unknown")
-                    })
-                    
+                    if DEBUG_WEBSOCKET:
+                        debug_websocket("Global alarm stopped", {
+                            "player_id": player_id,
+                            "room_id": room_id,
+                            "stopped_by": command.get("stopped_by", "Unknown")
+                        })
+                
                     # Arrêter le timer d'alarme côté serveur
                     await room.stop_alarm_timer()
-                    
+                
                     await room.broadcast_to_room({
                         "type": "global_alarm_stop",
                         "stopped_by": command.get("stopped_by", "Unknown"),
                         "message": "Alerte système désactivée par un joueur"
                     })
-                continue
-
-            if command["type"] == "move":
-                # Mettre à jour la position (dans l'espace 512x512)
-                new_position = {
-                    "x": float(command["position"]["x"]),
-                    "y": float(command["position"]["y"]),
-                }
-                room.game_state[f"player{player_id}"]["position"] = new_position
-                
-                debug_aeroport("Player movement", {
-                    "player_id": player_id,
-                    "room_id": room_id,
-                    "new_position": new_position,
-                    "player_mode": room.game_state[f"player{player_id}"]["mode"]
-                })
-                
-                # Renvoyer l'image mise à jour comme dans main.py
-                update_state = {
-                    "type": "frame",
-                    "player_id": player_id,
-                    "position": room.game_state[f"player{player_id}"]["position"],
-                    "image_data": room.get_image_data(player_id, room.game_state[f"player{player_id}"]["mode"]) ,
-                }
-                await websocket.send_text(json.dumps(update_state))
-                debug_websocket("Movement update sent", {
-                    "player_id": player_id,
-                    "room_id": room_id
-                })
-                
-            elif command["type"] == "mode_change":
-                old_mode = room.game_state[f"player{player_id}"]["mode"]
-                new_mode = command["mode"]
-                room.game_state[f"player{player_id}"]["mode"] = new_mode
-                
-                debug_aeroport("Player mode change", {
-                    "player_id": player_id,
-                    "room_id": room_id,
-                    "old_mode": old_mode,
-                    "new_mode": new_mode
-                })
-                
-                # Envoyer la mise à jour
-                update_state = {
-                    "type": "game_state",
-                    "player_id": player_id,
-                    "game_state": room.game_state,
-                    "image_data": room.get_image_data(player_id, room.game_state[f"player{player_id}"]["mode"]),
-                    "game_started": room.game_state["game_started"]
-                }
-                await websocket.send_text(json.dumps(update_state))
-                debug_websocket("Mode change update sent", {
-                    "player_id": player_id,
-                    "room_id": room_id,
-                    "new_mode": new_mode
-                })
-                
-            elif command["type"] == "click":
-                debug_aeroport("Click event received", {
-                    "player_id": player_id,
-                    "room_id": room_id,
-                    "click_position": {"x": command["x"], "y": command["y"]},
-                    "player_mode": room.game_state[f"player{player_id}"]["mode"]
-                })
-                
-                if room.check_drone_detection(player_id, command["x"], command["y"]):
-                    old_score = room.game_state[f"player{player_id}"]["score"]
-                    room.game_state[f"player{player_id}"]["score"] += 1
-                    new_score = room.game_state[f"player{player_id}"]["score"]
-                    
-                    debug_aeroport("Drone detection successful - score updated", {
-                        "player_id": player_id,
-                        "room_id": room_id,
-                        "old_score": old_score,
-                        "new_score": new_score,
-                        "click_position": {"x": command["x"], "y": command["y"]}
-                    })
-                    
-                    # Notifier tous les joueurs de la salle
-                    await room.broadcast_to_room({
-                        "type": "drone_detected",
-                        "player_id": player_id,
-                        "position": command,
-                        "new_score": room.game_state[f"player{player_id}"]["score"]
-                    })
-                else:
-                    debug_aeroport("Drone detection failed", {
-                        "player_id": player_id,
-                        "room_id": room_id,
-                        "click_position": {"x": command["x"], "y": command["y"]}
-                    })
-            elif command["type"] == "set_name":
-                desired = str(command.get("name", "")).strip()
-                if len(desired) == 0:
-                    await websocket.send_text(json.dumps({"type": "name_status", "ok": False, "reason": "empty"}))
-                    continue
-                # Limiter longueur
-                desired = desired[:32]
-                # Unicité (insensible à la casse)
-                lower_names = {pid: n.lower() for pid, n in room.player_names.items()}
-                if any(n == desired.lower() for pid, n in lower_names.items() if pid != player_id):
-                    await websocket.send_text(json.dumps({"type": "name_status", "ok": False, "reason": "duplicate"}))
-                    continue
-                room.player_names[player_id] = desired
-                await websocket.send_text(json.dumps({"type": "name_status", "ok": True, "name": desired}))
-                    
-            elif command["type"] == "switch_player":
-                room.game_state["current_player"] = 2 if room.game_state["current_player"] == 1 else 1
-                await room.broadcast_to_room({
-                    "type": "player_switched",
-                    "current_player": room.game_state["current_player"]
-                })
-            
-            elif command["type"] == "get_alarm_state":
-                # Envoyer l'état actuel de l'alarme au client
-                debug_websocket("Alarm state requested", {
-                    "player_id": player_id,
-                    "room_id": room_id,
-                    "current_alarm_state": room.alarm_state
-                })
-                
-                await websocket.send_text(json.dumps({
-                    "type": "alarm_state",
-                    "active": room.alarm_state["active"],
-                    "remaining": room.alarm_state["remaining"]
-                }))
-            
-            elif command["type"] == "trigger_alarm":
-                # Déclencher l'alarme pour tous les joueurs de la salle
-                debug_websocket("Global alarm triggered", {
-                    "player_id": player_id,
-                    "room_id": room_id,
-                    "alarm_type": command.get("alarm_type", "audio_5")
-                })
-                
-                # Démarrer le timer d'alarme côté serveur
-                await room.start_alarm_timer()
-                
-                await room.broadcast_to_room({
-                    "type": "global_alarm",
-                    "triggered_by": player_id,
-                    "alarm_type": command.get("alarm_type", "audio_5"),
-                    "message": "Alerte système activée par un joueur"
-                })
-            
-            elif command["type"] == "stop_alarm":
-                # Arrêter l'alarme pour tous les joueurs de la salle
-                debug_websocket("Global alarm stopped", {
-                    "player_id": player_id,
-                    "room_id": room_id,
-                    "stopped_by": command.get("stopped_by", "Unknown")
-                })
-                
-                # Arrêter le timer d'alarme côté serveur
-                await room.stop_alarm_timer()
-                
-                await room.broadcast_to_room({
-                    "type": "global_alarm_stop",
-                    "stopped_by": command.get("stopped_by", "Unknown"),
-                    "message": "Alerte système désactivée par un joueur"
-                })
+            finally:
+                COMMAND_SECONDS.observe(time.perf_counter() - handled_started, handled_type)
             
     except WebSocketDisconnect:
-        debug_websocket("WebSocket disconnected", {
-            "player_id": player_id,
-            "room_id": room_id
-        })
+        if DEBUG_WEBSOCKET:
+            debug_websocket("WebSocket disconnected", {
+                "player_id": player_id,
+                "room_id": room_id
+            })
         if player_id in room.players:
             del room.players[player_id]
         if websocket in room.connections:
             room.connections.remove(websocket)
+        sync_lobby(room)
         if len(room.players) == 0:
-            debug_websocket("Room marked for deletion - no players left", {"room_id": room_id})
-            # Annuler toute tâche de suppression existante
-            if room_id in room_deletion_tasks:
-                room_deletion_tasks[room_id].cancel()
+            if DEBUG_WEBSOCKET:
+                debug_websocket("Room marked for deletion - no players left", {"room_id": room_id})
             # Attendre 30 secondes avant de supprimer la salle pour permettre la reconnexion
-            import asyncio
-            async def delayed_delete():
-                await asyncio.sleep(30)  # Attendre 30 secondes
-                if room_id in game_rooms and len(game_rooms[room_id].players) == 0:
-                    debug_websocket("Room deleted after delay - no players reconnected", {"room_id": room_id})
-                    # Nettoyer les tâches d'alarme avant de supprimer la salle
-                    if room_id in game_rooms and game_rooms[room_id].alarm_state["timer_task"]:
-                        game_rooms[room_id].alarm_state["timer_task"].cancel()
-                    del game_rooms[room_id]
-                    if room_id in room_deletion_tasks:
-                        del room_deletion_tasks[room_id]
-            room_deletion_tasks[room_id] = asyncio.create_task(delayed_delete())
+            schedule_room_deletion(room_id, "Room deleted after delay - no players reconnected")
     except Exception as e:
         # Autres erreurs WebSocket
-        print(f"❌ Erreur WebSocket inattendue: {e}")
-        debug_websocket("WebSocket error", {
-            "player_id": player_id,
-            "room_id": room_id,
-            "error": str(e)
-        })
+        console(f"❌ Erreur WebSocket inattendue: {e}")
+        if DEBUG_WEBSOCKET:
+            debug_websocket("WebSocket error", {
+                "player_id": player_id,
+                "room_id": room_id,
+                "error": str(e)
+            })
         if player_id in room.players:
             del room.players[player_id]
         if websocket in room.connections:
             room.connections.remove(websocket)
+        sync_lobby(room)
         if len(room.players) == 0:
-            debug_websocket("Room marked for deletion due to error - no players left", {"room_id": room_id})
-            # Annuler toute tâche de suppression existante
-            if room_id in room_deletion_tasks:
-                room_deletion_tasks[room_id].cancel()
+            if DEBUG_WEBSOCKET:
+                debug_websocket("Room marked for deletion due to error - no players left", {"room_id": room_id})
             # Attendre 30 secondes avant de supprimer la salle pour permettre la reconnexion
-            import asyncio
-            async def delayed_delete():
-                await asyncio.sleep(30)  # Attendre 30 secondes
-                if room_id in game_rooms and len(game_rooms[room_id].players) == 0:
-                    debug_websocket("Room deleted after delay due to error - no players reconnected", {"room_id": room_id})
-                    # Nettoyer les tâches d'alarme avant de supprimer la salle
-                    if room_id in game_rooms and game_rooms[room_id].alarm_state["timer_task"]:
-                        game_rooms[room_id].alarm_state["timer_task"].cancel()
-                    del game_rooms[room_id]
-                    if room_id in room_deletion_tasks:
-                        del room_deletion_tasks[room_id]
-            room_deletion_tasks[room_id] = asyncio.create_task(delayed_delete())
+            schedule_room_deletion(room_id, "Room deleted after delay due to error - no players reconnected")
+    finally:
+        if tick_client is not None:
+            room.ticker.remove(websocket)
+        if reader_task is not None:
+            reader_task.cancel()
+        if heartbeat_task is not None:
+            heartbeat_task.cancel()
+        heartbeats.discard(heartbeat)
+        if record is not None:
+            recorder.leave(room, player_id)
+        if heartbeat is not None and heartbeat.timed_out:
+            try:
+                await asyncio.wait_for(websocket.close(code=1001), BROADCAST_SEND_TIMEOUT)
+            except Exception:
+                pass
 
 if __name__ == "__main__":
     import uvicorn
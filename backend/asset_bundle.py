@@ -0,0 +1,127 @@
+"""Paquet binaire des calques de scène, projeté en mémoire (mmap) en lecture seule.
+
+Format : MAGIC, longueur (uint32) puis en-tête JSON (version, empreinte des sources,
+description des tableaux), puis les tableaux bruts, chacun aligné sur une page. Tous les
+processus qui projettent le même fichier partagent les mêmes pages physiques (cache du
+noyau) : rien n'est décodé ni copié au démarrage.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+from typing import Dict, Mapping, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"WSASSET\n"
+BUNDLE_VERSION = 1
+ALIGN = mmap.PAGESIZE
+_HEADER_LEN = struct.Struct("<I")
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_fingerprint(paths: Mapping[str, str]) -> Dict[str, Dict]:
+    """Taille, date et empreinte du contenu de chaque image source"""
+    fingerprint = {}
+    for name, path in paths.items():
+        st = os.stat(path)
+        fingerprint[name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": _file_hash(path)}
+    return fingerprint
+
+
+def sources_changed(recorded: Mapping[str, Dict], paths: Mapping[str, str], params: Dict,
+                    recorded_params: Dict) -> bool:
+    """Vrai si une source a changé depuis la compilation ; le contenu n'est relu que si taille ou date diffèrent"""
+    if recorded_params != params or set(recorded) != set(paths):
+        return True
+    for name, path in paths.items():
+        try:
+            st = os.stat(path)
+        except OSError:
+            return True
+        entry = recorded[name]
+        if st.st_size != entry["size"]:
+            return True
+        if st.st_mtime_ns != entry["mtime_ns"] and _file_hash(path) != entry["hash"]:
+            return True
+    return False
+
+
+def write_bundle(path: str, arrays: Mapping[str, np.ndarray], sources: Dict, params: Dict) -> int:
+    """Écrit le paquet de façon atomique ; retourne sa taille en octets"""
+    layout = {}
+    written: Dict[int, int] = {}  # id(tableau) -> offset : un tableau partagé par deux clés n'est écrit qu'une fois
+    offset = 0
+    for key, arr in arrays.items():
+        start = written.get(id(arr))
+        if start is None:
+            start = written[id(arr)] = offset
+            offset = _align(offset + arr.nbytes)
+        layout[key] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": start, "nbytes": int(arr.nbytes)}
+    header = json.dumps({
+        "version": BUNDLE_VERSION, "sources": sources, "params": params, "arrays": layout,
+    }, sort_keys=True).encode()
+    data_start = _align(len(MAGIC) + _HEADER_LEN.size + len(header))
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + _HEADER_LEN.pack(len(header)) + header)
+        for key, arr in arrays.items():
+            if written.pop(id(arr), None) is not None:
+                f.seek(data_start + layout[key]["offset"])
+                f.write(np.ascontiguousarray(arr).tobytes())
+        f.truncate(data_start + offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return data_start + offset
+
+
+def read_header(path: str) -> Optional[Dict]:
+    """En-tête du paquet, ou None s'il est absent, illisible ou d'une autre version du format"""
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            (length,) = _HEADER_LEN.unpack(f.read(_HEADER_LEN.size))
+            header = json.loads(f.read(length))
+    except (OSError, ValueError, struct.error):
+        return None
+    if header.get("version") != BUNDLE_VERSION:
+        return None
+    header["data_start"] = _align(len(MAGIC) + _HEADER_LEN.size + length)
+    return header
+
+
+def open_bundle(path: str) -> Tuple[Dict[str, np.ndarray], Dict]:
+    """Projette le paquet en lecture seule ; les tableaux sont des vues sur le mmap"""
+    header = read_header(path)
+    if header is None:
+        raise ValueError(f"Paquet d'assets invalide: {path}")
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    arrays = {}
+    views: Dict[tuple, np.ndarray] = {}
+    for key, spec in header["arrays"].items():
+        view_key = (spec["offset"], spec["dtype"], tuple(spec["shape"]))
+        if view_key not in views:
+            count = int(np.prod(spec["shape"]))
+            views[view_key] = np.frombuffer(mapped, dtype=np.dtype(spec["dtype"]), count=count,
+                                            offset=header["data_start"] + spec["offset"]).reshape(spec["shape"])
+        arrays[key] = views[view_key]
+    return arrays, header
@@ -0,0 +1,341 @@
+"""Registre partagé des images de scène.
+
+Les calques (pleine résolution, 512x512) et les tables de détection sont compilés une
+fois dans un paquet binaire (asset_bundle), recompilé dès qu'une image source change, puis
+projeté en mémoire en lecture seule : toutes les salles et tous les processus partagent
+les mêmes pages. Sans paquet (ASSET_BUNDLE_PATH vide), les PNG sont décodés une fois par
+processus.
+"""
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
+
+import numpy as np
+from PIL import Image
+
+from asset_bundle import open_bundle, read_header, source_fingerprint, sources_changed, write_bundle
+from debuglog import console
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus pour la compilation
+    fcntl = None
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGES_DIR = os.path.join(ROOT_DIR, "images")
+# Espace d'affichage de référence : positions de la loupe, clics et état de jeu y sont exprimés
+TARGET_SIZE = (512, 512)
+DISPLAY_SIZE = TARGET_SIZE[0]
+
+
+def _parse_levels(spec: str):
+    levels = {DISPLAY_SIZE}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            if int(item) > 0:
+                levels.add(int(item))
+        except ValueError:
+            pass
+    return tuple(sorted(levels))
+
+
+# Pyramide : côtés (px) des frames proposées aux clients ; le niveau de référence est toujours présent
+PYRAMID_LEVELS = _parse_levels(os.getenv('PYRAMID_LEVELS', '256,512,1024'))
+# Paquet précompilé des calques (chemin vide = décodage des PNG à chaque démarrage)
+ASSET_BUNDLE_PATH = os.getenv('ASSET_BUNDLE_PATH', os.path.join(ROOT_DIR, 'data', 'scene.bundle'))
+
+# Clé du calque -> fichier source dans images/
+SCENE_FILES = {
+    "base": "sky.png",
+    "nvg": "sky_night_vision.png",
+    "thermal": "sky_thermal.png",
+    "thermal_nodrone": "sky_non_dron_thermal.png",
+}
+
+# Clé du calque pleine résolution -> clé de la version 512x512 (les autres niveaux : level_key)
+SMALL_KEYS = {
+    "base": "base_small",
+    "nvg": "nvg_small",
+    "thermal": "thermal_small",
+    "thermal_nodrone": "thermal_small_nodrone",
+}
+
+
+# Détection du drone : carré de (2k+1)x(2k+1) pixels autour du clic, seuil de pixels chauds
+DETECTION_RADIUS = 6
+DETECTION_THRESHOLD = 5
+# Calques dont la table des sommes est précalculée dans le paquet
+DETECTOR_LAYERS = ("thermal",)
+# Paramètres de compilation : un changement (taille, heuristique du masque) invalide le paquet
+MASK_VERSION = 1
+
+
+def _freeze(arr: np.ndarray) -> np.ndarray:
+    """Rend un tableau contigu et non modifiable"""
+    arr = np.ascontiguousarray(arr, dtype=np.uint8)
+    arr.setflags(write=False)
+    return arr
+
+
+def drone_pixel_mask(img: np.ndarray) -> np.ndarray:
+    """Pixels chauds (thermique, triangle jaune du drone) d'une image RGB entière ; identique pixel
+    par pixel à l'ancienne heuristique GameRoom.is_drone_pixel (voir tests/test_detection.py)
+    """
+    px = img.astype(np.float32) / 255.0
+    r, g, b = px[..., 0], px[..., 1], px[..., 2]
+    bright = (r + g + b) / 3.0 > 0.4
+    warm = (r > 0.5) & (g > 0.3) & (b < 0.6) & (r >= g * 0.8)
+    yellow_orange = (r > 0.6) & (g > 0.4) & (b < 0.4)
+    return bright & (warm | yellow_orange)
+
+
+def summed_area_table(mask: np.ndarray) -> np.ndarray:
+    """Table des sommes cumulées avec une ligne et une colonne de zéros en tête"""
+    sat = np.zeros((mask.shape[0] + 1, mask.shape[1] + 1), dtype=np.int32)
+    np.cumsum(np.cumsum(mask, axis=0, dtype=np.int32), axis=1, out=sat[1:, 1:])
+    sat.setflags(write=False)
+    return sat
+
+
+def _slice_bounds(lo: np.ndarray, hi: np.ndarray, n: int):
+    """Reproduit la normalisation des bornes d'un slice Python seq[lo:hi] de longueur n"""
+    lo = np.where(lo < 0, np.maximum(lo + n, 0), np.minimum(lo, n))
+    hi = np.where(hi < 0, np.maximum(hi + n, 0), np.minimum(hi, n))
+    return lo, np.maximum(hi, lo)
+
+
+class DroneDetector:
+    """Compte les pixels chauds autour d'un clic en temps constant via une table des sommes"""
+
+    def __init__(self, thermal: np.ndarray, display_shape, radius: int = DETECTION_RADIUS,
+                 threshold: int = DETECTION_THRESHOLD, sat: Optional[np.ndarray] = None):
+        self.height, self.width = thermal.shape[:2]
+        # Les clics arrivent dans l'espace d'affichage (512x512)
+        self.sx = float(self.width) / float(display_shape[1])
+        self.sy = float(self.height) / float(display_shape[0])
+        self.radius = radius
+        self.threshold = threshold
+        self.sat = sat if sat is not None else summed_area_table(drone_pixel_mask(thermal))
+
+    def to_base(self, x, y):
+        """Convertit des coordonnées d'affichage en coordonnées de l'image d'origine"""
+        xb = np.rint(np.asarray(x, dtype=np.float64) * self.sx).astype(np.int64)
+        yb = np.rint(np.asarray(y, dtype=np.float64) * self.sy).astype(np.int64)
+        return xb, yb
+
+    def count_many(self, xs, ys) -> np.ndarray:
+        """Nombre de pixels chauds autour de chaque clic (x, y) donné en espace d'affichage"""
+        xb, yb = self.to_base(xs, ys)
+        k = self.radius
+        y0, y1 = _slice_bounds(np.maximum(yb - k, 0), np.minimum(yb + k + 1, self.height), self.height)
+        x0, x1 = _slice_bounds(np.maximum(xb - k, 0), np.minimum(xb + k + 1, self.width), self.width)
+        sat = self.sat
+        return sat[y1, x1] - sat[y0, x1] - sat[y1, x0] + sat[y0, x0]
+
+    def detect_many(self, xs, ys) -> np.ndarray:
+        """Résultat de détection (seuil inclus) pour un lot de clics"""
+        return self.count_many(xs, ys) >= self.threshold
+
+    def count(self, x, y) -> int:
+        return int(self.count_many(x, y))
+
+
+def level_key(small_key: str, size: int) -> str:
+    """Clé d'un calque redimensionné au niveau `size` de la pyramide ("base_small@1024")"""
+    return small_key if size == DISPLAY_SIZE else f"{small_key}@{size}"
+
+
+def nearest_level(requested, levels=PYRAMID_LEVELS) -> int:
+    """Plus petit niveau couvrant la taille demandée (le plus grand à défaut) ; référence si invalide"""
+    try:
+        requested = int(float(requested))
+    except (TypeError, ValueError):
+        return DISPLAY_SIZE
+    if requested <= 0:
+        return DISPLAY_SIZE
+    return next((size for size in levels if size >= requested), levels[-1])
+
+
+def source_paths(images_dir: str = IMAGES_DIR, files: Mapping[str, str] = SCENE_FILES) -> Dict[str, str]:
+    return {key: os.path.join(images_dir, filename) for key, filename in files.items()}
+
+
+def decode_scene(images_dir: str = IMAGES_DIR, levels=PYRAMID_LEVELS,
+                 files: Mapping[str, str] = SCENE_FILES) -> Dict[str, np.ndarray]:
+    """Décode les PNG de la scène et calcule leurs versions redimensionnées à chaque niveau"""
+    images: Dict[str, np.ndarray] = {}
+    for key, path in source_paths(images_dir, files).items():
+        images[key] = np.asarray(Image.open(path).convert("RGB"))
+
+    # S'assurer que toutes les images ont la même taille que la base
+    base_shape = images["base"].shape
+    for key, arr in images.items():
+        if arr.shape != base_shape:
+            images[key] = np.resize(arr, base_shape)
+
+    for key, small_key in SMALL_KEYS.items():
+        source = Image.fromarray(images[key].astype("uint8"))
+        for size in levels:
+            if (size, size) == source.size:
+                # Niveau à la taille d'origine : même tableau, stocké une seule fois
+                images[level_key(small_key, size)] = images[key]
+            else:
+                images[level_key(small_key, size)] = np.asarray(source.resize((size, size), Image.Resampling.LANCZOS))
+    return images
+
+
+def bundle_params(levels=PYRAMID_LEVELS) -> Dict:
+    return {"levels": list(levels), "mask_version": MASK_VERSION, "detector_layers": list(DETECTOR_LAYERS)}
+
+
+def compile_bundle(path: str, images_dir: str = IMAGES_DIR, levels=PYRAMID_LEVELS,
+                   files: Mapping[str, str] = SCENE_FILES) -> int:
+    """Compile les calques et les tables de détection dans un paquet ; retourne sa taille"""
+    sources = source_paths(images_dir, files)
+    fingerprint = source_fingerprint(sources)
+    arrays = {key: np.ascontiguousarray(arr, dtype=np.uint8)
+              for key, arr in decode_scene(images_dir, levels, files).items()}
+    for layer in DETECTOR_LAYERS:
+        arrays[f"sat:{layer}"] = summed_area_table(drone_pixel_mask(arrays[layer]))
+    return write_bundle(path, arrays, fingerprint, bundle_params(levels))
+
+
+def bundle_is_stale(path: str, images_dir: str = IMAGES_DIR, levels=PYRAMID_LEVELS,
+                    files: Mapping[str, str] = SCENE_FILES) -> bool:
+    header = read_header(path)
+    return header is None or sources_changed(header["sources"], source_paths(images_dir, files),
+                                             bundle_params(levels), header["params"])
+
+
+def ensure_bundle(path: str, images_dir: str = IMAGES_DIR, levels=PYRAMID_LEVELS,
+                  files: Mapping[str, str] = SCENE_FILES) -> bool:
+    """Recompile le paquet s'il manque ou si une source a changé ; vrai s'il a été recompilé.
+    Un verrou de fichier évite que plusieurs workers le compilent en même temps.
+    """
+    if not bundle_is_stale(path, images_dir, levels, files):
+        return False
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(f"{path}.lock", "w") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        # Un autre processus a pu compiler pendant l'attente du verrou
+        if not bundle_is_stale(path, images_dir, levels, files):
+            return False
+        start = time.perf_counter()
+        size = compile_bundle(path, images_dir, levels, files)
+        console(f"📦 Paquet d'assets compilé en {(time.perf_counter() - start) * 1000.0:.0f} ms "
+                f"({size / 1e6:.1f} Mo): {path}")
+    return True
+
+
+class AssetRegistry:
+    """Charge paresseusement les calques d'une scène et les partage entre les salles"""
+
+    def __init__(self, images_dir: str = IMAGES_DIR, levels=PYRAMID_LEVELS, bundle_path: str = ASSET_BUNDLE_PATH,
+                 files: Mapping[str, str] = SCENE_FILES, scene_id: str = "sky"):
+        self.images_dir = images_dir
+        self.levels = levels
+        self.bundle_path = bundle_path
+        self.files = dict(files)
+        self.scene_id = scene_id
+        self._images: Mapping[str, np.ndarray] = None
+        self._lock = threading.Lock()
+        self._detectors: Dict[str, DroneDetector] = {}
+        # Tables des sommes lues dans le paquet, par calque
+        self._sats: Dict[str, np.ndarray] = {}
+        self.source = None
+        self.load_time_ms = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self._images is not None
+
+    def get(self) -> Mapping[str, np.ndarray]:
+        """Retourne les calques partagés, en les chargeant au premier appel"""
+        if self._images is None:
+            with self._lock:
+                if self._images is None:
+                    self._images = self._load()
+        return self._images
+
+    def detector(self, layer: str = "thermal") -> DroneDetector:
+        """Détecteur précalculé pour un calque thermique, construit une seule fois"""
+        detector = self._detectors.get(layer)
+        if detector is None:
+            images = self.get()
+            with self._lock:
+                detector = self._detectors.get(layer)
+                if detector is None:
+                    detector = DroneDetector(images[layer], images[SMALL_KEYS[layer]].shape, sat=self._sats.get(layer))
+                    self._detectors[layer] = detector
+        return detector
+
+    def _load(self) -> Mapping[str, np.ndarray]:
+        start = time.perf_counter()
+        frozen = None
+        if self.bundle_path:
+            try:
+                frozen = self._load_bundle()
+            except (OSError, ValueError) as e:
+                console(f"⚠️ Paquet d'assets indisponible ({e}) : décodage des images sources")
+        if frozen is None:
+            frozen = {key: _freeze(arr) for key, arr in decode_scene(self.images_dir, self.levels, self.files).items()}
+            self.source = "decoded"
+        self.load_time_ms = (time.perf_counter() - start) * 1000.0
+        console(f"Images de la scène {self.scene_id} chargées en {self.load_time_ms:.1f} ms ({self.nbytes_of(frozen) / 1e6:.1f} Mo partagés, "
+                f"{self.source})")
+        return MappingProxyType(frozen)
+
+    def _load_bundle(self) -> Dict[str, np.ndarray]:
+        """Calques projetés depuis le paquet (recompilé au besoin), en lecture seule"""
+        ensure_bundle(self.bundle_path, self.images_dir, self.levels, self.files)
+        arrays, _ = open_bundle(self.bundle_path)
+        self._sats = {key.split(":", 1)[1]: arr for key, arr in arrays.items() if key.startswith("sat:")}
+        self.source = "bundle"
+        return {key: arr for key, arr in arrays.items() if not key.startswith("sat:")}
+
+    def unload(self) -> int:
+        """Oublie les calques et les détecteurs (rechargés au prochain get) ; retourne les octets libérés"""
+        with self._lock:
+            freed = self.nbytes
+            self._images = None
+            self._detectors = {}
+            self._sats = {}
+        return freed
+
+    @property
+    def nbytes(self) -> int:
+        images = self._images
+        if images is None:
+            return 0
+        return self.nbytes_of(images) + int(sum(d.sat.nbytes for d in self._detectors.values()))
+
+    @staticmethod
+    def nbytes_of(images: Mapping[str, np.ndarray]) -> int:
+        # Un même tableau peut servir deux clés (niveau à la taille d'origine) : le compter une fois
+        unique = {id(arr): arr for arr in images.values()}
+        return int(sum(arr.nbytes for arr in unique.values()))
+
+    def stats(self) -> Dict:
+        """Empreinte mémoire et temps de chargement du registre"""
+        if self._images is None:
+            return {"loaded": False, "nbytes": 0, "load_time_ms": 0.0, "layers": {}}
+        detectors_nbytes = sum(d.sat.nbytes for d in self._detectors.values())
+        return {
+            "loaded": True,
+            "source": self.source,
+            "bundle_path": self.bundle_path if self.source == "bundle" else None,
+            "nbytes": self.nbytes_of(self._images) + detectors_nbytes,
+            "detectors_nbytes": int(detectors_nbytes),
+            "load_time_ms": round(self.load_time_ms, 2),
+            "levels": list(self.levels),
+            "layers": {key: {"shape": list(arr.shape), "nbytes": int(arr.nbytes)} for key, arr in self._images.items()},
+        }
+
+
+# Registre unique du processus
+asset_registry = AssetRegistry()
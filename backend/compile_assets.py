@@ -0,0 +1,65 @@
+"""Compilation hors ligne des paquets d'assets des scènes.
+
+    python backend/compile_assets.py                  # recompile seulement les paquets périmés
+    python backend/compile_assets.py --force          # recompile dans tous les cas
+    python backend/compile_assets.py --scene harbor   # une seule scène (répétable)
+
+Toutes les scènes du catalogue sont compilées : la scène historique (ASSET_BUNDLE_PATH)
+et celles du manifeste SCENES_MANIFEST (data/scenes/<id>.bundle). Le serveur recompile
+aussi un paquet au premier chargement de sa scène quand il est absent ou périmé ; ce
+script permet de les préparer à l'avance (image Docker, déploiement).
+"""
+import argparse
+import sys
+import time
+
+from assets import ASSET_BUNDLE_PATH, IMAGES_DIR, bundle_is_stale, compile_bundle
+from debuglog import console, writer
+from scenes import DEFAULT_SCENE, SCENES_MANIFEST, SceneCatalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile les images des scènes en paquets binaires projetables")
+    parser.add_argument("--output", default=ASSET_BUNDLE_PATH, help="Paquet de la scène historique")
+    parser.add_argument("--images", default=IMAGES_DIR, help="Images de la scène historique")
+    parser.add_argument("--manifest", default=SCENES_MANIFEST)
+    parser.add_argument("--scene", action="append", help="Ne compiler que cette scène (répétable)")
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+    if not args.output:
+        parser.error("ASSET_BUNDLE_PATH est vide : préciser --output")
+
+    catalog = SceneCatalog.from_manifest(args.manifest)
+    scene_ids = [scene["id"] for scene in catalog.listing()]
+    unknown = set(args.scene or ()) - set(scene_ids)
+    if unknown:
+        parser.error(f"Scène inconnue: {', '.join(sorted(unknown))}")
+    failed = 0
+    for scene_id in scene_ids:
+        if args.scene and scene_id not in args.scene:
+            continue
+        registry = catalog.registry(scene_id)
+        if scene_id == DEFAULT_SCENE:
+            output, images_dir = args.output, args.images
+        else:
+            output, images_dir = registry.bundle_path, registry.images_dir
+        if not output:
+            console(f"Scène {scene_id} sans paquet (ASSET_BUNDLE_PATH vide) : ignorée")
+            continue
+        try:
+            if not args.force and not bundle_is_stale(output, images_dir, registry.levels, registry.files):
+                console(f"Paquet à jour: {output}")
+                continue
+            start = time.perf_counter()
+            size = compile_bundle(output, images_dir, registry.levels, registry.files)
+        except (OSError, ValueError) as e:
+            console(f"❌ Scène {scene_id} non compilée: {e}")
+            failed += 1
+            continue
+        console(f"📦 {output} compilé en {(time.perf_counter() - start) * 1000.0:.0f} ms ({size / 1e6:.1f} Mo)")
+    writer.flush()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""Journalisation de débogage sans coût quand elle est désactivée.
+
+Chaque catégorie a un drapeau calculé une fois au démarrage (DEBUG_WEBSOCKET, ...).
+Les appels sont écrits `if DEBUG_WEBSOCKET: debug_websocket("...", {...})` : quand la
+catégorie est coupée, le dictionnaire de données n'est jamais construit.
+
+Les messages activés, ainsi que les messages console (ex-`print`), sont déposés dans
+une file et écrits par un thread de fond : la boucle d'événements ne fait ni
+json.dumps ni écriture de fichier. Un échantillonnage par catégorie est possible :
+DEBUG_SAMPLING="IMAGE-PROCESSING=0.05,WEBSOCKET=0.5".
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+DEBUG_MODE = os.getenv('DEBUG_MODE', 'false').lower() == 'true'
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+# Catégories actives en mode debug (toutes par défaut) et taux d'échantillonnage par catégorie
+DEBUG_CATEGORIES = os.getenv('DEBUG_CATEGORIES', 'all')
+DEBUG_SAMPLING = os.getenv('DEBUG_SAMPLING', '')
+DEBUG_QUEUE_SIZE = int(os.getenv('DEBUG_QUEUE_SIZE', '10000'))
+
+CATEGORIES = ("AEROPORT", "WEBSOCKET", "GAME-EMBED", "IMAGE-PROCESSING")
+
+
+def _parse_sampling(spec: str) -> Dict[str, float]:
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        category, _, rate = item.partition("=")
+        try:
+            rates[category.strip().upper()] = max(0.0, min(1.0, float(rate)))
+        except ValueError:
+            pass
+    return rates
+
+
+def _category_enabled(category: str) -> bool:
+    if not DEBUG_MODE:
+        return False
+    wanted = {c.strip().upper() for c in DEBUG_CATEGORIES.split(",")}
+    return "ALL" in wanted or category in wanted
+
+
+DEBUG_AEROPORT = _category_enabled("AEROPORT")
+DEBUG_WEBSOCKET = _category_enabled("WEBSOCKET")
+DEBUG_GAME_EMBED = _category_enabled("GAME-EMBED")
+DEBUG_IMAGE_PROCESSING = _category_enabled("IMAGE-PROCESSING")
+
+SAMPLING = _parse_sampling(DEBUG_SAMPLING)
+
+
+class BackgroundWriter:
+    """Écrit les journaux depuis un thread dédié ; la file est bornée et ne bloque jamais l'appelant"""
+
+    def __init__(self, max_size: int = 10000):
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._logger: Optional[logging.Logger] = None
+        self.written = 0
+        self.dropped = 0
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                    self._thread.start()
+
+    def submit(self, record) -> None:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _debug_logger(self) -> logging.Logger:
+        if self._logger is None:
+            os.makedirs('logs', exist_ok=True)
+            logging.basicConfig(
+                level=getattr(logging, LOG_LEVEL.upper()),
+                format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                handlers=[
+                    logging.FileHandler('logs/backend_debug.log'),
+                    logging.StreamHandler()
+                ]
+            )
+            self._logger = logging.getLogger("backend")
+        return self._logger
+
+    def _run(self) -> None:
+        while True:
+            record = self._queue.get()
+            try:
+                if record is None:
+                    return
+                timestamp, category, message, data = record
+                if category is None:
+                    sys.stdout.write(f"{message}\n")
+                    sys.stdout.flush()
+                else:
+                    log_message = f"[{datetime.fromtimestamp(timestamp).isoformat()}] [BACKEND-{category}] {message}"
+                    if data:
+                        log_message = f"{log_message} | Data: {json.dumps(data, default=str)}"
+                    self._debug_logger().info(log_message)
+                self.written += 1
+            except Exception as e:
+                # Données modifiées pendant la sérialisation, disque plein... : ne jamais tuer le thread
+                sys.stderr.write(f"log-writer: {e}\n")
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout: float = 2.0) -> None:
+        """Attend que les messages en file soient écrits (arrêt du serveur, tests)"""
+        if self._thread is None:
+            return
+        done = threading.Event()
+
+        def wait_queue():
+            self._queue.join()
+            done.set()
+        threading.Thread(target=wait_queue, daemon=True).start()
+        done.wait(timeout)
+
+    def stats(self) -> Dict:
+        return {"queued": self._queue.qsize(), "written": self.written, "dropped": self.dropped}
+
+
+writer = BackgroundWriter(DEBUG_QUEUE_SIZE)
+atexit.register(writer.flush)
+
+
+def debug_log(category: str, message: str, data=None) -> None:
+    """Dépose un message de debug ; à appeler derrière le drapeau de la catégorie"""
+    rate = SAMPLING.get(category)
+    if rate is not None and random.random() >= rate:
+        return
+    writer.submit((datetime.now().timestamp(), category, message, data))
+
+
+def console(message: str) -> None:
+    """Message opérationnel toujours affiché (remplace print), écrit hors de la boucle"""
+    writer.submit((datetime.now().timestamp(), None, message, None))
+
+
+def debug_aeroport(message, data=None): debug_log('AEROPORT', message, data)
+def debug_websocket(message, data=None): debug_log('WEBSOCKET', message, data)
+def debug_game_embed(message, data=None): debug_log('GAME-EMBED', message, data)
+def debug_image_processing(message, data=None): debug_log('IMAGE-PROCESSING', message, data)
@@ -0,0 +1,154 @@
+"""Encodeurs de frames (JPEG, WebP, PNG) et adaptation de la qualité par connexion.
+
+Le client annonce ses préférences à la connexion (/ws/{room_id}?format=webp&quality=70).
+Le serveur dégrade ensuite la qualité quand l'envoi des frames ralentit ou que les
+commandes s'accumulent, puis la remonte progressivement quand le lien se libère.
+"""
+import io
+import time
+from typing import Dict, Mapping, NamedTuple
+
+import numpy as np
+from PIL import Image, features
+
+FORMAT_JPEG = "jpeg"
+FORMAT_WEBP = "webp"
+FORMAT_PNG = "png"
+
+# Format -> (nom PIL, type MIME)
+ENCODERS = {
+    FORMAT_JPEG: ("JPEG", "image/jpeg"),
+    FORMAT_WEBP: ("WEBP", "image/webp"),
+    FORMAT_PNG: ("PNG", "image/png"),
+}
+
+LOSSY_FORMATS = (FORMAT_JPEG, FORMAT_WEBP)
+QUALITY_STEP = 5
+
+# Effort de compression par frame, borné : un client qui demande PNG ou WebP ne doit pas
+# monopoliser le pool de rendu (WebP method 6 ~50 ms, PNG optimize ~2 s contre ~4 ms en JPEG)
+PNG_LEVEL_OPTIMIZED = 3
+PNG_LEVEL_FAST = 1
+WEBP_METHOD_OPTIMIZED = 4
+WEBP_METHOD_FAST = 2
+
+
+class EncodeParams(NamedTuple):
+    """Réglages d'encodage d'une frame (hashable : fait partie de la clé du cache)"""
+    format: str = FORMAT_JPEG
+    quality: int = 85
+    optimize: bool = True
+
+
+DEFAULT_PARAMS = EncodeParams()
+
+
+def available_formats():
+    formats = [FORMAT_JPEG, FORMAT_PNG]
+    if features.check("webp"):
+        formats.insert(1, FORMAT_WEBP)
+    return formats
+
+
+def mime_type(fmt: str) -> str:
+    return ENCODERS[fmt][1]
+
+
+def encode(img_np: np.ndarray, params: EncodeParams = DEFAULT_PARAMS) -> bytes:
+    """Encode une image RGB selon les réglages donnés"""
+    pil_img = Image.fromarray(img_np.astype('uint8'))
+    buffer = io.BytesIO()
+    if params.format == FORMAT_PNG:
+        pil_img.save(buffer, format='PNG', compress_level=PNG_LEVEL_OPTIMIZED if params.optimize else PNG_LEVEL_FAST)
+    elif params.format == FORMAT_WEBP:
+        pil_img.save(buffer, format='WEBP', quality=params.quality,
+                     method=WEBP_METHOD_OPTIMIZED if params.optimize else WEBP_METHOD_FAST)
+    else:
+        pil_img.save(buffer, format='JPEG', quality=params.quality, optimize=params.optimize)
+    return buffer.getvalue()
+
+
+def _snap_quality(quality: int) -> int:
+    """Aligne la qualité sur des paliers pour limiter le nombre de variantes en cache"""
+    return max(QUALITY_STEP, min(95, int(round(quality / QUALITY_STEP)) * QUALITY_STEP))
+
+
+def negotiate(query: Mapping[str, str], default: EncodeParams = DEFAULT_PARAMS) -> EncodeParams:
+    """Réglages demandés par le client ; les valeurs invalides retombent sur les défauts"""
+    fmt = str(query.get("format", default.format)).lower()
+    if fmt == "jpg":
+        fmt = FORMAT_JPEG
+    if fmt not in available_formats():
+        fmt = default.format
+    try:
+        quality = _snap_quality(int(query.get("quality", default.quality)))
+    except (TypeError, ValueError):
+        quality = default.quality
+    optimize = str(query.get("optimize", "1" if default.optimize else "0")).lower() not in ("0", "false", "no")
+    return EncodeParams(fmt, quality, optimize)
+
+
+class AdaptiveQuality:
+    """Ajuste les réglages d'une connexion selon le temps d'envoi mesuré et la file d'entrée"""
+
+    def __init__(self, preferred: EncodeParams, min_quality: int = 40, target_send_ms: float = 40.0,
+                 max_queue_depth: int = 4, interval_s: float = 0.5):
+        self.preferred = preferred
+        self.params = preferred
+        self.min_quality = min(_snap_quality(min_quality), preferred.quality)
+        self.target_send_s = target_send_ms / 1000.0
+        self.max_queue_depth = max_queue_depth
+        self.interval_s = interval_s
+        self.send_ewma_s = 0.0
+        self.downgrades = 0
+        self.upgrades = 0
+        self._last_change = 0.0
+
+    @property
+    def degraded(self) -> bool:
+        """Vrai tant que les réglages sont en dessous de ceux demandés par le client"""
+        return self.params != self.preferred
+
+    def record(self, send_seconds: float, queue_depth: int = 0) -> EncodeParams:
+        """Enregistre la durée d'un envoi et adapte les réglages si nécessaire"""
+        self.send_ewma_s = send_seconds if self.send_ewma_s == 0.0 else 0.8 * self.send_ewma_s + 0.2 * send_seconds
+        now = time.monotonic()
+        if now - self._last_change < self.interval_s:
+            return self.params
+        if self.send_ewma_s > self.target_send_s or queue_depth > self.max_queue_depth:
+            self._degrade()
+            self._last_change = now
+        elif self.send_ewma_s < self.target_send_s / 2 and queue_depth == 0 and self.params != self.preferred:
+            self._improve()
+            self._last_change = now
+        return self.params
+
+    def _degrade(self):
+        p = self.params
+        # D'abord renoncer à l'optimisation (CPU), puis baisser la qualité par paliers
+        if p.optimize:
+            self.params = p._replace(optimize=False)
+        elif p.format in LOSSY_FORMATS and p.quality > self.min_quality:
+            self.params = p._replace(quality=max(self.min_quality, p.quality - 2 * QUALITY_STEP))
+        else:
+            return
+        self.downgrades += 1
+
+    def _improve(self):
+        p = self.params
+        if p.format in LOSSY_FORMATS and p.quality < self.preferred.quality:
+            self.params = p._replace(quality=min(self.preferred.quality, p.quality + QUALITY_STEP))
+        elif p.optimize != self.preferred.optimize:
+            self.params = p._replace(optimize=self.preferred.optimize)
+        else:
+            return
+        self.upgrades += 1
+
+    def stats(self) -> Dict:
+        return {
+            "preferred": self.preferred._asdict(),
+            "current": self.params._asdict(),
+            "send_ewma_ms": round(self.send_ewma_s * 1000.0, 2),
+            "downgrades": self.downgrades,
+            "upgrades": self.upgrades,
+        }
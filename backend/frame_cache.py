@@ -0,0 +1,75 @@
+"""Cache LRU des images encodées, partagé par toutes les salles.
+
+Les frames dépendent uniquement du mode, de la variante visible (thermique avec ou
+sans drone) et de la position de la loupe : des joueurs différents qui survolent la
+même zone réutilisent donc les mêmes octets encodés.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+
+class FrameCache:
+    """LRU borné par un budget mémoire (en octets encodés)"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, grid: int = 4):
+        self.max_bytes = max(0, int(max_bytes))
+        self.grid = max(1, int(grid))
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def snap(self, value: float) -> int:
+        """Aligne une coordonnée de loupe sur la grille du cache"""
+        return int(round(float(value) / self.grid)) * self.grid
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: Hashable, data: bytes) -> None:
+        size = len(data)
+        if not self.enabled or size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= len(previous)
+            self._entries[key] = data
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "nbytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "grid": self.grid,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
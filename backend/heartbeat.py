@@ -0,0 +1,110 @@
+"""Battement de cœur applicatif des WebSockets de jeu.
+
+Le serveur envoie périodiquement {"type": "ping", "id": n} ; le client répond
+{"type": "pong", "id": n}. Tout message reçu prouve que le client est vivant ; sans
+nouvelles depuis plus de `timeout` secondes, la connexion est déclarée morte (TCP à
+moitié ouvert, onglet gelé...) et libérée comme une déconnexion normale. Les pongs
+mesurent le temps d'aller-retour (RTT) de chaque connexion.
+
+Le délai ne s'applique qu'aux clients qui ont déjà répondu à un ping : un ancien client
+qui ne connaît pas le pong et se contente de regarder n'est jamais déconnecté.
+"""
+import asyncio
+import json
+import time
+from typing import Callable, Dict, Optional
+
+from metrics import HEARTBEAT_TIMEOUTS, WEBSOCKET_RTT_SECONDS
+
+# Pings sans réponse conservés (au-delà, le plus ancien est oublié)
+MAX_OUTSTANDING = 8
+
+
+class Heartbeat:
+    def __init__(self, interval: float = 15.0, timeout: float = 45.0, label: str = "",
+                 on_rtt: Optional[Callable[[float], None]] = None):
+        self.interval = interval
+        self.timeout = timeout
+        self.label = label
+        # Appelé à chaque nouvelle mesure (ex. FramePacer.set_rtt)
+        self.on_rtt = on_rtt
+        self.last_seen = time.monotonic()
+        self.rtt_s: Optional[float] = None       # moyenne glissante
+        self.rtt_last_s: Optional[float] = None
+        self.rtt_min_s: Optional[float] = None
+        self.pings = 0
+        self.pongs = 0
+        self.timed_out = False
+        self._next_id = 0
+        self._outstanding: Dict[int, float] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0 and self.timeout > 0
+
+    def touch(self) -> None:
+        """Un message du client vient d'arriver"""
+        self.last_seen = time.monotonic()
+
+    def pong(self, message: Dict) -> None:
+        self.touch()
+        sent = self._outstanding.pop(message.get("id"), None)
+        if sent is None:
+            return
+        rtt = self.last_seen - sent
+        self.pongs += 1
+        self.rtt_last_s = rtt
+        self.rtt_min_s = rtt if self.rtt_min_s is None else min(self.rtt_min_s, rtt)
+        self.rtt_s = rtt if self.rtt_s is None else 0.8 * self.rtt_s + 0.2 * rtt
+        WEBSOCKET_RTT_SECONDS.observe(rtt)
+        if self.on_rtt is not None:
+            self.on_rtt(self.rtt_s)
+
+    @property
+    def armed(self) -> bool:
+        """Vrai dès que le client a répondu à un ping : il connaît le battement de cœur"""
+        return self.pongs > 0
+
+    def expired(self) -> bool:
+        return self.armed and time.monotonic() - self.last_seen > self.timeout
+
+    def _ping_message(self) -> str:
+        self._next_id += 1
+        if len(self._outstanding) >= MAX_OUTSTANDING:
+            self._outstanding.pop(next(iter(self._outstanding)))
+        self._outstanding[self._next_id] = time.monotonic()
+        self.pings += 1
+        return json.dumps({"type": "ping", "id": self._next_id})
+
+    async def run(self, send_text: Callable, on_timeout: Callable[[], None]) -> None:
+        """Boucle d'envoi des pings ; appelle on_timeout() une fois si le client ne donne plus signe de vie"""
+        if not self.enabled:
+            return
+        while True:
+            await asyncio.sleep(min(self.interval, self.timeout))
+            if self.expired():
+                self.timed_out = True
+                HEARTBEAT_TIMEOUTS.inc()
+                on_timeout()
+                return
+            try:
+                # Un envoi bloqué (tampons pleins) ne doit pas retarder la détection
+                await asyncio.wait_for(send_text(self._ping_message()), self.timeout)
+            except asyncio.TimeoutError:
+                continue
+            except Exception:
+                return
+
+    def stats(self) -> Dict:
+        def ms(value):
+            return None if value is None else round(value * 1000.0, 2)
+        return {
+            "connection": self.label,
+            "rtt_ms": ms(self.rtt_s),
+            "rtt_last_ms": ms(self.rtt_last_s),
+            "rtt_min_ms": ms(self.rtt_min_s),
+            "idle_s": round(time.monotonic() - self.last_seen, 2),
+            "pings": self.pings,
+            "pongs": self.pongs,
+            "armed": self.armed,
+        }
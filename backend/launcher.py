@@ -0,0 +1,104 @@
+"""Lancement de production : N workers uvicorn + un routeur frontal.
+
+Chaque worker est un processus `uvicorn app:app` sur un port local ; il ne crée et ne
+restaure que les salles qui lui reviennent sur l'anneau de hachage. Le routeur écoute
+sur BACKEND_HOST:BACKEND_PORT et aiguille chaque room_id vers son worker.
+
+    python backend/launcher.py --workers 4
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+import uvicorn
+
+from assets import ensure_bundle
+from debuglog import console
+from router import create_router
+from scenes import scene_catalog
+from sharding import format_nodes
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "data")
+
+
+def worker_env(name: str, nodes_spec: str, public_url: str) -> dict:
+    env = dict(os.environ, SHARD_ID=name, SHARD_NODES=nodes_spec, BACKEND_URL=public_url)
+    snapshot_path = os.getenv("SNAPSHOT_PATH")
+    if snapshot_path != "":
+        directory = os.path.dirname(snapshot_path) if snapshot_path else DEFAULT_SNAPSHOT_DIR
+        env["SNAPSHOT_PATH"] = os.path.join(directory, f"rooms.{name}.snapshot")
+    return env
+
+
+def start_workers(count: int, base_port: int, public_url: str):
+    nodes = {f"shard-{i}": f"127.0.0.1:{base_port + i}" for i in range(count)}
+    spec = format_nodes(nodes)
+    processes = []
+    for name, address in nodes.items():
+        port = address.rsplit(":", 1)[1]
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", port, "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+            env=worker_env(name, spec, public_url),
+        ))
+        console(f"🧩 Worker {name} démarré sur {address}")
+    return nodes, processes
+
+
+def wait_ready(nodes, timeout: float = 60.0):
+    """Attend que chaque worker réponde avant d'ouvrir le routeur"""
+    deadline = time.monotonic() + timeout
+    for name, address in nodes.items():
+        while True:
+            try:
+                httpx.get(f"http://{address}/", timeout=1.0)
+                break
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Le worker {name} ({address}) ne répond pas")
+                time.sleep(0.2)
+
+
+def stop_workers(processes):
+    for process in processes:
+        if process.poll() is None:
+            process.send_signal(signal.SIGTERM)
+    deadline = time.monotonic() + 10
+    for process in processes:
+        try:
+            process.wait(timeout=max(0.1, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    port = int(os.getenv("BACKEND_PORT", "8000"))
+    parser = argparse.ArgumentParser(description="Backend multi-processus avec répartition des salles")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("BACKEND_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--host", default=os.getenv("BACKEND_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=port)
+    parser.add_argument("--base-port", type=int, default=int(os.getenv("WORKER_BASE_PORT", port + 100)))
+    args = parser.parse_args()
+
+    public_url = os.getenv("BACKEND_URL", f"http://localhost:{args.port}")
+    frontend_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
+    # Paquets des scènes préchargées compilés une fois ici : les workers projettent tous les mêmes fichiers
+    for scene_id in scene_catalog.preload_ids():
+        registry = scene_catalog.registry(scene_id)
+        if registry.bundle_path:
+            ensure_bundle(registry.bundle_path, registry.images_dir, registry.levels, registry.files)
+    nodes, processes = start_workers(max(1, args.workers), args.base_port, public_url)
+    try:
+        wait_ready(nodes)
+        uvicorn.run(create_router(nodes, frontend_url), host=args.host, port=args.port)
+    finally:
+        stop_workers(processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Index du lobby : salles publiques tenues à jour à chaque changement, pas à chaque requête.
+
+Chaque salle publique est rangée dans un état : "joinable" (partie non commencée, place
+libre), "started" (partie commencée, une place libérée) ou "full" (deux joueurs). La liste
+est servie par pages, filtrable par état et par game_type, avec un ETag qui ne change qu'à
+la modification de l'index. Les abonnés du flux (WebSocket /lobby/ws) reçoivent un
+instantané puis les événements room_created / room_joined / room_left / room_started /
+room_deleted, sérialisés une seule fois pour tous.
+"""
+import asyncio
+import itertools
+import json
+import time
+import uuid
+from typing import Dict, List, Optional, Set
+
+STATUS_JOINABLE = "joinable"
+STATUS_STARTED = "started"
+STATUS_FULL = "full"
+STATUSES = (STATUS_JOINABLE, STATUS_STARTED, STATUS_FULL)
+
+MAX_PLAYERS = 2
+
+
+def page_key(entry: Dict) -> tuple:
+    """Ordre des salles dans une page : par état, puis par arrivée dans cet état"""
+    return STATUSES.index(entry["status"]), entry["since"], entry["room_id"]
+
+
+def room_status(players: int, game_started: bool) -> str:
+    if players >= MAX_PLAYERS:
+        return STATUS_FULL
+    return STATUS_STARTED if game_started else STATUS_JOINABLE
+
+
+class LobbySubscriber:
+    """Abonné au flux ; sa file est bornée et un abonné trop lent est déconnecté"""
+
+    def __init__(self, game_type: Optional[str], max_pending: int):
+        self.game_type = game_type
+        self.queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue(max_pending)
+        self.overflowed = False
+
+    def offer(self, game_type: str, payload: str) -> None:
+        if self.overflowed or (self.game_type is not None and game_type != self.game_type):
+            return
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # Plus rien n'est envoyé : le client se reconnecte et repart d'un instantané
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class LobbyIndex:
+    def __init__(self, max_pending: int = 256):
+        self.max_pending = max_pending
+        # Préfixe d'ETag propre au processus : un redémarrage n'est jamais confondu avec l'état d'avant
+        self._epoch = uuid.uuid4().hex[:8]
+        self.version = 0
+        self._entries: Dict[str, Dict] = {}
+        # État -> salles, et (état, game_type) -> salles ; dictionnaires utilisés comme ensembles ordonnés
+        self._by_status: Dict[str, Dict[str, None]] = {status: {} for status in STATUSES}
+        self._by_type: Dict[tuple, Dict[str, None]] = {}
+        self._legacy: Optional[bytes] = None
+        self._subscribers: Set[LobbySubscriber] = set()
+        self.events = 0
+
+    @property
+    def etag(self) -> str:
+        return f'"{self._epoch}-{self.version}"'
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, room_id: str) -> bool:
+        return room_id in self._entries
+
+    def update(self, room_id: str, players: int, game_started: bool, game_type: str) -> None:
+        """Enregistre l'état courant d'une salle publique et notifie les abonnés s'il a changé"""
+        status = room_status(players, game_started)
+        previous = self._entries.get(room_id)
+        if previous is not None and previous["players"] == players and previous["game_started"] == game_started:
+            return
+        # `since` : rang dans l'état (les salles d'un état sont servies par ordre d'arrivée) ; horloge
+        # murale pour que le routeur puisse fusionner les pages de plusieurs workers dans le même ordre
+        entry = {"room_id": room_id, "players": players, "game_started": game_started,
+                 "game_type": game_type, "status": status, "since": time.time()}
+        if previous is None:
+            event = "room_created"
+        else:
+            self._unlink(previous)
+            if game_started and not previous["game_started"]:
+                event = "room_started"
+            elif players > previous["players"]:
+                event = "room_joined"
+            else:
+                event = "room_left"
+        self._entries[room_id] = entry
+        self._by_status[status][room_id] = None
+        self._by_type.setdefault((status, game_type), {})[room_id] = None
+        self._changed(event, entry)
+
+    def remove(self, room_id: str) -> None:
+        entry = self._entries.pop(room_id, None)
+        if entry is not None:
+            self._unlink(entry)
+            self._changed("room_deleted", {"room_id": room_id, "game_type": entry["game_type"]})
+
+    def _unlink(self, entry: Dict) -> None:
+        room_id = entry["room_id"]
+        self._by_status[entry["status"]].pop(room_id, None)
+        bucket = self._by_type.get((entry["status"], entry["game_type"]))
+        if bucket is not None:
+            bucket.pop(room_id, None)
+            if not bucket:
+                del self._by_type[(entry["status"], entry["game_type"])]
+
+    def _changed(self, event: str, room: Dict) -> None:
+        self.version += 1
+        self.events += 1
+        self._legacy = None
+        if self._subscribers:
+            payload = json.dumps({"type": event, "version": self.version, "room": room})
+            for subscriber in self._subscribers:
+                subscriber.offer(room["game_type"], payload)
+
+    def _buckets(self, status: Optional[str], game_type: Optional[str]) -> List[Dict[str, None]]:
+        statuses = [status] if status else list(STATUSES)
+        if game_type is None:
+            return [self._by_status[s] for s in statuses]
+        return [self._by_type[(s, game_type)] for s in statuses if (s, game_type) in self._by_type]
+
+    def page(self, status: Optional[str] = None, game_type: Optional[str] = None,
+             offset: int = 0, limit: int = 50) -> Dict:
+        """Une page de salles ; ne parcourt que les états demandés, jusqu'à offset + limit"""
+        buckets = self._buckets(status, game_type)
+        total = sum(len(bucket) for bucket in buckets)
+        room_ids = itertools.islice(itertools.chain.from_iterable(buckets), offset, offset + limit)
+        return {
+            "version": self.version,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "counts": self.counts(game_type),
+            "rooms": [self._entries[room_id] for room_id in room_ids],
+        }
+
+    def counts(self, game_type: Optional[str] = None) -> Dict[str, int]:
+        if game_type is None:
+            return {status: len(self._by_status[status]) for status in STATUSES}
+        return {status: len(self._by_type.get((status, game_type), ())) for status in STATUSES}
+
+    def legacy_body(self) -> bytes:
+        """Corps JSON de GET /rooms au format historique ({room_id: {players, game_started}}),
+        sérialisé une fois par version de l'index
+        """
+        if self._legacy is None:
+            self._legacy = json.dumps({
+                room_id: {"players": entry["players"], "game_started": entry["game_started"]}
+                for room_id, entry in self._entries.items()
+            }).encode()
+        return self._legacy
+
+    def snapshot(self, game_type: Optional[str] = None) -> str:
+        rooms = [entry for entry in self._entries.values() if game_type is None or entry["game_type"] == game_type]
+        return json.dumps({"type": "lobby_snapshot", "version": self.version, "rooms": rooms})
+
+    def subscribe(self, game_type: Optional[str] = None) -> LobbySubscriber:
+        subscriber = LobbySubscriber(game_type, self.max_pending)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: LobbySubscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def stats(self) -> Dict:
+        return {
+            "rooms": len(self._entries),
+            "counts": self.counts(),
+            "version": self.version,
+            "events": self.events,
+            "subscribers": self.subscribers,
+        }
@@ -0,0 +1,160 @@
+"""Diagnostic mémoire : octets résidents par catégorie, et traces tracemalloc (opt-in).
+
+Les tailles sont estimées en parcourant les objets (sys.getsizeof récursif) : un objet
+partagé n'est compté qu'une fois par catégorie, et ce qui appartient à une autre
+catégorie (sockets, tâches, boucle d'événements, calques numpy partagés) est ignoré.
+
+Avec MEMORY_TRACEMALLOC=<profondeur de pile>, tracemalloc est activé dès le démarrage ;
+un instantané sert alors de référence et les allocations apparues depuis sont listées
+par ligne de code, ce qui permet de repérer une fuite sur des cycles création /
+suppression de salles.
+"""
+import asyncio
+import gc
+import sys
+import time
+import tracemalloc
+import types
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from starlette.websockets import WebSocket
+
+# Types jamais parcourus : comptés ailleurs, partagés par tout le processus, ou sans intérêt
+SKIP_TYPES = (
+    WebSocket, asyncio.AbstractEventLoop, asyncio.Future, asyncio.Handle, asyncio.Event,
+    types.ModuleType, type, types.FunctionType, types.MethodType, types.BuiltinFunctionType,
+    types.CodeType, types.FrameType,
+)
+ATOMIC_TYPES = (str, bytes, bytearray, memoryview, int, float, bool, complex, type(None))
+# Garde-fou : nombre maximal d'objets visités par mesure
+MAX_OBJECTS = 1_000_000
+
+
+def deep_sizeof(roots: Iterable, seen: Optional[set] = None, skip: Tuple[type, ...] = SKIP_TYPES) -> int:
+    """Taille cumulée des objets atteignables depuis `roots` ; `seen` partagé entre appels
+    évite de compter deux fois un objet commun (une même charge utile dans plusieurs files...)
+    """
+    seen = set() if seen is None else seen
+    stack = list(roots)
+    total = 0
+    visited = 0
+    while stack and visited < MAX_OBJECTS:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, skip):
+            continue
+        seen.add(id(obj))
+        visited += 1
+        total += sys.getsizeof(obj, 0)
+        if isinstance(obj, ATOMIC_TYPES) or isinstance(obj, np.ndarray):
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+            stack.extend(obj)
+        else:
+            attrs = getattr(obj, "__dict__", None)
+            if attrs is not None:
+                stack.append(attrs)
+            for cls in type(obj).__mro__:
+                for slot in getattr(cls, "__slots__", ()):
+                    value = getattr(obj, slot, None)
+                    if value is not None:
+                        stack.append(value)
+    return total
+
+
+def transport_buffer(websocket) -> int:
+    """Octets en attente d'écriture dans le transport de la WebSocket (uvicorn), 0 si inaccessible"""
+    protocol = getattr(getattr(websocket, "_send", None), "__self__", None)
+    transport = getattr(protocol, "transport", None)
+    try:
+        return int(transport.get_write_buffer_size()) if transport is not None else 0
+    except Exception:
+        return 0
+
+
+def task_summary() -> Dict:
+    """Tâches asyncio en cours, par coroutine, et taille de leurs objets (tâche, coroutine, cadre)"""
+    by_coroutine: Dict[str, int] = {}
+    nbytes = 0
+    tasks = asyncio.all_tasks()
+    for task in tasks:
+        coro = task.get_coro()
+        name = getattr(coro, "__qualname__", type(coro).__name__)
+        by_coroutine[name] = by_coroutine.get(name, 0) + 1
+        frame = getattr(coro, "cr_frame", None)
+        # Les variables locales appartiennent aux autres catégories (salles, connexions) : cadre seul
+        nbytes += sys.getsizeof(task) + sys.getsizeof(coro) + (sys.getsizeof(frame) if frame is not None else 0)
+    return {"count": len(tasks), "bytes": nbytes,
+            "by_coroutine": dict(sorted(by_coroutine.items(), key=lambda item: -item[1]))}
+
+
+class AllocationTracer:
+    """tracemalloc à la demande : instantané de référence, puis différence avec l'état courant"""
+
+    def __init__(self, frames: int = 0):
+        self.frames = frames
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self.baseline_at: Optional[float] = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self) -> None:
+        if self.frames > 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        # Seuls les objets encore atteignables comptent : les cycles en attente du GC ne sont pas des fuites
+        gc.collect()
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    def snapshot(self, limit: int = 20, group_by: str = "lineno") -> Dict:
+        """Nouvel instantané de référence ; retourne ses plus gros postes"""
+        self._baseline = self._snapshot()
+        self.baseline_at = time.time()
+        stats = self._baseline.statistics(group_by)
+        return {"baseline_at": self.baseline_at, "top": [self._format(stat) for stat in stats[:limit]]}
+
+    def diff(self, limit: int = 20, group_by: str = "lineno", rebase: bool = False) -> Dict:
+        """Allocations apparues ou disparues depuis l'instantané de référence (le plus gros écart d'abord)"""
+        if self._baseline is None:
+            return self.snapshot(limit, group_by)
+        current = self._snapshot()
+        stats = current.compare_to(self._baseline, group_by)
+        result = {
+            "baseline_at": self.baseline_at,
+            "size_diff_bytes": sum(stat.size_diff for stat in stats),
+            "count_diff": sum(stat.count_diff for stat in stats),
+            "top": [self._format(stat) for stat in stats[:limit]],
+        }
+        if rebase:
+            self._baseline = current
+            self.baseline_at = time.time()
+        return result
+
+    @staticmethod
+    def _format(stat) -> Dict:
+        frames: List[str] = [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]
+        entry = {"where": frames[0] if len(frames) == 1 else frames, "bytes": stat.size, "count": stat.count}
+        if hasattr(stat, "size_diff"):
+            entry["bytes_diff"] = stat.size_diff
+            entry["count_diff"] = stat.count_diff
+        return entry
+
+    def stats(self) -> Dict:
+        if not self.tracing:
+            return {"tracing": False}
+        current, peak = tracemalloc.get_traced_memory()
+        return {"tracing": True, "frames": tracemalloc.get_traceback_limit(), "traced_bytes": current,
+                "peak_bytes": peak, "overhead_bytes": tracemalloc.get_tracemalloc_memory(),
+                "baseline_at": self.baseline_at}
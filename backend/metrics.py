@@ -0,0 +1,150 @@
+"""Métriques au format texte Prometheus, sans dépendance externe.
+
+L'enregistrement coûte une recherche dichotomique et deux additions : il peut rester
+actif en charge. Les jauges sont calculées au moment de la lecture de /metrics.
+"""
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Buckets par défaut (secondes) : de 0,1 ms à 2,5 s
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (2048, 4096, 8192, 16384, 32768, 65536, 131072, 262144, 524288, 1048576)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Histogramme cumulatif (buckets fixes), avec labels optionnels"""
+
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float] = LATENCY_BUCKETS,
+                 labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.label_names = tuple(labels)
+        # label values -> [compte par bucket (+Inf inclus), somme, total]
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(label_values, [[0] * (len(self.buckets) + 1), 0.0, 0])
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, label_values, le)} {cumulative}")
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {total!r}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Counter:
+    """Compteur monotone avec labels optionnels"""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, *label_values: str) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """Valeur évaluée à la lecture via une fonction (aucun coût sur le chemin critique).
+    kind="counter" expose un compteur tenu ailleurs (ex. hits du cache de frames).
+    """
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], float], kind: str = "gauge"):
+        self.name = name
+        self.help = help_text
+        self.read = read
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}",
+                f"{self.name} {_format_value(self.read())}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, buckets: Iterable[float] = LATENCY_BUCKETS,
+                  labels: Sequence[str] = ()) -> Histogram:
+        return self.register(Histogram(name, help_text, buckets, labels))
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float], kind: str = "gauge") -> Gauge:
+        return self.register(Gauge(name, help_text, read, kind))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                # Une jauge en erreur ne doit pas empêcher la lecture des autres
+                continue
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Chemin critique du rendu et de l'envoi des frames
+FRAME_COMPOSE_SECONDS = registry.histogram("frame_compose_seconds", "Temps de composition d'une frame (copie + loupe)")
+FRAME_ENCODE_SECONDS = registry.histogram("frame_encode_seconds", "Temps d'encodage d'une frame", labels=("format",))
+FRAME_ENCODED_BYTES = registry.histogram("frame_encoded_bytes", "Taille d'une frame encodée", SIZE_BUCKETS, labels=("format",))
+WEBSOCKET_SEND_SECONDS = registry.histogram("websocket_send_seconds", "Latence d'envoi d'une frame sur la WebSocket", labels=("protocol",))
+COMMAND_SECONDS = registry.histogram("command_handling_seconds", "Temps de traitement d'une commande client", labels=("type",))
+BROADCAST_SECONDS = registry.histogram("broadcast_fanout_seconds", "Temps de diffusion d'un message à une salle")
+WEBSOCKET_RTT_SECONDS = registry.histogram("websocket_rtt_seconds", "Temps d'aller-retour ping/pong des WebSockets de jeu")
+HEARTBEAT_TIMEOUTS = registry.counter("websocket_heartbeat_timeouts_total", "Connexions libérées faute de réponse au battement de cœur")
+ROOM_TICK_SECONDS = registry.histogram("room_tick_seconds", "Durée d'un tick de salle (deltas, rendus et envois)")
+ROOM_TICK_OVERRUNS = registry.counter("room_tick_overruns_total", "Ticks de salle plus longs que leur période (ticks suivants sautés)")
+
+# Requêtes refusées par le contrôle d'admission (endpoint = room | websocket)
+ADMISSION_REJECTIONS = registry.counter("admission_rejections_total", "Requêtes refusées par le contrôle d'admission",
+                                        labels=("endpoint", "reason"))
+
+
+def command_label(command_type: Optional[str], known: Iterable[str]) -> str:
+    """Limite la cardinalité du label `type` aux commandes connues"""
+    return command_type if command_type in known else "other"
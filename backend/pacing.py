@@ -0,0 +1,96 @@
+"""Étage d'entrée par joueur et cadence d'envoi des frames.
+
+Les 'move' consécutifs en attente sont fusionnés (la dernière position gagne) ; toutes
+les autres commandes (click, mode_change, alarmes...) sont conservées dans leur ordre.
+Les frames de déplacement sont ensuite limitées à un nombre maximum par seconde, et à
+FRAMES_PER_RTT frames par aller-retour mesuré (battement de cœur) sur les liens lents.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+# Frames envoyées par temps d'aller-retour : au-delà, elles s'accumulent dans le réseau
+FRAMES_PER_RTT = 2
+
+
+class CommandQueue:
+    """File de commandes d'une connexion avec fusion des déplacements"""
+
+    def __init__(self, max_pending: int = 256):
+        self.max_pending = max(1, int(max_pending))
+        self._items: Deque[Dict] = deque()
+        self._ready = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._error: Optional[BaseException] = None
+        self.received = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _coalesces(self, command: Dict) -> bool:
+        return command.get("type") == "move" and bool(self._items) and self._items[-1].get("type") == "move"
+
+    def accepts(self, command: Dict) -> bool:
+        """Vrai si put(command) n'attendra pas"""
+        return len(self._items) < self.max_pending or self._coalesces(command)
+
+    async def wait_space(self) -> None:
+        """Attend qu'une place se libère dans la file"""
+        while len(self._items) >= self.max_pending:
+            self._space.clear()
+            await self._space.wait()
+
+    async def put(self, command: Dict) -> None:
+        """Ajoute une commande ; attend s'il y a trop de commandes en attente (pas de perte)"""
+        self.received += 1
+        if self._coalesces(command):
+            self._items[-1] = command
+            self.coalesced += 1
+            return
+        await self.wait_space()
+        self._items.append(command)
+        self._ready.set()
+
+    def fail(self, error: BaseException) -> None:
+        """Signale la fin du flux d'entrée ; pop() lèvera l'erreur une fois la file vidée"""
+        self._error = error
+        self._ready.set()
+
+    async def pop(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Prochaine commande, ou None si le délai expire avant son arrivée"""
+        while not self._items:
+            if self._error is not None:
+                raise self._error
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        command = self._items.popleft()
+        self._space.set()
+        return command
+
+
+class FramePacer:
+    """Limite la cadence d'envoi des frames d'une connexion (0 = illimitée)"""
+
+    def __init__(self, max_fps: float = 30.0):
+        self.base_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.interval = self.base_interval
+        self._next = 0.0
+        self.frames = 0
+
+    def delay(self) -> float:
+        """Secondes à attendre avant de pouvoir envoyer la prochaine frame"""
+        return max(0.0, self._next - time.monotonic())
+
+    def set_rtt(self, rtt_s: float) -> None:
+        """Adapte l'intervalle au RTT de la connexion (jamais en dessous de la cadence maximale)"""
+        self.interval = max(self.base_interval, rtt_s / FRAMES_PER_RTT)
+
+    def mark(self) -> None:
+        self.frames += 1
+        self._next = time.monotonic() + self.interval
@@ -0,0 +1,89 @@
+"""Protocole WebSocket binaire (optionnel) pour les frames et les commandes fréquentes.
+
+Un client l'active en se connectant sur /ws/{room_id}?protocol=binary. Les anciens
+clients restent sur le protocole JSON (data URL base64).
+
+Frame serveur -> client (send_bytes) : en-tête fixe de 12 octets + image brute
+    kind: u8 (FRAME_MOVE | FRAME_STATE), player_id: u8, format: u8 (FORMAT_*), réservé: u8,
+    x: f32, y: f32 (position de la loupe, en pixels du niveau de pyramide de la connexion,
+    `frame_size` de "game_state" ; pour un spectateur, celui du joueur filmé, annoncé par
+    "spectator_frame_size"), little-endian.
+    Un FRAME_STATE suit toujours le message texte qu'il complète (sans image_data) : "game_state",
+    ou "tick" pour les connexions ?sync=tick, dont les frames de déplacement et de changement de
+    mode arrivent ainsi à chaque tick où la vue a changé (jamais de FRAME_MOVE pour elles).
+
+Commande client -> serveur (bytes) : kind: u8 (CMD_MOVE | CMD_CLICK), x: f32, y: f32 (même espace
+que les frames de la connexion).
+Toutes les autres commandes restent en JSON texte.
+"""
+import json
+import struct
+from typing import Dict
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+PROTOCOL_JSON = "json"
+PROTOCOL_BINARY = "binary"
+
+FRAME_HEADER = struct.Struct("<BBBBff")
+FRAME_MOVE = 1
+FRAME_STATE = 2
+
+FORMAT_JPEG = 0
+FORMAT_WEBP = 1
+FORMAT_PNG = 2
+# Nom du format d'encodage -> code dans l'en-tête binaire
+FORMAT_CODES = {"jpeg": FORMAT_JPEG, "webp": FORMAT_WEBP, "png": FORMAT_PNG}
+
+COMMAND = struct.Struct("<Bff")
+CMD_MOVE = 1
+CMD_CLICK = 2
+
+
+def negotiated_protocol(websocket: WebSocket) -> str:
+    """Protocole demandé par le client dans l'URL de connexion"""
+    if websocket.query_params.get("protocol", PROTOCOL_JSON).lower() == PROTOCOL_BINARY:
+        return PROTOCOL_BINARY
+    return PROTOCOL_JSON
+
+
+def pack_frame(kind: int, player_id: int, position: Dict, image: bytes, fmt: int = FORMAT_JPEG) -> bytes:
+    header = FRAME_HEADER.pack(kind, player_id or 0, fmt, 0, float(position["x"]), float(position["y"]))
+    return header + image
+
+
+def unpack_frame(data: bytes) -> Dict:
+    kind, player_id, fmt, _, x, y = FRAME_HEADER.unpack_from(data)
+    return {
+        "kind": kind,
+        "player_id": player_id,
+        "format": fmt,
+        "position": {"x": x, "y": y},
+        "image": data[FRAME_HEADER.size:],
+    }
+
+
+def pack_command(kind: int, x: float, y: float) -> bytes:
+    return COMMAND.pack(kind, x, y)
+
+
+def unpack_command(data: bytes) -> Dict:
+    """Traduit une commande binaire dans le même format que sa version JSON"""
+    if len(data) != COMMAND.size:
+        raise ValueError(f"Commande binaire invalide ({len(data)} octets)")
+    kind, x, y = COMMAND.unpack(data)
+    if kind == CMD_MOVE:
+        return {"type": "move", "position": {"x": x, "y": y}}
+    if kind == CMD_CLICK:
+        return {"type": "click", "x": x, "y": y}
+    raise ValueError(f"Type de commande binaire inconnu: {kind}")
+
+
+async def receive_command(websocket: WebSocket) -> Dict:
+    """Attend la prochaine commande du client, qu'elle soit en JSON ou en binaire"""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("bytes") is not None:
+        return unpack_command(message["bytes"])
+    return json.loads(message["text"])
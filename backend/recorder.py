@@ -0,0 +1,174 @@
+"""Enregistrement des commandes reçues par les WebSockets de jeu (opt-in, RECORD_DIR).
+
+Un fichier par processus, en ajout seul : MAGIC, en-tête JSON préfixé de sa longueur, puis
+des enregistrements binaires (type, instant monotone relatif au début de l'enregistrement,
+index de salle, joueur) suivis de leur charge utile. 'move' et 'click' tiennent en 22 octets ;
+les autres commandes, plus rares, sont stockées en JSON. Les identifiants de salle ne sont
+écrits qu'une fois (enregistrement ROOM) puis référencés par index.
+
+    python benchmarks/replay.py data/recordings/*.wsrec     # rejouer hors ligne
+"""
+import json
+import os
+import struct
+import time
+from datetime import datetime
+from typing import Dict, Iterator, NamedTuple, Optional
+
+from debuglog import console
+
+MAGIC = b"WSREC01\n"
+RECORD = struct.Struct("<BdIB")   # type, t (s), index de salle, joueur
+POINT = struct.Struct("<ff")
+LENGTH = struct.Struct("<H")
+
+KIND_ROOM = 0      # JSON : room_id, game_type, solo, is_private, scene_id
+KIND_JOIN = 1      # JSON : size, protocol, params (réglages d'encodage négociés)
+KIND_LEAVE = 2
+KIND_MOVE = 3      # x, y (espace des frames du client)
+KIND_CLICK = 4     # x, y
+KIND_COMMAND = 5   # JSON : commande complète
+
+KIND_NAMES = {KIND_ROOM: "room", KIND_JOIN: "join", KIND_LEAVE: "leave",
+              KIND_MOVE: "move", KIND_CLICK: "click", KIND_COMMAND: "command"}
+
+
+class Event(NamedTuple):
+    t: float
+    kind: int
+    room_id: str
+    player_id: int
+    data: Dict
+
+
+class SessionRecorder:
+    """Journal binaire des commandes ; une erreur d'écriture désactive l'enregistrement sans gêner le jeu"""
+
+    def __init__(self, path: str, meta: Optional[Dict] = None, buffer_size: int = 1 << 16):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "ab", buffering=buffer_size)
+        self._origin = time.monotonic()
+        self._rooms: Dict[str, int] = {}
+        self.events = 0
+        self.enabled = True
+        header = json.dumps(dict(meta or {}, version=1, started_at=time.time()), separators=(",", ":")).encode()
+        self._file.write(MAGIC + LENGTH.pack(len(header)) + header)
+        self.nbytes = len(MAGIC) + LENGTH.size + len(header)
+
+    @classmethod
+    def in_directory(cls, directory: str, name: str = "session") -> "SessionRecorder":
+        """Nouveau fichier horodaté dans `directory` (un par processus)"""
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(directory, f"{name}-{stamp}-{os.getpid()}.wsrec")
+        return cls(path, {"name": name, "pid": os.getpid()})
+
+    def _write(self, kind: int, room, player_id: int, payload: bytes = b"") -> None:
+        if not self.enabled:
+            return
+        try:
+            index = self._rooms.get(room.room_id)
+            if index is None:
+                index = self._rooms[room.room_id] = len(self._rooms)
+                info = json.dumps({"room_id": room.room_id, "game_type": room.game_type, "solo": room.solo,
+                                   "is_private": room.is_private, "scene_id": room.scene_id},
+                                  separators=(",", ":")).encode()
+                self._append(KIND_ROOM, index, 0, LENGTH.pack(len(info)) + info)
+            self._append(kind, index, player_id, payload)
+        except (OSError, ValueError) as e:
+            self.enabled = False
+            console(f"❌ Enregistrement des sessions interrompu ({self.path}): {e}")
+
+    def _append(self, kind: int, index: int, player_id: int, payload: bytes) -> None:
+        record = RECORD.pack(kind, time.monotonic() - self._origin, index, player_id) + payload
+        self._file.write(record)
+        self.nbytes += len(record)
+        self.events += 1
+
+    def _json(self, data: Dict) -> bytes:
+        encoded = json.dumps(data, separators=(",", ":")).encode()
+        if len(encoded) > 0xFFFF:
+            # Commande anormalement grosse : seul son type est conservé
+            encoded = json.dumps({"type": data.get("type"), "truncated": True}).encode()
+        return LENGTH.pack(len(encoded)) + encoded
+
+    def join(self, room, player_id: int, size: int, protocol: str, params: Dict) -> None:
+        self._write(KIND_JOIN, room, player_id, self._json({"size": size, "protocol": protocol, "params": params}))
+
+    def leave(self, room, player_id: int) -> None:
+        self._write(KIND_LEAVE, room, player_id)
+
+    def command(self, room, player_id: int, command: Dict) -> None:
+        kind = command.get("type")
+        try:
+            if kind == "move":
+                self._write(KIND_MOVE, room, player_id,
+                            POINT.pack(float(command["position"]["x"]), float(command["position"]["y"])))
+                return
+            if kind == "click":
+                self._write(KIND_CLICK, room, player_id, POINT.pack(float(command["x"]), float(command["y"])))
+                return
+        except (KeyError, TypeError, ValueError):
+            pass
+        self._write(KIND_COMMAND, room, player_id, self._json(command))
+
+    def flush(self) -> None:
+        if self.enabled:
+            try:
+                self._file.flush()
+            except OSError as e:
+                self.enabled = False
+                console(f"❌ Enregistrement des sessions interrompu ({self.path}): {e}")
+
+    def close(self) -> None:
+        self.flush()
+        self._file.close()
+        self.enabled = False
+
+    def stats(self) -> Dict:
+        return {"path": self.path, "enabled": self.enabled, "events": self.events,
+                "bytes": self.nbytes, "rooms": len(self._rooms)}
+
+
+def read_header(f) -> Dict:
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Format d'enregistrement inconnu")
+    (length,) = LENGTH.unpack(f.read(LENGTH.size))
+    return json.loads(f.read(length))
+
+
+def read_events(path: str) -> Iterator[Event]:
+    """Événements d'un journal, dans l'ordre (dont la description de chaque salle, KIND_ROOM) ;
+    un dernier enregistrement tronqué (arrêt brutal) est ignoré
+    """
+    rooms: Dict[int, str] = {}
+    with open(path, "rb") as f:
+        read_header(f)
+        while True:
+            head = f.read(RECORD.size)
+            if len(head) < RECORD.size:
+                return
+            kind, t, index, player_id = RECORD.unpack(head)
+            if kind in (KIND_MOVE, KIND_CLICK):
+                raw = f.read(POINT.size)
+                if len(raw) < POINT.size:
+                    return
+                x, y = POINT.unpack(raw)
+                data = {"x": x, "y": y}
+            elif kind == KIND_LEAVE:
+                data = {}
+            else:
+                raw = f.read(LENGTH.size)
+                if len(raw) < LENGTH.size:
+                    return
+                (length,) = LENGTH.unpack(raw)
+                raw = f.read(length)
+                if len(raw) < length:
+                    return
+                data = json.loads(raw)
+            if kind == KIND_ROOM:
+                rooms[index] = data["room_id"]
+            yield Event(t, kind, rooms[index], player_id, data)
+
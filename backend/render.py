@@ -0,0 +1,147 @@
+"""Composition et encodage des frames hors de la boucle d'événements.
+
+Le travail CPU (copie numpy + encodage PIL) est confié à un pool de threads ou de
+processus. Chaque connexion passe par un FrameRenderer qui borne son nombre de rendus
+en vol : un client lent ne peut pas accumuler du travail de rendu sans limite.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Hashable, Mapping, Optional
+
+import numpy as np
+
+from assets import DISPLAY_SIZE, level_key
+from encoders import DEFAULT_PARAMS, AdaptiveQuality, EncodeParams, encode
+from metrics import FRAME_COMPOSE_SECONDS, FRAME_ENCODE_SECONDS, FRAME_ENCODED_BYTES
+from scenes import scene_catalog
+
+# Côté de la loupe dans l'espace d'affichage de référence (512) ; proportionnel aux autres niveaux
+LENS_SIZE = 60
+
+EXECUTOR_THREAD = "thread"
+EXECUTOR_PROCESS = "process"
+EXECUTOR_INLINE = "inline"
+
+
+def lens_size(size: int) -> int:
+    return max(1, int(round(LENS_SIZE * size / DISPLAY_SIZE)))
+
+
+def compose_frame(images: Mapping[str, np.ndarray], key) -> np.ndarray:
+    """Compose l'image décrite par une clé de frame (base + loupe) au niveau de pyramide de la clé.
+    La position de la loupe est exprimée en pixels de ce niveau.
+    """
+    _, _, layer, size, x, y = key
+    img = images[level_key("base_small", size)].copy()
+    if layer is not None:
+        overlay_img = images[level_key(layer, size)]
+        lens = lens_size(size)
+        x0 = max(0, int(x - lens / 2))
+        y0 = max(0, int(y - lens / 2))
+        x1 = min(img.shape[1], x0 + lens)
+        y1 = min(img.shape[0], y0 + lens)
+        img[y0:y1, x0:x1] = overlay_img[y0:y1, x0:x1]
+    return img
+
+
+def render_key(key, params: EncodeParams = DEFAULT_PARAMS) -> bytes:
+    """Compose et encode une frame ; exécutable dans un worker (thread ou processus).
+    La scène est le premier élément de la clé : un worker charge ses calques au premier usage.
+    """
+    return encode(compose_frame(scene_catalog.images(key[0]), key), params)
+
+
+def render_key_timed(key, params: EncodeParams = DEFAULT_PARAMS):
+    """Comme render_key, avec les durées de composition et d'encodage (mesurées dans le worker)"""
+    started = time.perf_counter()
+    img = compose_frame(scene_catalog.images(key[0]), key)
+    composed = time.perf_counter()
+    data = encode(img, params)
+    return data, composed - started, time.perf_counter() - composed
+
+
+def record_render(params: EncodeParams, data: bytes, compose_s: float, encode_s: float) -> None:
+    FRAME_COMPOSE_SECONDS.observe(compose_s)
+    FRAME_ENCODE_SECONDS.observe(encode_s, params.format)
+    FRAME_ENCODED_BYTES.observe(len(data), params.format)
+
+
+def _warm_worker():
+    scene_catalog.images(scene_catalog.default)
+
+
+class RenderExecutor:
+    """Pool de rendu configurable (threads, processus, ou exécution directe)"""
+
+    def __init__(self, kind: str = EXECUTOR_THREAD, workers: Optional[int] = None):
+        if kind not in (EXECUTOR_THREAD, EXECUTOR_PROCESS, EXECUTOR_INLINE):
+            raise ValueError(f"Type d'exécuteur de rendu inconnu: {kind}")
+        self.kind = kind
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self._pool: Optional[Executor] = None
+
+    def start(self) -> None:
+        if self._pool is not None or self.kind == EXECUTOR_INLINE:
+            return
+        if self.kind == EXECUTOR_PROCESS:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="render")
+
+    async def run(self, fn, *args):
+        if self.kind == EXECUTOR_INLINE:
+            return fn(*args)
+        self.start()
+        return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+class FrameRenderer:
+    """Rendu des frames d'une connexion, avec cache partagé et nombre de rendus en vol borné"""
+
+    def __init__(self, executor: RenderExecutor, cache, max_inflight: int = 2,
+                 quality: Optional[AdaptiveQuality] = None, size: int = DISPLAY_SIZE):
+        self.executor = executor
+        self.cache = cache
+        self.quality = quality or AdaptiveQuality(DEFAULT_PARAMS)
+        # Niveau de pyramide choisi par le client (côté des frames, en px)
+        self.size = size
+        self.scale = size / DISPLAY_SIZE
+        self.max_inflight = max(1, int(max_inflight))
+        self.inflight = 0
+        self._slots = asyncio.Semaphore(self.max_inflight)
+
+    @property
+    def saturated(self) -> bool:
+        return self.inflight >= self.max_inflight
+
+    @property
+    def params(self) -> EncodeParams:
+        return self.quality.params
+
+    async def render(self, key: Hashable) -> bytes:
+        """Octets encodés de la frame, avec les réglages courants de la connexion"""
+        params = self.quality.params
+        cache_key = (key, params)
+        data = self.cache.get(cache_key)
+        if data is not None:
+            return data
+        async with self._slots:
+            self.inflight += 1
+            try:
+                data, compose_s, encode_s = await self.executor.run(render_key_timed, key, params)
+            finally:
+                self.inflight -= 1
+        record_render(params, data, compose_s, encode_s)
+        self.cache.put(cache_key, data)
+        return data
+
+    def record_send(self, seconds: float, queue_depth: int = 0) -> None:
+        """Temps d'envoi mesuré d'une frame, utilisé pour adapter la qualité"""
+        self.quality.record(seconds, queue_depth)
@@ -0,0 +1,370 @@
+"""Routeur frontal du lancement multi-processus.
+
+Aiguille /rooms/{room_id} et /ws/{room_id} vers le worker propriétaire de la salle
+(hachage cohérent), agrège GET /rooms, /lobby/rooms et le flux /lobby/ws sur tous les
+workers et répartit le reste (création de salles, fichiers statiques...) à tour de rôle.
+/metrics et les statistiques propres à chaque processus sont lus sur tous les workers
+(étiquetés par worker), ou sur un seul avec ?node=.
+"""
+import asyncio
+import hashlib
+import heapq
+import inspect
+import itertools
+import json
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import websockets
+from fastapi import FastAPI, HTTPException, Request, WebSocket
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+
+from lobby import STATUSES, page_key
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from sharding import HashRing
+
+# En-têtes propres à une connexion, à ne pas recopier d'un saut à l'autre
+HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te",
+    "trailers", "transfer-encoding", "upgrade", "host", "content-length",
+}
+
+
+def _forwardable(headers) -> Dict[str, str]:
+    return {k: v for k, v in headers.items() if k.lower() not in HOP_HEADERS}
+
+
+def _response_headers(headers) -> Dict[str, str]:
+    # Le CORS est géré par le routeur lui-même
+    return {k: v for k, v in _forwardable(headers).items()
+            if not k.lower().startswith("access-control-") and k.lower() != "content-encoding"}
+
+
+# Statistiques propres à chaque processus worker : un tour de rôle mélangerait les processus
+WORKER_STATS = (
+    "/assets/stats", "/scheduler/stats", "/admission/stats", "/connections/stats", "/ticks/stats",
+    "/variants/stats", "/memory/stats", "/memory/tracemalloc", "/memory/tracemalloc/diff",
+    "/recorder/stats", "/frames/cache", "/lobby/stats",
+)
+
+
+def label_sample(line: str, node: str) -> str:
+    """Ajoute le label node="..." à une ligne d'échantillon Prometheus"""
+    label = f'node="{node}"'
+    space = line.index(" ")
+    brace = line.find("{", 0, space)
+    if brace == -1:
+        return f"{line[:space]}{{{label}}}{line[space:]}"
+    separator = "" if line[brace + 1] == "}" else ","
+    return f"{line[:brace + 1]}{label}{separator}{line[brace + 1:]}"
+
+
+def merge_metrics(results: List[Tuple[str, str]]) -> str:
+    """Fusionne les /metrics de plusieurs workers : chaque famille une seule fois (HELP/TYPE),
+    suivie des échantillons de tous les workers étiquetés par node
+    """
+    families: Dict[str, Tuple[List[str], List[str]]] = {}
+    for node, text in results:
+        current = None
+        for line in text.splitlines():
+            if line.startswith(("# HELP ", "# TYPE ")):
+                current = families.setdefault(line.split(" ", 3)[2], ([], []))
+                if line not in current[0]:
+                    current[0].append(line)
+            elif line and not line.startswith("#") and current is not None:
+                current[1].append(label_sample(line, node))
+    return "\n".join(line for header, samples in families.values() for line in header + samples) + "\n"
+
+
+def client_address(request: Request) -> Dict[str, str]:
+    """Adresse du client transmise aux workers (qui limitent la création de salles par client) ;
+    remplace un éventuel X-Forwarded-For fourni par le client lui-même
+    """
+    return {"x-forwarded-for": request.client.host} if request.client else {}
+
+
+def create_router(nodes: Dict[str, str], frontend_url: str) -> FastAPI:
+    """Application ASGI frontale pour des workers {nom: 'hôte:port'}"""
+    ring = HashRing(list(nodes))
+    round_robin = itertools.cycle(list(nodes))
+    client = httpx.AsyncClient(timeout=httpx.Timeout(10.0))
+
+    router = FastAPI()
+    router.add_middleware(
+        CORSMiddleware,
+        allow_origins=[frontend_url],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    @router.on_event("shutdown")
+    async def close_client():
+        await client.aclose()
+
+    async def forward(request: Request, node: str, params: Optional[Dict[str, str]] = None) -> Response:
+        upstream = await client.request(
+            request.method,
+            f"http://{nodes[node]}{request.url.path}",
+            params=request.query_params if params is None else params,
+            headers=dict(_forwardable(request.headers), **client_address(request)),
+            content=await request.body(),
+        )
+        return Response(content=upstream.content, status_code=upstream.status_code,
+                        headers=_response_headers(upstream.headers))
+
+    # (chemin, paramètres, worker) -> (ETag, JSON) de la dernière réponse du worker
+    conditional_cache: Dict[Tuple, Tuple[str, object]] = {}
+
+    async def fetch(node: str, path: str, params: Dict[str, str]) -> Optional[Tuple[str, object]]:
+        """GET sur un worker ; s'il n'a pas changé, il répond 304 et sa dernière réponse est réutilisée"""
+        key = (path, tuple(sorted(params.items())), node)
+        cached = conditional_cache.get(key)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+        try:
+            response = await client.get(f"http://{nodes[node]}{path}", params=params, headers=headers)
+        except httpx.HTTPError:
+            return None
+        if response.status_code == 304 and cached:
+            return cached
+        if response.status_code != 200:
+            return None
+        result = (response.headers.get("etag", ""), response.json())
+        if len(conditional_cache) >= 1024:
+            # Une entrée par combinaison de paramètres : borner la mémoire
+            conditional_cache.clear()
+        conditional_cache[key] = result
+        return result
+
+    async def fetch_all(path: str, params: Dict[str, str]) -> List[Tuple[str, object]]:
+        """GET sur chaque worker ; ceux qui ne répondent pas sont ignorés"""
+        return [r for r in await asyncio.gather(*(fetch(node, path, params) for node in nodes)) if r is not None]
+
+    async def aggregated_response(request: Request, results: List[Tuple[str, object]], body) -> Response:
+        """Réponse JSON avec un ETag composé de ceux des workers (304 si inchangé, sans calculer le corps)"""
+        digest = hashlib.blake2b("|".join(etag for etag, _ in results).encode(), digest_size=8).hexdigest()
+        etag = f'"{digest}"'
+        if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+            return Response(status_code=304, headers={"ETag": etag})
+        content = body(results)
+        if inspect.isawaitable(content):
+            content = await content
+        return Response(content=json.dumps(content), media_type="application/json",
+                        headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    @router.get("/rooms")
+    async def list_rooms(request: Request):
+        """Liste des salles agrégée sur tous les workers"""
+        def merge(results):
+            rooms = {}
+            for _, data in results:
+                rooms.update(data)
+            return rooms
+        return await aggregated_response(request, await fetch_all("/rooms", {}), merge)
+
+    @router.get("/lobby/rooms")
+    async def lobby_rooms(request: Request, offset: int = 0, limit: int = 50):
+        """Page du lobby fusionnée : les pages des workers sont interclassées (par état, puis arrivée
+        dans l'état) en lisant chaque worker par pages successives, à partir de son propre curseur
+        """
+        offset = max(0, offset)
+        params = {k: v for k, v in request.query_params.items() if k in ("status", "game_type")}
+        first = dict(params, offset="0", limit=str(offset + max(1, limit)))
+        responses = await asyncio.gather(*(fetch(node, "/lobby/rooms", first) for node in nodes))
+        pages = {node: result for node, result in zip(nodes, responses) if result is not None}
+        # Les workers bornent limit (LOBBY_PAGE_MAX) : c'est aussi la taille de leurs pages suivantes
+        chunks = {node: page["limit"] for node, (_, page) in pages.items()}
+        limit = max(1, min([limit] + list(chunks.values())))
+
+        async def merge(results):
+            rooms = {node: list(page["rooms"]) for node, (_, page) in pages.items()}
+            totals = {node: page["total"] for node, (_, page) in pages.items()}
+            heads = [(page_key(rooms[node][0]), node, 0) for node in pages if rooms[node]]
+            heapq.heapify(heads)
+            merged = []
+            while heads and len(merged) < offset + limit:
+                _, node, position = heapq.heappop(heads)
+                merged.append(rooms[node][position])
+                position += 1
+                if position == len(rooms[node]) and position < totals[node]:
+                    more = await fetch(node, "/lobby/rooms", dict(params, offset=str(position), limit=str(chunks[node])))
+                    if more is not None:
+                        rooms[node].extend(more[1]["rooms"])
+                if position < len(rooms[node]):
+                    heapq.heappush(heads, (page_key(rooms[node][position]), node, position))
+            return {
+                "versions": {node: page["version"] for node, (_, page) in pages.items()},
+                "total": sum(totals.values()),
+                "offset": offset,
+                "limit": limit,
+                "counts": {status: sum(page["counts"][status] for _, page in results) for status in STATUSES},
+                "rooms": merged[offset:],
+            }
+        return await aggregated_response(request, list(pages.values()), merge)
+
+    @router.websocket("/lobby/ws")
+    async def lobby_feed(websocket: WebSocket):
+        """Flux du lobby de tous les workers : instantanés fusionnés, puis événements relayés"""
+        query = websocket.url.query
+        upstreams = await asyncio.gather(*(
+            websockets.connect(f"ws://{address}/lobby/ws" + (f"?{query}" if query else ""), ping_interval=None)
+            for address in nodes.values()
+        ), return_exceptions=True)
+        if any(isinstance(upstream, Exception) for upstream in upstreams):
+            for upstream in upstreams:
+                if not isinstance(upstream, Exception):
+                    await upstream.close()
+            await websocket.close(code=1013)
+            return
+        await websocket.accept()
+        try:
+            snapshots = [json.loads(message) for message in await asyncio.gather(*(u.recv() for u in upstreams))]
+            # Versions indépendantes d'un worker à l'autre : un vecteur {worker: version}, et chaque
+            # événement relayé indique son worker pour que le client tienne ce vecteur à jour
+            await websocket.send_text(json.dumps({
+                "type": "lobby_snapshot",
+                "versions": {node: snapshot["version"] for node, snapshot in zip(nodes, snapshots)},
+                "rooms": [room for snapshot in snapshots for room in snapshot["rooms"]],
+            }))
+
+            async def relay(node, upstream):
+                async for message in upstream:
+                    event = json.loads(message)
+                    event["node"] = node
+                    await websocket.send_text(json.dumps(event))
+
+            async def wait_disconnect():
+                while (await websocket.receive())["type"] != "websocket.disconnect":
+                    pass
+
+            # La fin d'un seul flux (worker arrêté, abonné trop lent) ferme tout : le client se resynchronise
+            tasks = [asyncio.create_task(relay(node, u)) for node, u in zip(nodes, upstreams)] + [asyncio.create_task(wait_disconnect())]
+            try:
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for task in tasks:
+                    task.cancel()
+        except Exception:
+            pass
+        finally:
+            for upstream in upstreams:
+                await upstream.close()
+            try:
+                await websocket.close()
+            except Exception:
+                pass
+
+    @router.post("/rooms")
+    @router.post("/rooms/private")
+    async def create_room(request: Request):
+        # Le worker choisit un identifiant qui lui appartient sur l'anneau
+        return await forward(request, next(round_robin))
+
+    @router.api_route("/rooms/{room_id}", methods=["GET", "POST", "PUT", "DELETE"])
+    async def room_route(request: Request, room_id: str):
+        return await forward(request, ring.owner(room_id))
+
+    @router.websocket("/ws/{room_id}")
+    async def proxy_websocket(websocket: WebSocket, room_id: str):
+        query = websocket.url.query
+        url = f"ws://{nodes[ring.owner(room_id)]}/ws/{room_id}" + (f"?{query}" if query else "")
+        try:
+            upstream = await websockets.connect(url, max_size=None, ping_interval=None)
+        except Exception:
+            # Refus du worker (salle pleine, surcharge...) : refuser sans accepter
+            await websocket.close(code=1013)
+            return
+        await websocket.accept()
+
+        async def client_to_upstream():
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                if message.get("bytes") is not None:
+                    await upstream.send(message["bytes"])
+                else:
+                    await upstream.send(message["text"])
+
+        async def upstream_to_client():
+            async for message in upstream:
+                if isinstance(message, bytes):
+                    await websocket.send_bytes(message)
+                else:
+                    await websocket.send_text(message)
+
+        tasks = [asyncio.create_task(client_to_upstream()), asyncio.create_task(upstream_to_client())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await upstream.close()
+            try:
+                await websocket.close()
+            except Exception:
+                pass
+
+    def target_node(request: Request) -> Tuple[Optional[str], Dict[str, str]]:
+        """Worker demandé par ?node= (None = tous) et paramètres à transmettre"""
+        params = dict(request.query_params)
+        node = params.pop("node", None)
+        if node is not None and node not in nodes:
+            raise HTTPException(status_code=404, detail=f"Unknown node, expected one of {', '.join(nodes)}")
+        return node, params
+
+    async def query_workers(request: Request, params: Dict[str, str]) -> Dict[str, Optional[httpx.Response]]:
+        """Même requête sur chaque worker ; None pour ceux qui ne répondent pas"""
+        content = await request.body()
+
+        async def query(node: str) -> Optional[httpx.Response]:
+            try:
+                return await client.request(request.method, f"http://{nodes[node]}{request.url.path}",
+                                            params=params, content=content)
+            except httpx.HTTPError:
+                return None
+
+        responses = await asyncio.gather(*(query(node) for node in nodes))
+        return dict(zip(nodes, responses))
+
+    @router.get("/metrics")
+    async def metrics(request: Request):
+        """Métriques de tous les workers, chaque échantillon étiqueté node="<worker>" (?node= : un seul worker)"""
+        node, params = target_node(request)
+        if node is not None:
+            return await forward(request, node, params)
+        responses = await query_workers(request, params)
+        text = merge_metrics([(node, response.text) for node, response in responses.items()
+                              if response is not None and response.status_code == 200])
+        return Response(content=text, media_type=METRICS_CONTENT_TYPE)
+
+    async def worker_stats(request: Request):
+        """Statistiques de chaque worker, par nom de worker (?node= : réponse brute d'un seul worker)"""
+        node, params = target_node(request)
+        if node is not None:
+            return await forward(request, node, params)
+        workers, errors = {}, {}
+        for node, response in (await query_workers(request, params)).items():
+            if response is None:
+                errors[node] = "unreachable"
+            elif response.status_code != 200:
+                errors[node] = response.status_code
+            else:
+                workers[node] = response.json()
+        return {"workers": workers, "errors": errors}
+
+    for path in WORKER_STATS:
+        router.add_api_route(path, worker_stats, methods=["GET"])
+    router.add_api_route("/memory/tracemalloc/snapshot", worker_stats, methods=["POST"])
+
+    @router.get("/variants/{path:path}")
+    async def variant_route(request: Request, path: str):
+        # Une image donnée est toujours générée par le même worker (pas de rendu en double)
+        return await forward(request, ring.owner(path))
+
+    @router.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "HEAD"])
+    async def any_worker(request: Request, path: str):
+        return await forward(request, next(round_robin))
+
+    return router
@@ -0,0 +1,210 @@
+"""Catalogue des scènes : choisies par salle, chargées au premier usage, évincées sous budget mémoire.
+
+La scène historique (images/sky*.png, paquet ASSET_BUNDLE_PATH) est toujours présente sous
+l'identifiant DEFAULT_SCENE. D'autres scènes sont déclarées dans un manifeste JSON :
+
+    {"default": "sky",
+     "scenes": [{"id": "harbor", "name": "Port", "dir": "harbor", "preload": false,
+                 "files": {"base": "base.png", "nvg": "nvg.png",
+                           "thermal": "thermal.png", "thermal_nodrone": "thermal_nodrone.png"}}]}
+
+`dir` est relatif au répertoire du manifeste ; chaque scène a son propre paquet compilé
+(data/scenes/<id>.bundle). Les salles prennent une référence sur leur scène ; quand les
+scènes chargées dépassent SCENE_MEMORY_BUDGET_MB, les moins récemment utilisées qui n'ont
+plus de salle sont déchargées (elles se rechargent au prochain usage).
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+
+from assets import ASSET_BUNDLE_PATH, IMAGES_DIR, PYRAMID_LEVELS, SCENE_FILES, AssetRegistry, asset_registry
+from debuglog import console
+
+DEFAULT_SCENE = "sky"
+SCENES_MANIFEST = os.getenv('SCENES_MANIFEST', os.path.join(IMAGES_DIR, 'scenes', 'manifest.json'))
+SCENE_MEMORY_BUDGET_MB = float(os.getenv('SCENE_MEMORY_BUDGET_MB', '256'))
+# Scènes chargées au démarrage en plus de celles marquées "preload" dans le manifeste
+SCENE_PRELOAD = [s.strip() for s in os.getenv('SCENE_PRELOAD', '').split(',') if s.strip()]
+
+
+class SceneEntry:
+    """Une scène du catalogue : son registre de calques et son suivi d'usage"""
+
+    def __init__(self, scene_id: str, name: str, registry: AssetRegistry, preload: bool = False):
+        self.scene_id = scene_id
+        self.name = name
+        self.registry = registry
+        self.preload = preload
+        self.refs = 0
+        self.loads = 0
+        self.evictions = 0
+        self.last_used = 0.0
+
+
+class SceneCatalog:
+    def __init__(self, entries: Iterable[SceneEntry], default: str = DEFAULT_SCENE, budget_mb: float = 256.0):
+        self._entries: Dict[str, SceneEntry] = {entry.scene_id: entry for entry in entries}
+        if default not in self._entries:
+            raise ValueError(f"Scène par défaut inconnue: {default}")
+        self.default = default
+        self.budget = int(budget_mb * 1024 * 1024)
+        # Scènes chargées, de la moins à la plus récemment utilisée
+        self._lru: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_manifest(cls, path: str = SCENES_MANIFEST, levels=PYRAMID_LEVELS,
+                      bundle_dir: Optional[str] = None, budget_mb: float = SCENE_MEMORY_BUDGET_MB) -> "SceneCatalog":
+        """Scène historique + scènes du manifeste (s'il existe)"""
+        builtin = SceneEntry(DEFAULT_SCENE, "Aéroport", asset_registry, preload=True)
+        entries = {DEFAULT_SCENE: builtin}
+        default = DEFAULT_SCENE
+        if bundle_dir is None:
+            bundle_dir = os.path.join(os.path.dirname(ASSET_BUNDLE_PATH), "scenes") if ASSET_BUNDLE_PATH else ""
+        if path and os.path.exists(path):
+            with open(path) as f:
+                manifest = json.load(f)
+            base_dir = os.path.dirname(os.path.abspath(path))
+            for spec in manifest.get("scenes", []):
+                scene_id = str(spec["id"])
+                if scene_id == DEFAULT_SCENE:
+                    # La scène historique garde ses fichiers ; seuls le nom et le préchargement sont repris
+                    builtin.name = spec.get("name", builtin.name)
+                    builtin.preload = bool(spec.get("preload", builtin.preload))
+                    continue
+                files = dict(SCENE_FILES, **spec.get("files", {}))
+                registry = AssetRegistry(
+                    os.path.join(base_dir, spec.get("dir", scene_id)), levels,
+                    os.path.join(bundle_dir, f"{scene_id}.bundle") if bundle_dir else "",
+                    files=files, scene_id=scene_id)
+                entries[scene_id] = SceneEntry(scene_id, spec.get("name", scene_id), registry,
+                                               bool(spec.get("preload", False)))
+            default = str(manifest.get("default", DEFAULT_SCENE))
+            if default not in entries:
+                # Une erreur de manifeste ne doit pas empêcher les workers de démarrer
+                console(f"⚠️ Scène par défaut inconnue dans {path}: {default} ; repli sur {DEFAULT_SCENE}")
+                default = DEFAULT_SCENE
+        for scene_id in SCENE_PRELOAD:
+            if scene_id in entries:
+                entries[scene_id].preload = True
+        return cls(entries.values(), default, budget_mb)
+
+    def __contains__(self, scene_id: str) -> bool:
+        return scene_id in self._entries
+
+    def resolve(self, scene_id: Optional[str]) -> str:
+        """Identifiant de scène valide (la scène par défaut si aucun n'est demandé) ; KeyError sinon"""
+        if not scene_id:
+            return self.default
+        if scene_id not in self._entries:
+            raise KeyError(scene_id)
+        return scene_id
+
+    def registry(self, scene_id: str) -> AssetRegistry:
+        return self._entries[scene_id].registry
+
+    def images(self, scene_id: str) -> Mapping[str, np.ndarray]:
+        """Calques de la scène, chargés au premier usage ; peut évincer d'autres scènes inutilisées"""
+        entry = self._entries[scene_id]
+        was_loaded = entry.registry.loaded
+        images = entry.registry.get()
+        with self._lock:
+            entry.last_used = time.monotonic()
+            if not was_loaded:
+                entry.loads += 1
+            self._lru[scene_id] = None
+            self._lru.move_to_end(scene_id)
+            if not was_loaded:
+                self._evict()
+        return images
+
+    def detector(self, scene_id: str, layer: str = "thermal"):
+        self.images(scene_id)
+        return self._entries[scene_id].registry.detector(layer)
+
+    def acquire(self, scene_id: str) -> None:
+        """Une salle utilise la scène : elle ne sera pas évincée tant que la salle existe.
+        À appeler avant images() : entre un chargement et une référence prise après coup,
+        un autre thread pourrait évincer la scène
+        """
+        with self._lock:
+            self._entries[scene_id].refs += 1
+
+    def release(self, scene_id: str) -> None:
+        with self._lock:
+            entry = self._entries.get(scene_id)
+            if entry is not None and entry.refs > 0:
+                entry.refs -= 1
+            self._evict()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(self._entries[scene_id].registry.nbytes for scene_id in self._lru)
+
+    def _evict(self) -> None:
+        """Décharge les scènes sans salle, de la moins récemment utilisée, jusqu'à revenir sous le budget"""
+        if self.budget <= 0:
+            return
+        total = self.nbytes
+        # La scène la plus récente n'est jamais évincée : c'est celle qu'on vient de servir
+        for scene_id in list(self._lru)[:-1]:
+            if total <= self.budget:
+                return
+            entry = self._entries[scene_id]
+            if entry.refs > 0:
+                continue
+            freed = entry.registry.unload()
+            del self._lru[scene_id]
+            entry.evictions += 1
+            total -= freed
+            console(f"♻️ Scène {scene_id} déchargée ({freed / 1e6:.1f} Mo, budget {self.budget / 1e6:.0f} Mo)")
+
+    def preload_ids(self) -> List[str]:
+        return [scene_id for scene_id, entry in self._entries.items() if entry.preload]
+
+    def preload(self) -> None:
+        """Charge les scènes marquées "preload" (à appeler hors de la boucle d'événements)"""
+        for scene_id in self.preload_ids():
+            try:
+                self.detector(scene_id)
+            except (OSError, ValueError) as e:
+                console(f"⚠️ Préchargement de la scène {scene_id} impossible: {e}")
+
+    def listing(self) -> List[Dict]:
+        """Scènes proposées aux clients"""
+        return [{"id": scene_id, "name": entry.name, "default": scene_id == self.default}
+                for scene_id, entry in self._entries.items()]
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        scenes = {}
+        for scene_id, entry in self._entries.items():
+            registry = entry.registry
+            scenes[scene_id] = {
+                "name": entry.name,
+                "loaded": registry.loaded,
+                "resident_bytes": registry.nbytes,
+                "load_time_ms": round(registry.load_time_ms, 2),
+                "source": registry.source,
+                "rooms": entry.refs,
+                "loads": entry.loads,
+                "evictions": entry.evictions,
+                "preload": entry.preload,
+                "idle_s": round(now - entry.last_used, 1) if entry.last_used else None,
+            }
+        return {
+            "default": self.default,
+            "budget_bytes": self.budget,
+            "resident_bytes": self.nbytes,
+            "lru": list(self._lru),
+            "scenes": scenes,
+        }
+
+
+# Catalogue unique du processus
+scene_catalog = SceneCatalog.from_manifest()
@@ -0,0 +1,159 @@
+"""Ordonnanceur unique (tas de priorités) pour toutes les échéances des salles.
+
+Une seule tâche asyncio dort jusqu'à la prochaine échéance : fin d'alarme, suppression
+d'une salle vide... au lieu d'une tâche endormie (et d'un réveil par seconde) par salle.
+"""
+import asyncio
+import heapq
+import inspect
+import itertools
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from debuglog import console
+
+
+class Timer:
+    """Échéance programmée ; annulable et interrogeable sur le temps restant"""
+    __slots__ = ("when", "callback", "args", "key", "cancelled", "_scheduler")
+
+    def __init__(self, scheduler: "Scheduler", when: float, callback: Callable, args, key: Optional[Hashable]):
+        self._scheduler = scheduler
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.key = key
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        if not self.cancelled:
+            self.cancelled = True
+            self._scheduler._discard(self)
+
+    def remaining(self) -> float:
+        return max(0.0, self.when - self._scheduler.clock())
+
+
+class Scheduler:
+    """Tas d'échéances servi par une seule tâche de fond"""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._heap: List = []
+        self._seq = itertools.count()
+        self._keys: Dict[Hashable, Timer] = {}
+        self._pending = 0
+        self._cancelled_in_heap = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running_callbacks = set()
+        self.fired = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def schedule(self, delay: float, callback: Callable, *args, key: Optional[Hashable] = None) -> Timer:
+        """Programme callback(*args) dans `delay` secondes ; une clé existante est remplacée"""
+        return self.schedule_at(self.clock() + max(0.0, delay), callback, *args, key=key)
+
+    def schedule_at(self, when: float, callback: Callable, *args, key: Optional[Hashable] = None) -> Timer:
+        if key is not None:
+            self.cancel(key)
+        timer = Timer(self, when, callback, args, key)
+        if key is not None:
+            self._keys[key] = timer
+        self._pending += 1
+        heapq.heappush(self._heap, (when, next(self._seq), timer))
+        self.start()
+        if self._heap[0][2] is timer:
+            self._wakeup.set()
+        return timer
+
+    def cancel(self, key: Hashable) -> bool:
+        timer = self._keys.get(key)
+        if timer is None:
+            return False
+        timer.cancel()
+        return True
+
+    def get(self, key: Hashable) -> Optional[Timer]:
+        return self._keys.get(key)
+
+    def remaining(self, key: Hashable) -> Optional[float]:
+        """Secondes restantes avant l'échéance d'une clé (None si rien n'est programmé)"""
+        timer = self._keys.get(key)
+        return timer.remaining() if timer is not None else None
+
+    def _discard(self, timer: Timer) -> None:
+        if timer.key is not None and self._keys.get(timer.key) is timer:
+            del self._keys[timer.key]
+        self._pending -= 1
+        self._cancelled_in_heap += 1
+        # Compacter le tas quand les entrées annulées deviennent majoritaires
+        if self._cancelled_in_heap > 64 and self._cancelled_in_heap > len(self._heap) // 2:
+            self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled_in_heap = 0
+
+    async def _run(self) -> None:
+        while True:
+            heap = self._heap
+            while heap and heap[0][2].cancelled:
+                heapq.heappop(heap)
+                self._cancelled_in_heap -= 1
+            now = self.clock()
+            if heap and heap[0][0] <= now:
+                _, _, timer = heapq.heappop(heap)
+                self._fire(timer)
+                continue
+            timeout = heap[0][0] - now if heap else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _fire(self, timer: Timer) -> None:
+        if timer.key is not None and self._keys.get(timer.key) is timer:
+            del self._keys[timer.key]
+        timer.cancelled = True
+        self._pending -= 1
+        self.fired += 1
+        try:
+            result = timer.callback(*timer.args)
+        except Exception as e:
+            console(f"❌ Échéance {timer.key} en erreur: {e}")
+            return
+        if inspect.isawaitable(result):
+            task = asyncio.ensure_future(result)
+            self._running_callbacks.add(task)
+            task.add_done_callback(self._callback_done)
+
+    def _callback_done(self, task: asyncio.Task) -> None:
+        self._running_callbacks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            console(f"❌ Échéance en erreur: {task.exception()}")
+
+    def stats(self) -> Dict[str, Any]:
+        by_kind: Dict[str, int] = {}
+        for key in self._keys:
+            kind = key[0] if isinstance(key, tuple) else str(key)
+            by_kind[kind] = by_kind.get(kind, 0) + 1
+        return {
+            "pending": self._pending,
+            "by_kind": by_kind,
+            "fired": self.fired,
+            "heap_size": len(self._heap),
+            "running_callbacks": len(self._running_callbacks),
+        }
@@ -0,0 +1,64 @@
+"""Répartition des salles entre processus workers par hachage cohérent.
+
+Chaque worker possède des points virtuels sur un anneau ; une salle appartient au
+premier point qui suit le hachage de son identifiant. Ajouter un worker ne déplace
+qu'environ 1/N des salles.
+"""
+import bisect
+import hashlib
+import os
+from typing import Dict, List, Optional
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Anneau de hachage cohérent avec nœuds virtuels"""
+
+    def __init__(self, nodes: List[str], vnodes: int = 128):
+        if not nodes:
+            raise ValueError("L'anneau de hachage nécessite au moins un nœud")
+        self.nodes = list(nodes)
+        self.vnodes = vnodes
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes))
+        self._hashes = [h for h, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, key: str) -> str:
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+
+def parse_nodes(spec: str) -> Dict[str, Optional[str]]:
+    """'shard-0=127.0.0.1:8101,shard-1=127.0.0.1:8102' -> {nom: adresse}"""
+    nodes: Dict[str, Optional[str]] = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, address = item.partition("=")
+        nodes[name.strip()] = address.strip() or None
+    return nodes
+
+
+def format_nodes(nodes: Dict[str, str]) -> str:
+    return ",".join(f"{name}={address}" for name, address in nodes.items())
+
+
+class ShardMembership:
+    """Vue d'un worker sur l'anneau : sait si une salle lui appartient"""
+
+    def __init__(self, shard_id: Optional[str], nodes_spec: str):
+        self.shard_id = shard_id or None
+        nodes = parse_nodes(nodes_spec or "")
+        self.ring = HashRing(list(nodes)) if self.shard_id and nodes else None
+
+    @classmethod
+    def from_env(cls) -> "ShardMembership":
+        return cls(os.getenv("SHARD_ID"), os.getenv("SHARD_NODES", ""))
+
+    @property
+    def enabled(self) -> bool:
+        return self.ring is not None
+
+    def owns(self, room_id: str) -> bool:
+        return self.ring is None or self.ring.owner(room_id) == self.shard_id
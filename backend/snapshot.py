@@ -0,0 +1,54 @@
+"""Instantanés de l'état des salles et redémarrage à chaud.
+
+Seul l'état de jeu est sauvegardé (pas les images ni les sockets). Le fichier est un
+en-tête de version suivi d'un JSON compressé zlib ; l'écriture est atomique (fichier
+temporaire puis os.replace) pour qu'un crash pendant la sauvegarde ne corrompe rien.
+Les échéances d'alarme sont stockées en heure murale et recalées à la restauration.
+"""
+import json
+import os
+import time
+import zlib
+from typing import Dict, List, Optional
+
+from debuglog import console
+
+MAGIC = b"WSROOMS1\n"
+
+
+def encode_snapshot(rooms: List[Dict]) -> bytes:
+    payload = json.dumps({"saved_at": time.time(), "rooms": rooms}, separators=(",", ":")).encode()
+    return MAGIC + zlib.compress(payload, 3)
+
+
+def decode_snapshot(data: bytes) -> Dict:
+    if not data.startswith(MAGIC):
+        raise ValueError("Format d'instantané inconnu")
+    return json.loads(zlib.decompress(data[len(MAGIC):]))
+
+
+def write_snapshot(path: str, rooms: List[Dict]) -> int:
+    """Écrit l'instantané de façon atomique ; retourne la taille du fichier"""
+    data = encode_snapshot(rooms)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+def read_snapshot(path: str) -> Optional[Dict]:
+    """Lit un instantané ; None s'il n'existe pas ou s'il est illisible"""
+    try:
+        with open(path, "rb") as f:
+            return decode_snapshot(f.read())
+    except FileNotFoundError:
+        return None
+    except (ValueError, zlib.error) as e:
+        console(f"⚠️ Instantané ignoré ({path}): {e}")
+        return None
@@ -0,0 +1,221 @@
+"""Spectateurs d'une salle : diffusion des frames des joueurs, encodées une seule fois.
+
+Un spectateur (`/ws/{room_id}?role=spectator&watch=1,2`) ne déclenche aucun rendu : il
+reçoit les octets déjà encodés pour le joueur qu'il regarde. Chaque frame est sérialisée au
+plus une fois par protocole, quel que soit le nombre de spectateurs. Chaque spectateur a
+une boîte aux lettres (dernière frame de chaque joueur) vidée à sa propre cadence : un
+spectateur lent saute des frames au lieu d'accumuler du retard, et il est déconnecté au
+premier envoi bloqué, avant que les joueurs n'en pâtissent.
+"""
+import asyncio
+import base64
+import json
+import time
+from collections import deque
+from typing import Dict, Iterable, Optional, Set
+
+from debuglog import console
+from encoders import mime_type
+from protocol import FORMAT_CODES, FRAME_MOVE, PROTOCOL_BINARY, pack_frame
+
+PLAYERS = (1, 2)
+
+
+def parse_watch(spec: Optional[str]) -> Set[int]:
+    """Joueurs suivis : "1", "2", "1,2" (par défaut les deux)"""
+    watching = set()
+    for item in (spec or "").split(","):
+        try:
+            if int(item) in PLAYERS:
+                watching.add(int(item))
+        except ValueError:
+            pass
+    return watching or set(PLAYERS)
+
+
+class SharedFrame:
+    """Frame d'un joueur, sérialisée paresseusement une fois par protocole"""
+    __slots__ = ("player_id", "position", "image", "fmt", "size", "_json", "_binary")
+
+    def __init__(self, player_id: int, position: Dict, image: bytes, fmt: str, size: int):
+        self.player_id = player_id
+        self.position = position
+        self.image = image
+        self.fmt = fmt
+        self.size = size
+        self._json = None
+        self._binary = None
+
+    def message(self, protocol: str):
+        if protocol == PROTOCOL_BINARY:
+            if self._binary is None:
+                self._binary = pack_frame(FRAME_MOVE, self.player_id, self.position, self.image, FORMAT_CODES[self.fmt])
+            return self._binary
+        if self._json is None:
+            self._json = json.dumps({
+                "type": "spectator_frame",
+                "player_id": self.player_id,
+                "position": self.position,
+                "frame_size": self.size,
+                "image_data": f"data:{mime_type(self.fmt)};base64,{base64.b64encode(self.image).decode()}",
+            })
+        return self._json
+
+
+class Spectator:
+    def __init__(self, websocket, protocol: str, watching: Iterable[int], max_events: int):
+        self.websocket = websocket
+        self.protocol = protocol
+        self.watching = set(watching)
+        # Dernière frame non envoyée de chaque joueur suivi, et événements de la salle en attente
+        self.pending: Dict[int, SharedFrame] = {}
+        self.events = deque()
+        self.max_events = max_events
+        self.wakeup = asyncio.Event()
+        # Niveau de pyramide annoncé pour chaque joueur (les frames binaires ne le portent pas)
+        self.sizes: Dict[int, int] = {}
+        self.frames_sent = 0
+        self.frames_skipped = 0
+
+    def offer_frame(self, frame: SharedFrame) -> None:
+        if frame.player_id not in self.watching:
+            return
+        if frame.player_id in self.pending:
+            self.frames_skipped += 1
+        self.pending[frame.player_id] = frame
+        self.wakeup.set()
+
+    def offer_event(self, payload: str) -> bool:
+        """Faux si le spectateur a trop d'événements en retard"""
+        if len(self.events) >= self.max_events:
+            return False
+        self.events.append(payload)
+        self.wakeup.set()
+        return True
+
+
+class SpectatorHub:
+    """Spectateurs d'une salle"""
+
+    def __init__(self, room_id: str, max_spectators: int = 50, max_fps: float = 10.0,
+                 send_timeout: float = 1.0, max_events: int = 32):
+        self.room_id = room_id
+        self.max_spectators = max_spectators
+        self.interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.send_timeout = send_timeout
+        self.max_events = max_events
+        self.spectators: Set[Spectator] = set()
+        self.latest: Dict[int, SharedFrame] = {}
+        self.dropped = 0
+        self._last_shed = 0.0
+        # Fermetures en cours (gardées référencées jusqu'à leur fin)
+        self._closing: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self.spectators)
+
+    def full(self) -> bool:
+        return len(self.spectators) >= self.max_spectators
+
+    def add(self, websocket, protocol: str, watching: Iterable[int]) -> Spectator:
+        spectator = Spectator(websocket, protocol, watching, self.max_events)
+        self.spectators.add(spectator)
+        # Dernière image connue des joueurs suivis, pour ne pas attendre leur prochain mouvement
+        for frame in self.latest.values():
+            spectator.offer_frame(frame)
+        return spectator
+
+    def frame_sizes(self, spectator: Spectator) -> Dict[int, int]:
+        """Niveau des dernières frames des joueurs suivis, annoncé dans spectator_state"""
+        spectator.sizes = {player_id: frame.size for player_id, frame in self.latest.items()
+                           if player_id in spectator.watching}
+        return dict(spectator.sizes)
+
+    def remove(self, spectator: Spectator) -> None:
+        self.spectators.discard(spectator)
+
+    def publish_frame(self, player_id: int, position: Dict, image: bytes, fmt: str, size: int) -> None:
+        """Frame encodée pour un joueur ; ne coûte qu'une affectation par spectateur"""
+        if not self.spectators:
+            return
+        frame = SharedFrame(player_id, dict(position), image, fmt, size)
+        self.latest[player_id] = frame
+        for spectator in self.spectators:
+            spectator.offer_frame(frame)
+
+    def publish_event(self, payload: str) -> None:
+        """Message déjà sérialisé de la salle (alarme, détection...) ; les spectateurs en retard sont déconnectés"""
+        for spectator in list(self.spectators):
+            if not spectator.offer_event(payload):
+                self.drop(spectator, "événements en retard")
+
+    def shed(self) -> None:
+        """Sous pression (envois des joueurs dégradés) : déconnecter un spectateur, au plus un par seconde"""
+        now = time.monotonic()
+        if not self.spectators or now - self._last_shed < 1.0:
+            return
+        self._last_shed = now
+        self.drop(max(self.spectators, key=lambda s: s.frames_skipped), "charge du serveur")
+
+    def drop(self, spectator: Spectator, reason: str) -> None:
+        if spectator not in self.spectators:
+            return
+        self.spectators.discard(spectator)
+        self.dropped += 1
+        console(f"👁️ Spectateur déconnecté de la salle {self.room_id} ({reason})")
+
+        async def close_quietly():
+            try:
+                await asyncio.wait_for(spectator.websocket.close(code=1013), self.send_timeout)
+            except Exception:
+                pass
+        task = asyncio.create_task(close_quietly())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    def close_all(self) -> None:
+        for spectator in list(self.spectators):
+            self.drop(spectator, "salle supprimée")
+
+    async def serve(self, spectator: Spectator) -> None:
+        """Boucle d'envoi d'un spectateur : événements puis dernières frames, à la cadence des spectateurs"""
+        websocket = spectator.websocket
+        last_frame = 0.0
+        try:
+            while spectator in self.spectators:
+                await spectator.wakeup.wait()
+                spectator.wakeup.clear()
+                while spectator.events:
+                    await asyncio.wait_for(websocket.send_text(spectator.events.popleft()), self.send_timeout)
+                if not spectator.pending:
+                    continue
+                delay = last_frame + self.interval - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                frames, spectator.pending = list(spectator.pending.values()), {}
+                for frame in frames:
+                    message = frame.message(spectator.protocol)
+                    if isinstance(message, bytes) and spectator.sizes.get(frame.player_id) != frame.size:
+                        # Positions binaires exprimées dans le niveau du joueur : l'annoncer quand il change
+                        await asyncio.wait_for(websocket.send_text(json.dumps({
+                            "type": "spectator_frame_size", "player_id": frame.player_id, "frame_size": frame.size,
+                        })), self.send_timeout)
+                        spectator.sizes[frame.player_id] = frame.size
+                    if isinstance(message, bytes):
+                        await asyncio.wait_for(websocket.send_bytes(message), self.send_timeout)
+                    else:
+                        await asyncio.wait_for(websocket.send_text(message), self.send_timeout)
+                    spectator.frames_sent += 1
+                last_frame = time.monotonic()
+        except asyncio.TimeoutError:
+            self.drop(spectator, "envoi bloqué")
+        except Exception:
+            self.remove(spectator)
+
+    def stats(self) -> Dict:
+        return {
+            "spectators": len(self.spectators),
+            "dropped": self.dropped,
+            "frames_sent": sum(s.frames_sent for s in self.spectators),
+            "frames_skipped": sum(s.frames_skipped for s in self.spectators),
+        }
@@ -0,0 +1,5 @@
+"""Les modules du backend sont importés par leur nom, comme quand uvicorn est lancé depuis backend/"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
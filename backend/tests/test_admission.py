@@ -0,0 +1,92 @@
+"""Contrôle d'admission : limites de salles, de connexions, de mémoire et cadence de création"""
+import types
+
+import pytest
+
+import admission
+from admission import AdmissionController, client_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = types.SimpleNamespace(now=1000.0)
+    fake.monotonic = lambda: fake.now
+    monkeypatch.setattr(admission, "time", fake)
+    return fake
+
+
+def test_room_limit_is_a_503(clock):
+    controller = AdmissionController(max_rooms=2, retry_after=7)
+    assert controller.check_room("1.2.3.4", rooms=1) is None
+    rejection = controller.check_room("1.2.3.4", rooms=2)
+    assert (rejection.status, rejection.reason, rejection.retry_after) == (503, "rooms", 7)
+    assert rejection.headers == {"Retry-After": "7"}
+    assert controller.rejected == {"rooms": 1}
+
+
+def test_creation_rate_is_limited_per_client(clock):
+    controller = AdmissionController(create_per_minute=6, create_burst=2)
+    assert controller.check_room("a", rooms=0) is None
+    assert controller.check_room("a", rooms=0) is None
+    rejection = controller.check_room("a", rooms=0)
+    # 6 par minute : un jeton toutes les 10 s
+    assert (rejection.status, rejection.reason, rejection.retry_after) == (429, "rate", 11)
+    assert controller.check_room("b", rooms=0) is None
+
+    clock.now += 5
+    assert controller.check_room("a", rooms=0).retry_after == 6
+    clock.now += 5
+    assert controller.check_room("a", rooms=0) is None
+    assert controller.check_room("a", rooms=0).status == 429
+
+
+def test_bucket_refills_up_to_the_burst(clock):
+    controller = AdmissionController(create_per_minute=60, create_burst=3)
+    for _ in range(3):
+        assert controller.check_room("a", rooms=0) is None
+    clock.now += 3600
+    for _ in range(3):
+        assert controller.check_room("a", rooms=0) is None
+    assert controller.check_room("a", rooms=0).status == 429
+
+
+def test_zero_rate_disables_the_bucket(clock):
+    controller = AdmissionController(create_per_minute=0, create_burst=1)
+    for _ in range(10):
+        assert controller.check_room("a", rooms=0) is None
+    assert controller.stats()["tracked_clients"] == 0
+
+
+def test_tracked_clients_are_bounded(clock):
+    controller = AdmissionController(create_per_minute=60, create_burst=1, max_clients=3)
+    for client in ("a", "b", "c"):
+        controller.check_room(client, rooms=0)
+    # Seaux redevenus pleins : oubliés pour faire de la place
+    clock.now += 2
+    controller.check_room("d", rooms=0)
+    assert controller.stats()["tracked_clients"] == 1
+
+
+def test_connection_limit(clock):
+    controller = AdmissionController(max_connections=2, retry_after=3)
+    controller.connections = 1
+    assert controller.check_connection() is None
+    controller.connections = 2
+    rejection = controller.check_connection()
+    assert (rejection.status, rejection.reason, rejection.retry_after) == (503, "connections", 3)
+
+
+def test_memory_budget(clock, monkeypatch):
+    monkeypatch.setattr(admission, "rss_bytes", lambda: 300 * 1024 * 1024)
+    controller = AdmissionController(memory_budget_mb=256)
+    assert controller.check_connection().reason == "memory"
+    assert controller.check_room("a", rooms=0).reason == "memory"
+    assert AdmissionController(memory_budget_mb=0).check_connection() is None
+
+
+def test_client_key():
+    assert client_key("203.0.113.5", None) == "203.0.113.5"
+    # X-Forwarded-For n'est cru que derrière le routeur local
+    assert client_key("127.0.0.1", "198.51.100.7, 10.0.0.1") == "198.51.100.7"
+    assert client_key("203.0.113.5", "198.51.100.7") == "203.0.113.5"
+    assert client_key(None, None) == "unknown"
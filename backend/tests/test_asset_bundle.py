@@ -0,0 +1,85 @@
+"""Paquet d'assets : format sur disque, projection mmap et détection des sources modifiées"""
+import os
+
+import numpy as np
+import pytest
+
+import asset_bundle
+from asset_bundle import ALIGN, open_bundle, read_header, source_fingerprint, sources_changed, write_bundle
+
+PARAMS = {"scale": 1, "levels": 3}
+
+
+@pytest.fixture
+def arrays():
+    rng = np.random.default_rng(7)
+    shared = rng.integers(0, 255, size=(60, 80, 3), dtype=np.uint8)
+    return {
+        "NVG": shared,
+        "NVG@0": shared,
+        "thermal": rng.random((60, 80), dtype=np.float32),
+        # Vue non contiguë : écrite dans l'ordre C
+        "mask": rng.integers(0, 2, size=(80, 60), dtype=np.uint8).T,
+    }
+
+
+def test_round_trip(tmp_path, arrays):
+    path = str(tmp_path / "scene.bundle")
+    size = write_bundle(path, arrays, {"NVG": {"size": 1}}, PARAMS)
+    assert size == os.path.getsize(path)
+    loaded, header = open_bundle(path)
+    assert set(loaded) == set(arrays)
+    for key, arr in arrays.items():
+        assert loaded[key].dtype == arr.dtype
+        np.testing.assert_array_equal(loaded[key], arr)
+        assert not loaded[key].flags.writeable
+    assert header["params"] == PARAMS
+    assert header["sources"] == {"NVG": {"size": 1}}
+    assert header["data_start"] % ALIGN == 0
+    assert all(spec["offset"] % ALIGN == 0 for spec in header["arrays"].values())
+
+
+def test_shared_array_is_written_once(tmp_path, arrays):
+    path = str(tmp_path / "scene.bundle")
+    write_bundle(path, arrays, {}, PARAMS)
+    loaded, header = open_bundle(path)
+    specs = header["arrays"]
+    assert specs["NVG"]["offset"] == specs["NVG@0"]["offset"]
+    assert len({spec["offset"] for spec in specs.values()}) == 3
+    assert loaded["NVG"] is loaded["NVG@0"]
+
+
+def test_invalid_or_other_version_bundle_is_rejected(tmp_path, arrays, monkeypatch):
+    path = str(tmp_path / "scene.bundle")
+    assert read_header(path) is None
+    with open(path, "wb") as f:
+        f.write(b"not a bundle")
+    assert read_header(path) is None
+    with pytest.raises(ValueError):
+        open_bundle(path)
+    write_bundle(path, arrays, {}, PARAMS)
+    assert read_header(path) is not None
+    monkeypatch.setattr(asset_bundle, "BUNDLE_VERSION", asset_bundle.BUNDLE_VERSION + 1)
+    assert read_header(path) is None
+
+
+def test_sources_changed(tmp_path):
+    source = tmp_path / "NVG.png"
+    source.write_bytes(b"original image")
+    paths = {"NVG": str(source)}
+    recorded = source_fingerprint(paths)
+    assert not sources_changed(recorded, paths, PARAMS, PARAMS)
+    assert sources_changed(recorded, paths, {"scale": 2, "levels": 3}, PARAMS)
+    assert sources_changed(recorded, {**paths, "IR": str(source)}, PARAMS, PARAMS)
+
+    # Date modifiée mais contenu identique : le paquet reste valide
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert not sources_changed(recorded, paths, PARAMS, PARAMS)
+
+    source.write_bytes(b"modified image")
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+    assert sources_changed(recorded, paths, PARAMS, PARAMS)
+
+    source.unlink()
+    assert sources_changed(recorded, paths, PARAMS, PARAMS)
@@ -0,0 +1,75 @@
+"""La détection par table des sommes doit donner exactement le résultat de la boucle d'origine"""
+import numpy as np
+import pytest
+
+from assets import DETECTION_RADIUS, DETECTION_THRESHOLD, DroneDetector
+
+
+def is_drone_pixel(px):
+    """Heuristique d'origine, pixel par pixel (ancienne GameRoom.is_drone_pixel)"""
+    r, g, b = px.astype(np.float32) / 255.0
+    bright = (r + g + b) / 3.0 > 0.4
+    warm = (r > 0.5) and (g > 0.3) and (b < 0.6) and (r >= g * 0.8)
+    yellow_orange = (r > 0.6) and (g > 0.4) and (b < 0.4)
+    return bright and (warm or yellow_orange)
+
+
+def reference_count(therm, display_shape, x, y):
+    """Comptage d'origine (ancienne GameRoom.check_drone_detection)"""
+    sx = float(therm.shape[1]) / float(display_shape[1])
+    sy = float(therm.shape[0]) / float(display_shape[0])
+    xb = int(round(float(x) * sx))
+    yb = int(round(float(y) * sy))
+    k = DETECTION_RADIUS
+    y0 = max(0, int(yb - k))
+    y1 = min(therm.shape[0], int(yb + k + 1))
+    x0 = max(0, int(xb - k))
+    x1 = min(therm.shape[1], int(xb + k + 1))
+    region = therm[y0:y1, x0:x1, :]
+    return sum(is_drone_pixel(region[i, j]) for i in range(region.shape[0]) for j in range(region.shape[1]))
+
+
+@pytest.fixture(scope="module")
+def thermal():
+    rng = np.random.default_rng(1234)
+    # Fond froid parsemé de taches chaudes, et des pixels à la limite des seuils
+    img = rng.integers(0, 140, size=(180, 240, 3), dtype=np.uint8)
+    hot = rng.random((180, 240)) < 0.15
+    img[hot] = rng.integers(120, 256, size=(int(hot.sum()), 3), dtype=np.uint8)
+    img[40:60, 200:240] = (204, 102, 101)
+    img[0:12, 0:12] = (255, 200, 30)
+    img[-10:, -10:] = (160, 110, 90)
+    return img
+
+
+def clicks(display_shape):
+    h, w = display_shape
+    rng = np.random.default_rng(99)
+    points = [(float(x), float(y)) for x, y in zip(rng.uniform(0, w, 400), rng.uniform(0, h, 400))]
+    # Bords, coins, demi-pixels (arrondi au pair) et clics hors de l'image, y compris très négatifs
+    points += [(0, 0), (w - 1, h - 1), (w, h), (0, h - 1), (w - 1, 0), (0.5, 0.5), (1.5, 2.5),
+               (-1, 5), (5, -1), (-3, -3), (w + 2, 10), (10, h + 2), (w + 50, h + 50),
+               (-20, 10), (10, -20), (-200, -200)]
+    return points
+
+
+@pytest.mark.parametrize("display_shape", [(180, 240), (60, 80), (512, 512)])
+def test_count_many_matches_pixel_loop(thermal, display_shape):
+    detector = DroneDetector(thermal, display_shape)
+    points = clicks(display_shape)
+    xs = np.array([x for x, _ in points])
+    ys = np.array([y for _, y in points])
+    expected = [reference_count(thermal, display_shape, x, y) for x, y in points]
+    assert detector.count_many(xs, ys).tolist() == expected
+    assert detector.detect_many(xs, ys).tolist() == [count >= 5 for count in expected]
+
+
+def test_threshold_is_inclusive(thermal):
+    assert DETECTION_THRESHOLD == 5
+    detector = DroneDetector(thermal, (180, 240))
+    points = clicks((180, 240))
+    counts = detector.count_many(np.array([x for x, _ in points]), np.array([y for _, y in points]))
+    detected = detector.detect_many(np.array([x for x, _ in points]), np.array([y for _, y in points]))
+    # Le jeu de clics contient des comptes juste au seuil et juste en dessous
+    assert detected[counts == DETECTION_THRESHOLD].all() and (counts == DETECTION_THRESHOLD).any()
+    assert not detected[counts == DETECTION_THRESHOLD - 1].any() and (counts == DETECTION_THRESHOLD - 1).any()
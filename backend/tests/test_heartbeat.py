@@ -0,0 +1,79 @@
+"""Battement de cœur : mesure du RTT et délai réservé aux clients qui répondent aux pings"""
+import asyncio
+import json
+import types
+
+import pytest
+
+import heartbeat
+from heartbeat import Heartbeat
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = types.SimpleNamespace(now=1000.0)
+    fake.monotonic = lambda: fake.now
+    monkeypatch.setattr(heartbeat, "time", fake)
+    return fake
+
+
+def ping_id(hb):
+    return json.loads(hb._ping_message())["id"]
+
+
+def test_client_without_pong_never_expires(clock):
+    hb = Heartbeat(interval=15, timeout=45)
+    ping_id(hb)
+    clock.now += 3600
+    assert not hb.armed
+    assert not hb.expired()
+
+
+def test_silence_after_a_pong_expires(clock):
+    hb = Heartbeat(interval=15, timeout=45)
+    hb.pong({"type": "pong", "id": ping_id(hb)})
+    assert hb.armed
+    clock.now += 30
+    assert not hb.expired()
+    hb.touch()
+    clock.now += 46
+    assert hb.expired()
+
+
+def test_unknown_pong_does_not_arm(clock):
+    hb = Heartbeat()
+    hb.pong({"type": "pong", "id": 42})
+    assert not hb.armed and hb.pongs == 0
+
+
+def test_pong_measures_rtt(clock):
+    rtts = []
+    hb = Heartbeat(on_rtt=rtts.append)
+    first = ping_id(hb)
+    clock.now += 0.1
+    hb.pong({"type": "pong", "id": first})
+    second = ping_id(hb)
+    clock.now += 0.2
+    hb.pong({"type": "pong", "id": second})
+    assert hb.rtt_min_s == pytest.approx(0.1)
+    assert hb.rtt_last_s == pytest.approx(0.2)
+    assert rtts == pytest.approx([0.1, 0.12])
+    assert hb.stats()["pongs"] == 2
+
+
+def test_run_keeps_pinging_a_silent_old_client():
+    async def scenario():
+        sent, timeouts = [], []
+
+        async def send_text(text):
+            sent.append(json.loads(text)["type"])
+
+        hb = Heartbeat(interval=0.01, timeout=0.03)
+        task = asyncio.ensure_future(hb.run(send_text, lambda: timeouts.append(True)))
+        await asyncio.sleep(0.15)
+        task.cancel()
+        return sent, timeouts
+
+    sent, timeouts = asyncio.run(scenario())
+    assert len(sent) >= 5 and set(sent) == {"ping"}
+    assert timeouts == []
@@ -0,0 +1,131 @@
+"""Index du lobby : pages, filtres, versions et flux d'événements"""
+import json
+
+from lobby import (
+    STATUS_FULL, STATUS_JOINABLE, STATUS_STARTED, LobbyIndex, page_key, room_status,
+)
+
+
+def ids(page):
+    return [room["room_id"] for room in page["rooms"]]
+
+
+def build_index():
+    index = LobbyIndex()
+    index.update("A1", 1, False, "drone")
+    index.update("A2", 2, False, "drone")
+    index.update("A3", 1, False, "desktop")
+    index.update("A4", 1, True, "drone")
+    index.update("A5", 1, False, "drone")
+    return index
+
+
+def test_room_status():
+    assert room_status(1, False) == STATUS_JOINABLE
+    assert room_status(1, True) == STATUS_STARTED
+    assert room_status(2, False) == room_status(2, True) == STATUS_FULL
+
+
+def test_page_orders_by_status_then_arrival():
+    index = build_index()
+    page = index.page()
+    assert ids(page) == ["A1", "A3", "A5", "A4", "A2"]
+    assert page["total"] == 5
+    assert page["counts"] == {STATUS_JOINABLE: 3, STATUS_STARTED: 1, STATUS_FULL: 1}
+    # Le routeur fusionne les pages des workers avec page_key : même ordre que l'index
+    assert sorted(page["rooms"], key=page_key) == page["rooms"]
+
+
+def test_room_changing_status_goes_to_the_end_of_its_new_status():
+    index = build_index()
+    index.update("A1", 2, False, "drone")
+    assert ids(index.page(status=STATUS_FULL)) == ["A2", "A1"]
+    assert ids(index.page(status=STATUS_JOINABLE)) == ["A3", "A5"]
+
+
+def test_offset_and_limit():
+    index = build_index()
+    assert ids(index.page(offset=1, limit=2)) == ["A3", "A5"]
+    assert ids(index.page(offset=4, limit=10)) == ["A2"]
+    page = index.page(offset=10, limit=10)
+    assert page["rooms"] == [] and page["total"] == 5
+    assert (page["offset"], page["limit"]) == (10, 10)
+
+
+def test_status_and_game_type_filters():
+    index = build_index()
+    assert ids(index.page(status=STATUS_JOINABLE)) == ["A1", "A3", "A5"]
+    drone = index.page(game_type="drone")
+    assert ids(drone) == ["A1", "A5", "A4", "A2"]
+    assert drone["counts"] == {STATUS_JOINABLE: 2, STATUS_STARTED: 1, STATUS_FULL: 1}
+    assert ids(index.page(status=STATUS_JOINABLE, game_type="desktop")) == ["A3"]
+    empty = index.page(status=STATUS_STARTED, game_type="desktop")
+    assert empty["rooms"] == [] and empty["total"] == 0
+
+
+def test_version_and_etag_change_only_with_the_index():
+    index = build_index()
+    version, etag = index.version, index.etag
+    index.update("A1", 1, False, "drone")
+    assert (index.version, index.etag) == (version, etag)
+    index.remove("missing")
+    assert index.version == version
+    index.remove("A1")
+    assert index.version == version + 1
+    assert index.etag != etag
+    assert "A1" not in index and len(index) == 4
+    assert index.counts()[STATUS_JOINABLE] == 2
+
+
+def test_etag_differs_between_processes():
+    assert LobbyIndex().etag != LobbyIndex().etag
+
+
+def test_legacy_body_is_cached_per_version():
+    index = build_index()
+    body = index.legacy_body()
+    assert json.loads(body)["A4"] == {"players": 1, "game_started": True}
+    assert index.legacy_body() is body
+    index.update("A6", 1, False, "drone")
+    assert "A6" in json.loads(index.legacy_body())
+
+
+def test_subscribers_receive_events_for_their_game_type():
+    index = LobbyIndex()
+    everyone = index.subscribe()
+    desktop = index.subscribe("desktop")
+    index.update("R1", 1, False, "drone")
+    index.update("R1", 2, False, "drone")
+    index.update("R1", 2, True, "drone")
+    index.update("R1", 1, True, "drone")
+    index.update("R2", 1, False, "desktop")
+    index.remove("R1")
+    events = [json.loads(everyone.queue.get_nowait()) for _ in range(everyone.queue.qsize())]
+    assert [event["type"] for event in events] == [
+        "room_created", "room_joined", "room_started", "room_left", "room_created", "room_deleted",
+    ]
+    assert [event["version"] for event in events] == list(range(1, 7))
+    assert desktop.queue.qsize() == 1
+    assert json.loads(desktop.queue.get_nowait())["room"]["room_id"] == "R2"
+    index.unsubscribe(everyone)
+    index.update("R3", 1, False, "drone")
+    assert everyone.queue.empty()
+    assert index.subscribers == 1
+
+
+def test_slow_subscriber_is_cut_off():
+    index = LobbyIndex(max_pending=3)
+    subscriber = index.subscribe()
+    for i in range(5):
+        index.update(f"R{i}", 1, False, "drone")
+    assert subscriber.overflowed
+    assert subscriber.queue.qsize() == 1
+    assert subscriber.queue.get_nowait() is None
+
+
+def test_snapshot_filters_by_game_type():
+    index = build_index()
+    snapshot = json.loads(index.snapshot("desktop"))
+    assert snapshot["type"] == "lobby_snapshot"
+    assert snapshot["version"] == index.version
+    assert [room["room_id"] for room in snapshot["rooms"]] == ["A3"]
@@ -0,0 +1,114 @@
+"""File de commandes : fusion des déplacements et contre-pression"""
+import asyncio
+
+import pytest
+
+from pacing import CommandQueue
+
+
+def move(x, y=0):
+    return {"type": "move", "position": {"x": x, "y": y}}
+
+
+def click(x, y=0):
+    return {"type": "click", "x": x, "y": y}
+
+
+async def drain(queue):
+    items = []
+    while len(queue):
+        items.append(await queue.pop(0))
+    return items
+
+
+def test_consecutive_moves_keep_the_last_position():
+    async def scenario():
+        queue = CommandQueue()
+        for x in range(5):
+            await queue.put(move(x))
+        assert len(queue) == 1
+        assert (queue.received, queue.coalesced) == (5, 4)
+        return await drain(queue)
+
+    assert asyncio.run(scenario()) == [move(4)]
+
+
+def test_other_commands_keep_their_order_and_split_moves():
+    async def scenario():
+        queue = CommandQueue()
+        for command in (move(1), move(2), click(3), move(4), move(5), {"type": "mode_change", "mode": 2}, click(6)):
+            await queue.put(command)
+        return await drain(queue)
+
+    assert asyncio.run(scenario()) == [move(2), click(3), move(5), {"type": "mode_change", "mode": 2}, click(6)]
+
+
+def test_full_queue_still_accepts_a_coalescing_move():
+    async def scenario():
+        queue = CommandQueue(max_pending=2)
+        await queue.put(click(1))
+        await queue.put(move(2))
+        assert queue.accepts(move(3))
+        assert not queue.accepts(click(4))
+        await asyncio.wait_for(queue.put(move(3)), 0.1)
+        return await drain(queue)
+
+    assert asyncio.run(scenario()) == [click(1), move(3)]
+
+
+def test_put_waits_for_space_instead_of_dropping():
+    async def scenario():
+        queue = CommandQueue(max_pending=1)
+        await queue.put(click(1))
+        waiting = asyncio.ensure_future(queue.put(click(2)))
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        assert await queue.pop(0) == click(1)
+        await asyncio.wait_for(waiting, 0.1)
+        return await drain(queue)
+
+    assert asyncio.run(scenario()) == [click(2)]
+
+
+def test_wait_space_returns_once_a_command_is_popped():
+    async def scenario():
+        queue = CommandQueue(max_pending=1)
+        await queue.put(click(1))
+        waiting = asyncio.ensure_future(queue.wait_space())
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        await queue.pop(0)
+        await asyncio.wait_for(waiting, 0.1)
+
+    asyncio.run(scenario())
+
+
+def test_pop_times_out_with_none():
+    async def scenario():
+        return await CommandQueue().pop(0.01)
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_fail_is_raised_after_the_queue_drains():
+    async def scenario():
+        queue = CommandQueue()
+        await queue.put(click(1))
+        queue.fail(ConnectionError("closed"))
+        assert await queue.pop(0) == click(1)
+        with pytest.raises(ConnectionError):
+            await queue.pop(1)
+
+    asyncio.run(scenario())
+
+
+def test_fail_wakes_a_waiting_pop():
+    async def scenario():
+        queue = CommandQueue()
+        waiting = asyncio.ensure_future(queue.pop())
+        await asyncio.sleep(0.01)
+        queue.fail(ConnectionError("closed"))
+        with pytest.raises(ConnectionError):
+            await asyncio.wait_for(waiting, 0.1)
+
+    asyncio.run(scenario())
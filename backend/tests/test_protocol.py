@@ -0,0 +1,39 @@
+"""Protocole binaire : aller-retour des frames et des commandes"""
+import json
+
+import pytest
+
+from protocol import (
+    CMD_CLICK, CMD_MOVE, COMMAND, FORMAT_CODES, FORMAT_PNG, FORMAT_WEBP, FRAME_HEADER, FRAME_MOVE, FRAME_STATE,
+    pack_command, pack_frame, unpack_command, unpack_frame,
+)
+
+
+@pytest.mark.parametrize("kind, fmt", [(FRAME_MOVE, FORMAT_WEBP), (FRAME_STATE, FORMAT_PNG)])
+def test_frame_round_trip(kind, fmt):
+    image = bytes(range(256)) * 3
+    data = pack_frame(kind, 2, {"x": 128.5, "y": 0.25}, image, fmt)
+    assert len(data) == FRAME_HEADER.size + len(image)
+    frame = unpack_frame(data)
+    assert frame == {"kind": kind, "player_id": 2, "format": fmt, "position": {"x": 128.5, "y": 0.25}, "image": image}
+
+
+def test_frame_without_player_and_default_format():
+    frame = unpack_frame(pack_frame(FRAME_MOVE, None, {"x": 1, "y": 2}, b""))
+    assert frame["player_id"] == 0
+    assert frame["format"] == FORMAT_CODES["jpeg"]
+    assert frame["image"] == b""
+
+
+def test_commands_match_their_json_form():
+    assert unpack_command(pack_command(CMD_MOVE, 10.5, 20.0)) == {"type": "move", "position": {"x": 10.5, "y": 20.0}}
+    assert unpack_command(pack_command(CMD_CLICK, 3.0, 4.0)) == {"type": "click", "x": 3.0, "y": 4.0}
+    # Même forme que la commande JSON équivalente
+    assert unpack_command(pack_command(CMD_CLICK, 3.0, 4.0)) == json.loads('{"type": "click", "x": 3.0, "y": 4.0}')
+
+
+def test_invalid_commands_are_rejected():
+    with pytest.raises(ValueError):
+        unpack_command(pack_command(CMD_MOVE, 1, 2)[:-1])
+    with pytest.raises(ValueError):
+        unpack_command(COMMAND.pack(99, 1, 2))
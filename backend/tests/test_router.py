@@ -0,0 +1,37 @@
+"""Routeur multi-workers : fusion des métriques Prometheus des workers"""
+from router import label_sample, merge_metrics
+
+WORKER = """# HELP game_rooms Salles existantes
+# TYPE game_rooms gauge
+game_rooms {rooms}
+# HELP command_handling_seconds Temps de traitement d'une commande client
+# TYPE command_handling_seconds histogram
+command_handling_seconds_bucket{{type="move",le="+Inf"}} {rooms}
+command_handling_seconds_sum{{type="move"}} 0.5
+command_handling_seconds_count{{type="move"}} {rooms}
+"""
+
+
+def test_label_sample():
+    assert label_sample("game_rooms 3", "shard-0") == 'game_rooms{node="shard-0"} 3'
+    assert label_sample('frame_seconds_count{format="jpeg"} 7', "shard-1") == \
+        'frame_seconds_count{node="shard-1",format="jpeg"} 7'
+    assert label_sample("up{} 1", "shard-0") == 'up{node="shard-0"} 1'
+
+
+def test_each_family_is_declared_once_with_all_workers():
+    text = merge_metrics([("shard-0", WORKER.format(rooms=2)), ("shard-1", WORKER.format(rooms=5))])
+    lines = text.splitlines()
+    assert lines.count("# TYPE game_rooms gauge") == 1
+    assert lines.count("# TYPE command_handling_seconds histogram") == 1
+    assert lines[:4] == [
+        "# HELP game_rooms Salles existantes",
+        "# TYPE game_rooms gauge",
+        'game_rooms{node="shard-0"} 2',
+        'game_rooms{node="shard-1"} 5',
+    ]
+    assert 'command_handling_seconds_count{node="shard-1",type="move"} 5' in lines
+    # Les échantillons d'une famille restent groupés sous son en-tête
+    assert lines.index('command_handling_seconds_sum{node="shard-1",type="move"} 0.5') > \
+        lines.index("# TYPE command_handling_seconds histogram")
+    assert text.endswith("\n")
@@ -0,0 +1,32 @@
+"""Catalogue des scènes : lecture du manifeste"""
+import json
+
+from scenes import DEFAULT_SCENE, SceneCatalog
+
+
+def write_manifest(tmp_path, manifest):
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps(manifest))
+    return str(path)
+
+
+def test_manifest_scenes_are_listed(tmp_path):
+    path = write_manifest(tmp_path, {"default": "harbor", "scenes": [{"id": "harbor", "name": "Port"}]})
+    catalog = SceneCatalog.from_manifest(path, bundle_dir="")
+    assert catalog.default == "harbor"
+    assert [scene["id"] for scene in catalog.listing()] == [DEFAULT_SCENE, "harbor"]
+    assert catalog.registry("harbor").images_dir == str(tmp_path / "harbor")
+
+
+def test_unknown_default_falls_back_to_the_builtin_scene(tmp_path):
+    path = write_manifest(tmp_path, {"default": "nope", "scenes": [{"id": "harbor"}]})
+    catalog = SceneCatalog.from_manifest(path, bundle_dir="")
+    assert catalog.default == DEFAULT_SCENE
+    assert catalog.resolve(None) == DEFAULT_SCENE
+    assert "harbor" in catalog
+
+
+def test_missing_manifest_keeps_only_the_builtin_scene(tmp_path):
+    catalog = SceneCatalog.from_manifest(str(tmp_path / "missing.json"), bundle_dir="")
+    assert catalog.default == DEFAULT_SCENE
+    assert [scene["id"] for scene in catalog.listing()] == [DEFAULT_SCENE]
@@ -0,0 +1,131 @@
+"""Ordonnanceur : ordre de déclenchement, annulation par clé et compaction du tas"""
+import asyncio
+
+from scheduler import Scheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def run(scenario):
+    async def wrapped():
+        scheduler = Scheduler()
+        try:
+            return await scenario(scheduler)
+        finally:
+            scheduler.stop()
+
+    return asyncio.run(wrapped())
+
+
+def test_timers_fire_in_deadline_order():
+    async def scenario(scheduler):
+        fired = []
+        scheduler.schedule(0.03, fired.append, "c")
+        scheduler.schedule(0.01, fired.append, "a")
+        scheduler.schedule(0.02, fired.append, "b")
+        await asyncio.sleep(0.1)
+        assert (scheduler.pending, scheduler.fired) == (0, 3)
+        return fired
+
+    assert run(scenario) == ["a", "b", "c"]
+
+
+def test_async_callbacks_are_awaited():
+    async def scenario(scheduler):
+        done = asyncio.Event()
+
+        async def callback():
+            done.set()
+
+        scheduler.schedule(0, callback)
+        await asyncio.wait_for(done.wait(), 0.5)
+        await asyncio.sleep(0)
+        assert scheduler.stats()["running_callbacks"] == 0
+
+    run(scenario)
+
+
+def test_cancel_by_key():
+    async def scenario(scheduler):
+        fired = []
+        scheduler.schedule(0.01, fired.append, "room", key=("delete", "r1"))
+        assert scheduler.cancel(("delete", "r1"))
+        assert not scheduler.cancel(("delete", "r1"))
+        assert scheduler.get(("delete", "r1")) is None
+        assert scheduler.pending == 0
+        await asyncio.sleep(0.05)
+        return fired
+
+    assert run(scenario) == []
+
+
+def test_same_key_replaces_the_previous_timer():
+    async def scenario(scheduler):
+        fired = []
+        first = scheduler.schedule(0.01, fired.append, "first", key="alarm")
+        second = scheduler.schedule(0.02, fired.append, "second", key="alarm")
+        assert first.cancelled and not second.cancelled
+        assert scheduler.get("alarm") is second
+        assert scheduler.pending == 1
+        await asyncio.sleep(0.06)
+        assert scheduler.get("alarm") is None
+        return fired
+
+    assert run(scenario) == ["second"]
+
+
+def test_remaining_follows_the_clock():
+    async def scenario(_):
+        clock = FakeClock()
+        scheduler = Scheduler(clock=clock)
+        try:
+            timer = scheduler.schedule(30, print, key="alarm")
+            clock.now += 12
+            assert scheduler.remaining("alarm") == timer.remaining() == 18
+            clock.now += 60
+            assert timer.remaining() == 0
+            assert scheduler.remaining("missing") is None
+        finally:
+            scheduler.stop()
+
+    run(scenario)
+
+
+def test_cancelled_entries_are_compacted():
+    async def scenario(scheduler):
+        timers = [scheduler.schedule(60, print, key=("room", i)) for i in range(200)]
+        assert scheduler.stats()["heap_size"] == 200
+        for timer in timers[:64]:
+            timer.cancel()
+        # Pas encore majoritaires : les entrées annulées restent dans le tas
+        assert scheduler.stats()["heap_size"] == 200
+        for timer in timers[64:101]:
+            timer.cancel()
+        stats = scheduler.stats()
+        assert stats["heap_size"] == 99
+        assert stats["pending"] == 99
+        assert stats["by_kind"] == {"room": 99}
+
+    run(scenario)
+
+
+def test_compaction_keeps_live_timers_firing():
+    async def scenario(scheduler):
+        fired = []
+        timers = [scheduler.schedule(60, print) for _ in range(100)]
+        scheduler.schedule(0.01, fired.append, "live")
+        for timer in timers:
+            timer.cancel()
+        # Compacté au 65e retrait (101 -> 36) ; les 35 suivants restent minoritaires
+        assert scheduler.stats()["heap_size"] == 36
+        assert scheduler.pending == 1
+        await asyncio.sleep(0.05)
+        return fired
+
+    assert run(scenario) == ["live"]
@@ -0,0 +1,66 @@
+"""Hachage cohérent : stabilité de l'affectation des salles aux workers"""
+import pytest
+
+from sharding import HashRing, ShardMembership, format_nodes, parse_nodes
+
+ROOMS = [f"ROOM{i:05d}" for i in range(6000)]
+
+
+def test_owner_is_deterministic():
+    first = HashRing(["shard-0", "shard-1", "shard-2"])
+    second = HashRing(["shard-2", "shard-0", "shard-1"])
+    assert all(first.owner(room) == second.owner(room) for room in ROOMS)
+
+
+def test_rooms_are_spread_over_all_nodes():
+    nodes = ["shard-0", "shard-1", "shard-2"]
+    ring = HashRing(nodes)
+    counts = {node: 0 for node in nodes}
+    for room in ROOMS:
+        counts[ring.owner(room)] += 1
+    for count in counts.values():
+        assert count == pytest.approx(len(ROOMS) / len(nodes), rel=0.25)
+
+
+def test_adding_a_node_only_moves_rooms_to_it():
+    before = HashRing(["shard-0", "shard-1", "shard-2"])
+    after = HashRing(["shard-0", "shard-1", "shard-2", "shard-3"])
+    moved = [room for room in ROOMS if before.owner(room) != after.owner(room)]
+    assert all(after.owner(room) == "shard-3" for room in moved)
+    assert len(moved) / len(ROOMS) == pytest.approx(1 / 4, abs=0.08)
+
+
+def test_removing_a_node_only_moves_its_rooms():
+    before = HashRing(["shard-0", "shard-1", "shard-2"])
+    after = HashRing(["shard-0", "shard-2"])
+    for room in ROOMS:
+        if before.owner(room) != "shard-1":
+            assert after.owner(room) == before.owner(room)
+
+
+def test_empty_ring_is_rejected():
+    with pytest.raises(ValueError):
+        HashRing([])
+
+
+def test_parse_and_format_nodes():
+    spec = "shard-0=127.0.0.1:8101, shard-1=127.0.0.1:8102,"
+    nodes = parse_nodes(spec)
+    assert nodes == {"shard-0": "127.0.0.1:8101", "shard-1": "127.0.0.1:8102"}
+    assert parse_nodes(format_nodes(nodes)) == nodes
+    assert parse_nodes("shard-0,shard-1") == {"shard-0": None, "shard-1": None}
+    assert parse_nodes("") == {}
+
+
+def test_membership_owns_exactly_its_share():
+    spec = "shard-0=127.0.0.1:8101,shard-1=127.0.0.1:8102"
+    members = [ShardMembership(name, spec) for name in ("shard-0", "shard-1")]
+    assert all(member.enabled for member in members)
+    for room in ROOMS[:500]:
+        assert sum(member.owns(room) for member in members) == 1
+
+
+def test_membership_without_sharding_owns_everything():
+    for member in (ShardMembership(None, "shard-0=a,shard-1=b"), ShardMembership("shard-0", "")):
+        assert not member.enabled
+        assert member.owns("ROOM00001")
@@ -0,0 +1,93 @@
+"""Instantanés : format du fichier et restauration de l'état des salles"""
+import asyncio
+import time
+
+import pytest
+
+from snapshot import MAGIC, decode_snapshot, encode_snapshot, read_snapshot, write_snapshot
+
+ROOMS = [
+    {"room_id": "ABC123", "game_state": {"current_player": 2, "game_started": True}, "player_names": {"1": "Ana"}},
+    {"room_id": "XYZ789", "game_state": {"current_player": 1, "game_started": False}, "player_names": {}},
+]
+
+
+def test_encode_decode_round_trip():
+    data = encode_snapshot(ROOMS)
+    assert data.startswith(MAGIC)
+    snapshot = decode_snapshot(data)
+    assert snapshot["rooms"] == ROOMS
+    assert snapshot["saved_at"] == pytest.approx(time.time(), abs=5)
+
+
+def test_decode_rejects_unknown_format():
+    with pytest.raises(ValueError):
+        decode_snapshot(b"{}")
+
+
+def test_write_read_round_trip(tmp_path):
+    path = tmp_path / "state" / "rooms.snapshot"
+    size = write_snapshot(str(path), ROOMS)
+    assert size == path.stat().st_size
+    assert not (tmp_path / "state" / "rooms.snapshot.tmp").exists()
+    assert read_snapshot(str(path))["rooms"] == ROOMS
+
+
+def test_write_replaces_the_previous_snapshot(tmp_path):
+    path = str(tmp_path / "rooms.snapshot")
+    write_snapshot(path, ROOMS)
+    write_snapshot(path, ROOMS[:1])
+    assert read_snapshot(path)["rooms"] == ROOMS[:1]
+
+
+def test_missing_or_corrupt_snapshot_is_ignored(tmp_path):
+    assert read_snapshot(str(tmp_path / "missing.snapshot")) is None
+    bad_magic = tmp_path / "bad_magic.snapshot"
+    bad_magic.write_bytes(b"not a snapshot")
+    assert read_snapshot(str(bad_magic)) is None
+    truncated = tmp_path / "truncated.snapshot"
+    truncated.write_bytes(encode_snapshot(ROOMS)[:-8])
+    assert read_snapshot(str(truncated)) is None
+
+
+def test_game_room_survives_a_restart():
+    import app
+
+    async def scenario():
+        room = app.GameRoom("ROOM01", is_private=True, game_type="desktop")
+        room.game_state["game_started"] = True
+        room.game_state["player1"]["position"] = {"x": 12, "y": 34}
+        room.player_names = {1: "Ana", 2: "Bob"}
+        room.can_see_drone = {1: True, 2: False}
+        room.first_assigned = room.secret_assigned = True
+        room._arm_alarm(90)
+        try:
+            data = decode_snapshot(encode_snapshot([room.to_snapshot()]))["rooms"][0]
+        finally:
+            await room.stop_alarm_timer()
+        restored = app.GameRoom.from_snapshot(data)
+        try:
+            assert restored.room_id == "ROOM01"
+            assert (restored.is_private, restored.solo, restored.game_type) == (True, False, "desktop")
+            assert restored.game_state == room.game_state
+            assert restored.player_names == {1: "Ana", 2: "Bob"}
+            assert restored.can_see_drone == {1: True, 2: False}
+            assert restored.first_assigned and restored.secret_assigned
+            assert restored.alarm_state["active"]
+            assert 88 <= restored.alarm_remaining() <= 90
+        finally:
+            await restored.stop_alarm_timer()
+            app.scheduler.stop()
+
+    asyncio.run(scenario())
+
+
+def test_expired_alarm_is_not_rearmed():
+    import app
+
+    data = app.GameRoom("ROOM02").to_snapshot()
+    data["alarm"] = {"deadline": time.time() - 1, "start_time": None}
+    restored = app.GameRoom.from_snapshot(data)
+    assert not restored.alarm_state["active"]
+    assert restored.alarm_state["timer_task"] is None
+    assert restored.alarm_remaining() == 0
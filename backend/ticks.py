@@ -0,0 +1,224 @@
+"""Boucle de salle à cadence fixe, avec diffusion de l'état par deltas versionnés (optionnelle).
+
+Activée par ROOM_TICK_RATE pour les connexions ouvertes avec ?sync=tick. Leurs 'move' et
+'mode_change' ne font que modifier l'état de la salle ; à chaque tick, l'état publié est
+comparé au précédent et sa version incrémentée s'il a changé. Chaque connexion reçoit alors
+un seul message :
+
+    {"type": "tick", "version": v, "base": b, "changes": {"player2.position": {...}, ...},
+     "image_data": "..."}
+
+`changes` contient les champs modifiés depuis la version b, la dernière que le client a
+acquittée ({"type": "ack", "version": v}) ; la frame n'est jointe que si la vue du joueur
+a changé (en protocole binaire, elle suit le message texte dans un FRAME_STATE). Le travail
+d'une salle est borné quel que soit le débit des commandes : au plus une frame et un
+message par connexion et par tick.
+"""
+import asyncio
+import json
+import time
+from typing import Any, Callable, Dict, Optional
+
+from debuglog import console
+from metrics import ROOM_TICK_OVERRUNS, ROOM_TICK_SECONDS, WEBSOCKET_SEND_SECONDS
+from protocol import FORMAT_CODES, FRAME_STATE, PROTOCOL_BINARY, pack_frame
+
+SYNC_TICK = "tick"
+
+
+def wants_ticks(websocket) -> bool:
+    """Le client demande la synchronisation par ticks dans l'URL de connexion (?sync=tick)"""
+    return websocket.query_params.get("sync", "").lower() == SYNC_TICK
+
+
+def room_fields(room) -> Dict[str, Any]:
+    """État publié de la salle, à plat ("player1.position", "current_player"...) ; les valeurs
+    sont copiées car l'état vivant est modifié en place
+    """
+    fields: Dict[str, Any] = {}
+    for key, value in room.game_state.items():
+        if isinstance(value, dict):
+            for name, item in value.items():
+                fields[f"{key}.{name}"] = dict(item) if isinstance(item, dict) else item
+        else:
+            fields[key] = value
+    fields["names"] = {str(pid): name for pid, name in room.player_names.items()}
+    fields["alarm_active"] = room.alarm_state["active"]
+    return fields
+
+
+class VersionedState:
+    """Dernier état publié : chaque champ garde la version à laquelle il a changé"""
+
+    def __init__(self):
+        self.version = 0
+        self._fields: Dict[str, tuple] = {}
+
+    def update(self, fields: Dict[str, Any]) -> bool:
+        """Publie un nouvel état ; la version n'augmente que si un champ a changé"""
+        changed = [key for key, value in fields.items()
+                   if key not in self._fields or self._fields[key][1] != value]
+        if not changed:
+            return False
+        self.version += 1
+        for key in changed:
+            self._fields[key] = (self.version, fields[key])
+        return True
+
+    def delta(self, since: int) -> Dict[str, Any]:
+        """Champs modifiés après la version `since` (tout l'état pour since=0)"""
+        return {key: value for key, (version, value) in self._fields.items() if version > since}
+
+
+class TickClient:
+    __slots__ = ("websocket", "player_id", "protocol", "renderer", "acked", "sent", "view_key", "failures")
+
+    def __init__(self, websocket, player_id: int, protocol: str, renderer, version: int, view_key=None):
+        self.websocket = websocket
+        self.player_id = player_id
+        self.protocol = protocol
+        self.renderer = renderer
+        # Dernière version acquittée par le client (base des deltas) et dernière version envoyée
+        self.acked = version
+        self.sent = version
+        # Clé de la dernière frame envoyée : une nouvelle frame n'est rendue que si elle change
+        self.view_key = view_key
+        self.failures = 0
+
+    def ack(self, version) -> None:
+        if isinstance(version, int) and self.acked < version <= self.sent:
+            self.acked = version
+
+
+class RoomTicker:
+    """Boucle de tick d'une salle ; démarre avec sa première connexion et s'arrête avec la dernière"""
+
+    def __init__(self, room, rate: float, send_timeout: float = 2.0, max_failures: int = 3,
+                 on_frame: Optional[Callable] = None):
+        self.room = room
+        self.interval = 1.0 / rate
+        self.send_timeout = send_timeout
+        self.max_failures = max_failures
+        # Appelé pour chaque frame envoyée (ex. partage avec les spectateurs)
+        self.on_frame = on_frame
+        self.state = VersionedState()
+        self.clients: Dict[Any, TickClient] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.ticks = 0
+        self.overruns = 0
+        self.messages = 0
+        self.frames = 0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+
+    def __len__(self) -> int:
+        return len(self.clients)
+
+    def add(self, websocket, player_id: int, protocol: str, renderer) -> TickClient:
+        """Inscrit une connexion qui vient de recevoir l'état complet et sa frame"""
+        self.state.update(room_fields(self.room))
+        mode = self.room.game_state[f"player{player_id}"]["mode"]
+        client = self.clients[websocket] = TickClient(
+            websocket, player_id, protocol, renderer, self.state.version,
+            self.room.frame_key(player_id, mode, renderer.size))
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+        return client
+
+    def remove(self, websocket) -> None:
+        self.clients.pop(websocket, None)
+        if not self.clients and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def run(self) -> None:
+        deadline = time.monotonic()
+        while True:
+            deadline += self.interval
+            delay = deadline - time.monotonic()
+            if delay < 0:
+                # Tick trop long : repartir de maintenant plutôt qu'enchaîner les ticks en retard
+                self.overruns += 1
+                ROOM_TICK_OVERRUNS.inc()
+                deadline = time.monotonic()
+                delay = 0
+            await asyncio.sleep(delay)
+            try:
+                await self.tick()
+            except Exception as e:
+                # Un tick en échec ne doit pas arrêter la salle : le suivant repart de l'état courant
+                console(f"❌ Tick de la salle {self.room.room_id} en échec: {e!r}")
+
+    async def tick(self) -> None:
+        started = time.perf_counter()
+        self.ticks += 1
+        self.state.update(room_fields(self.room))
+        clients = list(self.clients.values())
+        results = await asyncio.gather(*(self._send(client) for client in clients), return_exceptions=True)
+        for client, result in zip(clients, results):
+            if isinstance(result, BaseException):
+                client.failures += 1
+                if client.failures >= self.max_failures:
+                    self.remove(client.websocket)
+                    self.room.evict_connection(client.websocket)
+            else:
+                client.failures = 0
+        elapsed = time.perf_counter() - started
+        ROOM_TICK_SECONDS.observe(elapsed)
+        self.last_ms = elapsed * 1000.0
+        self.max_ms = max(self.max_ms, self.last_ms)
+
+    def _changes(self, since: int, scale: float) -> Dict[str, Any]:
+        changes = self.state.delta(since)
+        if scale != 1.0:
+            for key, value in changes.items():
+                if key.endswith(".position"):
+                    changes[key] = {"x": value["x"] * scale, "y": value["y"] * scale}
+        return changes
+
+    async def _send(self, client: TickClient) -> None:
+        """Message consolidé du tick pour une connexion (rien si ni l'état ni sa vue n'ont changé)"""
+        room = self.room
+        renderer = client.renderer
+        player = room.game_state[f"player{client.player_id}"]
+        key = room.frame_key(client.player_id, player["mode"], renderer.size)
+        image = await renderer.render(key) if key != client.view_key else None
+        version = self.state.version
+        if version == client.sent and image is None:
+            return
+        message = {"type": "tick", "version": version, "base": client.acked,
+                   "changes": self._changes(client.acked, renderer.scale)}
+        position = {"x": player["position"]["x"] * renderer.scale, "y": player["position"]["y"] * renderer.scale}
+        fmt = renderer.params.format
+        if image is not None and client.protocol != PROTOCOL_BINARY:
+            message["image_data"] = room._to_data_url(image, fmt)
+            message["frame_size"] = renderer.size
+        started = time.perf_counter()
+        await asyncio.wait_for(client.websocket.send_text(json.dumps(message)), self.send_timeout)
+        if image is not None and client.protocol == PROTOCOL_BINARY:
+            await asyncio.wait_for(client.websocket.send_bytes(
+                pack_frame(FRAME_STATE, client.player_id, position, image, FORMAT_CODES[fmt])), self.send_timeout)
+        client.sent = version
+        self.messages += 1
+        if image is not None:
+            elapsed = time.perf_counter() - started
+            WEBSOCKET_SEND_SECONDS.observe(elapsed, client.protocol)
+            renderer.record_send(elapsed)
+            client.view_key = key
+            self.frames += 1
+            if self.on_frame is not None:
+                self.on_frame(room, client.player_id, position, image, renderer)
+
+    def stats(self) -> Dict:
+        return {
+            "rate_hz": round(1.0 / self.interval, 2),
+            "version": self.state.version,
+            "connections": len(self.clients),
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "messages": self.messages,
+            "frames": self.frames,
+            "last_tick_ms": round(self.last_ms, 2),
+            "max_tick_ms": round(self.max_ms, 2),
+            "acked": {str(c.player_id): c.acked for c in self.clients.values()},
+        }
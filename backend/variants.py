@@ -0,0 +1,264 @@
+"""Variantes redimensionnées et recompressées des images statiques, générées à la demande.
+
+    GET /variants/images/os-x-mountain-lion-3840x2160-24066.jpg?w=1920&v=<version>
+
+La largeur demandée est arrondie au palier de VARIANT_WIDTHS qui la couvre (jamais plus
+large que l'original). Sans `format`, le meilleur format accepté par le navigateur (en-tête
+Accept : AVIF, puis WebP, sinon JPEG ou PNG pour les images transparentes) est choisi.
+Les variantes sont écrites dans un cache disque borné (VARIANT_CACHE_MB) : les moins
+récemment servies sont supprimées. L'ETag dérive de la source (taille, date) et des
+réglages ; une URL qui porte la version courante de la source (`v`, voir
+VariantStore.url) peut être mise en cache indéfiniment par le navigateur.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Sequence
+from urllib.parse import quote, urlencode
+
+from PIL import Image, ImageOps, features
+
+from assets import IMAGES_DIR, ROOT_DIR
+from debuglog import console
+
+VARIANT_CACHE_DIR = os.getenv('VARIANT_CACHE_DIR', os.path.join(ROOT_DIR, 'data', 'variants'))
+VARIANT_CACHE_MB = float(os.getenv('VARIANT_CACHE_MB', '256'))
+VARIANT_WIDTHS = tuple(sorted(int(w) for w in os.getenv('VARIANT_WIDTHS', '320,640,960,1280,1920,2560,3840').split(',')
+                              if w.strip()))
+VARIANT_QUALITY = int(os.getenv('VARIANT_QUALITY', '80'))
+
+# Répertoires servis (même contenu que les montages /images et /static/assets)
+VARIANT_ROOTS = {
+    "images": IMAGES_DIR,
+    "assets": os.path.join(IMAGES_DIR, "assets"),
+}
+
+SOURCE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+# Format -> (nom PIL, type MIME, extension)
+VARIANT_FORMATS = {
+    "avif": ("AVIF", "image/avif", ".avif"),
+    "webp": ("WEBP", "image/webp", ".webp"),
+    "jpeg": ("JPEG", "image/jpeg", ".jpg"),
+    "png": ("PNG", "image/png", ".png"),
+}
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def supported_formats() -> Sequence[str]:
+    formats = ["jpeg", "png"]
+    for fmt in ("webp", "avif"):
+        try:
+            if features.check(fmt):
+                formats.append(fmt)
+        except ValueError:
+            # Pillow trop ancien pour connaître ce format
+            pass
+    return formats
+
+
+class SourceInfo(NamedTuple):
+    version: str
+    width: int
+    height: int
+    alpha: bool
+    format: str
+
+
+class Variant(NamedTuple):
+    path: str
+    etag: str
+    media_type: str
+    version: str
+
+
+class VariantStore:
+    """Génère les variantes hors de la boucle d'événements et les garde dans un cache disque LRU"""
+
+    def __init__(self, roots: Dict[str, str] = VARIANT_ROOTS, cache_dir: str = VARIANT_CACHE_DIR,
+                 max_mb: float = VARIANT_CACHE_MB, widths: Sequence[int] = VARIANT_WIDTHS,
+                 quality: int = VARIANT_QUALITY):
+        self.roots = {name: os.path.realpath(path) for name, path in roots.items()}
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.widths = tuple(widths)
+        self.quality = quality
+        self.formats = supported_formats()
+        # Fichier en cache -> taille, du moins au plus récemment servi
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._sources: Dict[str, SourceInfo] = {}
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._scanned = False
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generate_ms = 0.0
+
+    def source_path(self, root: str, relpath: str) -> str:
+        """Chemin de l'image source ; FileNotFoundError si elle n'existe pas ou sort du répertoire servi"""
+        base = self.roots.get(root)
+        if base is None or not relpath.lower().endswith(SOURCE_EXTENSIONS):
+            raise FileNotFoundError(relpath)
+        path = os.path.realpath(os.path.join(base, relpath))
+        if not path.startswith(base + os.sep) or not os.path.isfile(path):
+            raise FileNotFoundError(relpath)
+        return path
+
+    def source_info(self, path: str) -> SourceInfo:
+        """Dimensions et version de la source (relues seulement si le fichier a changé)"""
+        st = os.stat(path)
+        version = hashlib.sha1(f"{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()[:12]
+        info = self._sources.get(path)
+        if info is None or info.version != version:
+            with Image.open(path) as img:
+                alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+                width, height = img.size
+                # Orientation EXIF : la variante est redressée, ses dimensions aussi
+                if img.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+                    width, height = height, width
+                info = self._sources[path] = SourceInfo(version, width, height, alpha, (img.format or "").lower())
+        return info
+
+    def snap_width(self, requested: int, original: int) -> int:
+        """Palier couvrant la largeur demandée, sans jamais agrandir l'original (0 = original)"""
+        if requested <= 0:
+            return original
+        return min(original, next((w for w in self.widths if w >= requested), original))
+
+    def choose_format(self, requested: Optional[str], accept: Optional[str], alpha: bool) -> str:
+        if requested:
+            fmt = "jpeg" if requested.lower() == "jpg" else requested.lower()
+            if fmt not in self.formats:
+                raise ValueError(f"Format non disponible: {requested}")
+            return fmt
+        accept = accept or ""
+        for fmt in ("avif", "webp"):
+            if fmt in self.formats and f"image/{fmt}" in accept:
+                return fmt
+        return "png" if alpha else "jpeg"
+
+    def url(self, root: str, relpath: str, width: int = 0, fmt: Optional[str] = None) -> str:
+        """URL (relative) d'une variante, versionnée : servie avec un cache immuable"""
+        info = self.source_info(self.source_path(root, relpath))
+        query = {"v": info.version}
+        if width:
+            query["w"] = self.snap_width(width, info.width)
+        if fmt:
+            query["format"] = fmt
+        return f"/variants/{root}/{quote(relpath)}?{urlencode(query)}"
+
+    async def get(self, root: str, relpath: str, width: int = 0, fmt: Optional[str] = None,
+                  accept: Optional[str] = None) -> Variant:
+        """Variante prête à servir (générée au premier appel, un seul rendu par variante en cours)"""
+        source = self.source_path(root, relpath)
+        loop = asyncio.get_running_loop()
+        info = await loop.run_in_executor(None, self.source_info, source)
+        width = self.snap_width(width, info.width)
+        fmt = self.choose_format(fmt, accept, info.alpha)
+        key = hashlib.sha1(f"{root}/{relpath}|{info.version}|{width}|{fmt}|{self.quality}".encode()).hexdigest()[:24]
+        variant = Variant(os.path.join(self.cache_dir, key + VARIANT_FORMATS[fmt][2]), f'"{key}"',
+                          VARIANT_FORMATS[fmt][1], info.version)
+        if width == info.width and fmt == info.format:
+            # Rien à gagner : l'original est servi tel quel
+            return variant._replace(path=source)
+        if self._hit(variant.path):
+            return variant
+        pending = self._inflight.get(key)
+        if pending is None:
+            pending = self._inflight[key] = loop.run_in_executor(None, self._generate, source, variant.path, width, fmt)
+            pending.add_done_callback(lambda _: self._inflight.pop(key, None))
+        await asyncio.shield(pending)
+        return variant
+
+    def _hit(self, path: str) -> bool:
+        with self._lock:
+            if not self._scanned:
+                self._scan()
+            name = os.path.basename(path)
+            if os.path.exists(path):
+                if name in self._index:
+                    self._index.move_to_end(name)
+                else:
+                    # Générée par un autre worker depuis le dernier parcours
+                    self._index[name] = os.path.getsize(path)
+                    self.nbytes += self._index[name]
+                self.hits += 1
+                return True
+            self.nbytes -= self._index.pop(name, 0)
+            self.misses += 1
+            return False
+
+    def _scan(self) -> None:
+        """Reprend les variantes déjà sur disque (redémarrage, autres workers), les plus anciennes d'abord"""
+        self._scanned = True
+        try:
+            entries = [entry for entry in os.scandir(self.cache_dir) if entry.is_file() and not entry.name.endswith(".tmp")]
+        except FileNotFoundError:
+            return
+        for entry in sorted(entries, key=lambda e: e.stat().st_mtime):
+            size = entry.stat().st_size
+            self._index[entry.name] = size
+            self.nbytes += size
+        self._evict()
+
+    def _generate(self, source: str, target: str, width: int, fmt: str) -> None:
+        started = time.perf_counter()
+        with Image.open(source) as img:
+            if img.format == "JPEG":
+                # Décodage JPEG directement à une échelle réduite quand c'est possible
+                img.draft("RGB", (width, width * img.height // img.width))
+            img = ImageOps.exif_transpose(img)
+            if img.width > width:
+                img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+            if fmt == "jpeg":
+                img = img.convert("RGB")
+            elif img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "transparency" in img.info or img.mode in ("LA", "PA") else "RGB")
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+            options = {"optimize": True} if fmt == "png" else {"quality": self.quality}
+            if fmt == "jpeg":
+                options.update(optimize=True, progressive=True)
+            elif fmt == "webp":
+                options["method"] = 4
+            img.save(tmp, format=VARIANT_FORMATS[fmt][0], **options)
+        os.replace(tmp, target)
+        size = os.path.getsize(target)
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        with self._lock:
+            self.generate_ms += elapsed_ms
+            name = os.path.basename(target)
+            self.nbytes += size - self._index.pop(name, 0)
+            self._index[name] = size
+            self._evict()
+        console(f"🖼️ Variante {os.path.basename(source)} {width}px {fmt} générée en {elapsed_ms:.0f} ms ({size / 1e3:.0f} Ko)")
+
+    def _evict(self) -> None:
+        while self.nbytes > self.max_bytes and len(self._index) > 1:
+            name, size = self._index.popitem(last=False)
+            self.nbytes -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "cache_dir": self.cache_dir,
+                "entries": len(self._index),
+                "nbytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "generating": len(self._inflight),
+                "generate_ms_total": round(self.generate_ms, 1),
+                "widths": list(self.widths),
+                "formats": list(self.formats),
+            }
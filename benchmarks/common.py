@@ -0,0 +1,146 @@
+"""Outils partagés des benchmarks : statistiques, ressources du processus, export JSON."""
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT_DIR, "backend")
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+
+# Les modules du backend s'importent par leur nom (lancement depuis backend/)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def percentile(sorted_values: Sequence[float], p: float) -> float:
+    """Percentile par interpolation linéaire sur des valeurs déjà triées"""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * p / 100.0
+    lo = int(rank)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (rank - lo)
+
+
+def summarize_ms(samples_s: Sequence[float]) -> Dict[str, float]:
+    """Résumé (ms) d'une série de durées en secondes"""
+    values = sorted(s * 1000.0 for s in samples_s)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values), 4),
+        "min_ms": round(values[0], 4),
+        "p50_ms": round(percentile(values, 50), 4),
+        "p95_ms": round(percentile(values, 95), 4),
+        "p99_ms": round(percentile(values, 99), 4),
+        "max_ms": round(values[-1], 4),
+    }
+
+
+def cpu_seconds(pid: Optional[int] = None) -> float:
+    """Temps CPU (user + system) d'un processus ; le processus courant par défaut"""
+    if pid is None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_utime + usage.ru_stime
+    # /proc/<pid>/stat : utime et stime en ticks, champs 14 et 15 (après le nom entre parenthèses)
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def rss_bytes(pid: Optional[int] = None) -> int:
+    """Mémoire résidente actuelle (Linux), ou le pic connu à défaut de /proc"""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en octets sur macOS, en Ko ailleurs
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class ResourceProbe:
+    """Mesure le CPU consommé et la mémoire d'un processus entre start() et stop()"""
+
+    def __init__(self, pid: Optional[int] = None):
+        self.pid = pid
+        self._cpu0 = 0.0
+        self._wall0 = 0.0
+        self.rss_start = 0
+        self.rss_peak = 0
+
+    def start(self) -> None:
+        self._cpu0 = cpu_seconds(self.pid)
+        self._wall0 = time.perf_counter()
+        self.rss_start = self.rss_peak = rss_bytes(self.pid)
+
+    def sample(self) -> None:
+        self.rss_peak = max(self.rss_peak, rss_bytes(self.pid))
+
+    def stop(self) -> Dict[str, float]:
+        self.sample()
+        cpu = cpu_seconds(self.pid) - self._cpu0
+        wall = time.perf_counter() - self._wall0
+        return {
+            "cpu_s": round(cpu, 3),
+            "cpu_percent": round(100.0 * cpu / wall, 1) if wall > 0 else 0.0,
+            "rss_start_mb": round(self.rss_start / 1e6, 1),
+            "rss_peak_mb": round(self.rss_peak / 1e6, 1),
+        }
+
+
+def environment() -> Dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "env": {k: v for k, v in os.environ.items()
+                if k.startswith(("FRAME_", "RENDER_", "COMMAND_", "BROADCAST_", "DEBUG_"))},
+    }
+
+
+def save_results(kind: str, results: Dict, output: Optional[str] = None) -> str:
+    """Écrit les résultats en JSON (benchmarks/results/<kind>-<date>.json par défaut)"""
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{kind}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    payload = {"kind": kind, "created_at": datetime.now().isoformat(), "environment": environment(), **results}
+    with open(output, "w") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+    return output
+
+
+def _flatten(prefix: str, value, out: Dict[str, float]) -> None:
+    if isinstance(value, dict):
+        for key, sub in value.items():
+            _flatten(f"{prefix}.{key}" if prefix else key, sub, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = float(value)
+
+
+def compare(baseline_path: str, results: Dict, threshold: float = 10.0) -> List[str]:
+    """Lignes de comparaison avec un run précédent ; '!' marque un écart > threshold %"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    before: Dict[str, float] = {}
+    after: Dict[str, float] = {}
+    _flatten("", baseline.get("results", {}), before)
+    _flatten("", results.get("results", {}), after)
+    lines = []
+    for name in sorted(before.keys() & after.keys()):
+        old, new = before[name], after[name]
+        if old == 0:
+            continue
+        delta = 100.0 * (new - old) / old
+        flag = "!" if abs(delta) > threshold else " "
+        lines.append(f"{flag} {name:<60} {old:>12.3f} -> {new:>12.3f} ({delta:+.1f}%)")
+    return lines
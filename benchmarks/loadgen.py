@@ -0,0 +1,306 @@
+"""Générateur de charge local : N salles, deux joueurs simulés par salle.
+
+    python benchmarks/loadgen.py --spawn --rooms 20 --duration 30
+    python benchmarks/loadgen.py --url http://127.0.0.1:8000 --server-pid 1234 --rooms 50
+    python benchmarks/loadgen.py --spawn --protocol binary --format webp --compare <run.json>
+
+Les salles sont créées par l'API REST, puis chaque joueur ouvre /ws/{room_id} et rejoue
+un flux réaliste : déplacements de la loupe en marche aléatoire au rythme --rate, clics
+et changements de mode occasionnels. La latence d'une frame est mesurée entre la plus
+ancienne commande restée sans réponse (move ou mode_change) et la frame reçue ensuite :
+les déplacements fusionnés par le serveur sont donc comptés depuis le premier.
+
+Avec --spawn, un serveur `uvicorn app:app` est lancé sur un port libre et son CPU/RSS
+est mesuré ; sinon --server-pid permet de mesurer un serveur déjà démarré (Linux).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import websockets
+
+import common
+from common import ResourceProbe, compare, save_results, summarize_ms
+
+from protocol import CMD_CLICK, CMD_MOVE, pack_command
+
+DISPLAY_SIZE = 512.0
+
+
+class PlayerStats:
+    def __init__(self):
+        self.sent: Dict[str, int] = {"move": 0, "click": 0, "mode_change": 0}
+        self.frames = 0
+        self.frame_bytes = 0
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.disconnected = False
+
+
+class SimulatedPlayer:
+    """Un joueur : envoie des commandes au rythme demandé et mesure les frames reçues"""
+
+    def __init__(self, ws_url: str, args, rng: random.Random):
+        self.ws_url = ws_url
+        self.args = args
+        self.rng = rng
+        self.stats = PlayerStats()
+        self.binary = args.protocol == "binary"
+        # Coordonnées dans l'espace des frames demandé (?size=)
+        self.extent = float(args.size or DISPLAY_SIZE)
+        self.x = rng.uniform(0, self.extent)
+        self.y = rng.uniform(0, self.extent)
+        self.mode = "NVG"
+        # Instant d'envoi de la plus ancienne commande attendant une frame
+        self.awaiting_since: Optional[float] = None
+
+    async def run(self, stop_at: float, ready: asyncio.Event) -> None:
+        try:
+            async with websockets.connect(self.ws_url, max_size=None, ping_interval=None) as ws:
+                await ws.recv()  # état initial
+                ready.set()
+                receiver = asyncio.create_task(self._receive(ws))
+                try:
+                    await self._send(ws, stop_at)
+                    # Laisser arriver les dernières frames
+                    await asyncio.sleep(0.2)
+                finally:
+                    receiver.cancel()
+        except (OSError, websockets.exceptions.WebSocketException):
+            self.stats.disconnected = True
+            ready.set()
+
+    async def _send(self, ws, stop_at: float) -> None:
+        interval = 1.0 / self.args.rate
+        args, rng = self.args, self.rng
+        while time.perf_counter() < stop_at:
+            # Arrivées de Poisson : un flux humain n'est pas parfaitement régulier
+            await asyncio.sleep(rng.expovariate(1.0 / interval))
+            roll = rng.random()
+            if roll < args.mode_change_ratio:
+                self.mode = "THERMAL" if self.mode == "NVG" else "NVG"
+                await self._send_json(ws, {"type": "mode_change", "mode": self.mode}, "mode_change")
+            elif roll < args.mode_change_ratio + args.click_ratio:
+                if self.binary:
+                    await ws.send(pack_command(CMD_CLICK, self.x, self.y))
+                else:
+                    await ws.send(json.dumps({"type": "click", "x": self.x, "y": self.y}))
+                self.stats.sent["click"] += 1
+            else:
+                self.x = min(self.extent, max(0.0, self.x + rng.gauss(0, args.step)))
+                self.y = min(self.extent, max(0.0, self.y + rng.gauss(0, args.step)))
+                if self.awaiting_since is None:
+                    self.awaiting_since = time.perf_counter()
+                if self.binary:
+                    await ws.send(pack_command(CMD_MOVE, self.x, self.y))
+                else:
+                    await ws.send(json.dumps({"type": "move", "position": {"x": self.x, "y": self.y}}))
+                self.stats.sent["move"] += 1
+
+    async def _send_json(self, ws, message: Dict, kind: str) -> None:
+        if self.awaiting_since is None:
+            self.awaiting_since = time.perf_counter()
+        await ws.send(json.dumps(message))
+        self.stats.sent[kind] += 1
+
+    async def _receive(self, ws) -> None:
+        try:
+            async for message in ws:
+                if isinstance(message, bytes):
+                    self._frame_received(len(message))
+                    continue
+                data = json.loads(message)
+                if data.get("type") in ("frame", "game_state"):
+                    # En binaire, game_state arrive sans image : la frame suit dans un message binaire
+                    if "image_data" in data:
+                        self._frame_received(len(data["image_data"]))
+                elif data.get("type") == "ping":
+                    await ws.send(json.dumps({"type": "pong", "id": data.get("id")}))
+        except websockets.exceptions.ConnectionClosed:
+            self.stats.disconnected = True
+        except Exception:
+            self.stats.errors += 1
+
+    def _frame_received(self, size: int) -> None:
+        self.stats.frames += 1
+        self.stats.frame_bytes += size
+        if self.awaiting_since is not None:
+            self.stats.latencies.append(time.perf_counter() - self.awaiting_since)
+            self.awaiting_since = None
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn_server(port: int) -> subprocess.Popen:
+    # Toutes les salles sont créées depuis la même adresse : pas de limite de cadence de création
+    env = dict(os.environ, SNAPSHOT_PATH="", BACKEND_URL=f"http://127.0.0.1:{port}", ROOM_CREATE_PER_MINUTE="0")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=common.BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            await client.get("/")
+            return
+        except httpx.HTTPError:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Le serveur ne répond pas")
+            await asyncio.sleep(0.2)
+
+
+async def sample_resources(probes: List[ResourceProbe], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        for probe in probes:
+            probe.sample()
+        try:
+            await asyncio.wait_for(stop.wait(), 0.5)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_load(args, base_url: str, server_pid: Optional[int]) -> Dict:
+    rng = random.Random(args.seed)
+    ws_base = base_url.replace("http", "ws", 1)
+    query = (f"?protocol={args.protocol}" + (f"&format={args.format}" if args.format else "")
+             + (f"&size={args.size}" if args.size else ""))
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=10.0) as client:
+        await wait_ready(client)
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(client.post("/rooms", json={}) for _ in range(args.rooms)))
+        room_ids = [r.json()["room_id"] for r in responses]
+        create_s = time.perf_counter() - started
+
+        players = [SimulatedPlayer(f"{ws_base}/ws/{room_id}{query}", args, random.Random(rng.random()))
+                   for room_id in room_ids for _ in range(2)]
+        probes = [ResourceProbe()] + ([ResourceProbe(server_pid)] if server_pid else [])
+        for probe in probes:
+            probe.start()
+        sampler_stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_resources(probes, sampler_stop))
+
+        # Le joueur 1 doit être assigné avant le joueur 2 : connexions par paire, salles en parallèle
+        connect_started = time.perf_counter()
+        stop_at = connect_started + args.duration
+
+        async def play_room(first: SimulatedPlayer, second: SimulatedPlayer) -> None:
+            ready = asyncio.Event()
+            first_task = asyncio.create_task(first.run(stop_at, ready))
+            await ready.wait()
+            await asyncio.gather(first_task, second.run(stop_at, asyncio.Event()))
+
+        await asyncio.gather(*(play_room(first, second) for first, second in zip(players[::2], players[1::2])))
+        elapsed = time.perf_counter() - connect_started
+
+        sampler_stop.set()
+        await sampler
+        client_resources = probes[0].stop()
+        server_resources = probes[1].stop() if server_pid else None
+        try:
+            frame_cache = (await client.get("/frames/cache")).json()
+        except (httpx.HTTPError, ValueError):
+            frame_cache = None
+
+    latencies = [lat for p in players for lat in p.stats.latencies]
+    frames = sum(p.stats.frames for p in players)
+    sent: Dict[str, int] = {}
+    for p in players:
+        for kind, count in p.stats.sent.items():
+            sent[kind] = sent.get(kind, 0) + count
+    return {
+        "config": {
+            "rooms": args.rooms, "players": len(players), "duration_s": args.duration, "rate": args.rate,
+            "click_ratio": args.click_ratio, "mode_change_ratio": args.mode_change_ratio,
+            "protocol": args.protocol, "format": args.format or "jpeg", "size": args.size or DISPLAY_SIZE,
+            "seed": args.seed,
+        },
+        "results": {
+            "room_creation_s": round(create_s, 3),
+            "frames": frames,
+            "frames_per_s": round(frames / elapsed, 1),
+            "frame_mbytes_per_s": round(sum(p.stats.frame_bytes for p in players) / elapsed / 1e6, 2),
+            "commands_per_s": round(sum(sent.values()) / elapsed, 1),
+            "frame_latency": summarize_ms(latencies),
+            "client": client_resources,
+            **({"server": server_resources} if server_resources else {}),
+        },
+        "commands_sent": sent,
+        "disconnected_players": sum(p.stats.disconnected for p in players),
+        "receive_errors": sum(p.stats.errors for p in players),
+        "frame_cache": frame_cache,
+    }
+
+
+def print_summary(run: Dict) -> None:
+    results = run["results"]
+    latency = results["frame_latency"]
+    print(f"Salles: {run['config']['rooms']}  joueurs: {run['config']['players']}  "
+          f"commandes/s: {results['commands_per_s']}  déconnexions: {run['disconnected_players']}")
+    print(f"Frames/s: {results['frames_per_s']}  ({results['frame_mbytes_per_s']} Mo/s)")
+    if latency.get("count"):
+        print(f"Latence frame: p50 {latency['p50_ms']:.1f} ms  p95 {latency['p95_ms']:.1f} ms  "
+              f"p99 {latency['p99_ms']:.1f} ms  max {latency['max_ms']:.1f} ms")
+    for side in ("client", "server"):
+        if side in results:
+            r = results[side]
+            print(f"{side:>7}: CPU {r['cpu_percent']}%  RSS {r['rss_start_mb']} -> {r['rss_peak_mb']} Mo")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Générateur de charge WebSocket du backend")
+    parser.add_argument("--url", default=os.getenv("BACKEND_URL", "http://127.0.0.1:8000"))
+    parser.add_argument("--spawn", action="store_true", help="Lancer un serveur dédié sur un port libre")
+    parser.add_argument("--server-pid", type=int, help="PID du serveur à mesurer (sans --spawn)")
+    parser.add_argument("--rooms", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=20.0, help="Durée du flux de commandes (s)")
+    parser.add_argument("--rate", type=float, default=30.0, help="Commandes par seconde et par joueur")
+    parser.add_argument("--click-ratio", type=float, default=0.05)
+    parser.add_argument("--mode-change-ratio", type=float, default=0.02)
+    parser.add_argument("--step", type=float, default=6.0, help="Écart-type d'un déplacement (px)")
+    parser.add_argument("--protocol", choices=("json", "binary"), default="json")
+    parser.add_argument("--format", choices=("jpeg", "webp", "png"))
+    parser.add_argument("--size", type=int, help="Taille des frames demandée (niveau de pyramide : 256, 512, 1024)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Fichier JSON de sortie (benchmarks/results/ par défaut)")
+    parser.add_argument("--compare", help="Résultats JSON d'un run précédent à comparer")
+    args = parser.parse_args()
+
+    server = None
+    base_url, server_pid = args.url.rstrip("/"), args.server_pid
+    if args.spawn:
+        port = free_port()
+        server = spawn_server(port)
+        base_url, server_pid = f"http://127.0.0.1:{port}", server.pid
+    try:
+        run = asyncio.run(run_load(args, base_url, server_pid))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    print_summary(run)
+    path = save_results("load", run, args.output)
+    print(f"Résultats écrits dans {os.path.relpath(path)}")
+    if args.compare:
+        print("\n".join(compare(args.compare, run)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""Microbenchmarks du chemin critique des salles.
+
+    python benchmarks/micro.py                       # toutes les mesures
+    python benchmarks/micro.py --only render --iterations 500
+    python benchmarks/micro.py --compare benchmarks/results/micro-20250101-120000.json
+
+render mesure FrameRenderer.render, le chemin des connexions (exécuteur direct) : à froid
+(cache de frames vidé avant chaque appel : composition + encodage) et à chaud (frame servie
+par le cache), pour chaque mode, position de la loupe et variante de visibilité du drone.
+encode mesure encoders.encode seul, pour chaque format disponible.
+"""
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import time
+from typing import Callable, Dict, Optional
+
+from common import ResourceProbe, compare, save_results, summarize_ms  # ajoute aussi backend/ au chemin d'import
+
+import app as backend
+from assets import AssetRegistry, asset_registry
+from encoders import DEFAULT_PARAMS, LOSSY_FORMATS, available_formats, encode
+from render import EXECUTOR_INLINE, FrameRenderer, RenderExecutor, compose_frame
+
+LENS_POSITIONS = {
+    "center": (256.0, 256.0),
+    "corner": (8.0, 8.0),
+    "edge": (504.0, 256.0),
+}
+
+
+def measure(fn: Callable[[], object], iterations: int, warmup: int = 5,
+            setup: Optional[Callable[[], None]] = None) -> Dict[str, float]:
+    """Exécute fn `iterations` fois (setup non chronométré) et résume les durées"""
+    for _ in range(warmup):
+        if setup is not None:
+            setup()
+        fn()
+    samples = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(iterations):
+            if setup is not None:
+                setup()
+            started = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - started)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    summary = summarize_ms(samples)
+    total = sum(samples)
+    summary["ops_per_s"] = round(len(samples) / total, 1) if total > 0 else 0.0
+    return summary
+
+
+def make_room(mode: str, position, can_see_drone: bool = True, solo: bool = False) -> "backend.GameRoom":
+    room = backend.GameRoom(f"bench-{mode}", solo=solo)
+    room.can_see_drone[1] = can_see_drone
+    player = room.game_state["player1"]
+    player["mode"] = mode
+    player["position"] = {"x": position[0], "y": position[1]}
+    return room
+
+
+def hottest_click():
+    """Position d'affichage où le détecteur trouve le plus de pixels chauds (clic gagnant)"""
+    import numpy as np
+    detector = asset_registry.detector("thermal")
+    ys, xs = np.mgrid[0:512:2, 0:512:2]
+    counts = detector.count_many(xs.ravel(), ys.ravel())
+    best = int(counts.argmax())
+    return float(xs.ravel()[best]), float(ys.ravel()[best])
+
+
+def bench_load_images(iterations: int) -> Dict:
+    room = backend.GameRoom("bench-load")
+    # Chaque appel prend une référence sur la scène : la rendre avant le suivant
+    results = {"shared": measure(room.load_images, iterations, setup=room.release_scene)}
+    room.release_scene()
+    # Chargement à froid sans paquet : décodage PNG + redimensionnement
+    results["cold_decode"] = measure(lambda: AssetRegistry(bundle_path="").get(), max(1, iterations // 50), warmup=0)
+    # Chargement à froid depuis le paquet compilé (mmap), le cas par défaut en production
+    results["cold_bundle"] = measure(lambda: AssetRegistry().get(), max(1, iterations // 10), warmup=1)
+    return results
+
+
+def bench_render(iterations: int) -> Dict:
+    variants = {}
+    for position_name, position in LENS_POSITIONS.items():
+        variants[f"NVG/{position_name}"] = make_room("NVG", position)
+        variants[f"THERMAL/{position_name}/drone"] = make_room("THERMAL", position, can_see_drone=True)
+        variants[f"THERMAL/{position_name}/nodrone"] = make_room("THERMAL", position, can_see_drone=False)
+    variants["THERMAL/center/solo"] = make_room("THERMAL", LENS_POSITIONS["center"], can_see_drone=False, solo=True)
+
+    loop = asyncio.new_event_loop()
+    renderer = FrameRenderer(RenderExecutor(EXECUTOR_INLINE), backend.frame_cache)
+    results = {}
+    try:
+        for name, room in variants.items():
+            key = room.frame_key(1, room.game_state["player1"]["mode"])
+            call = lambda key=key: loop.run_until_complete(renderer.render(key))
+            results[name] = {
+                "cold": measure(call, iterations, setup=backend.frame_cache.clear),
+                "warm": measure(call, iterations * 4),
+            }
+    finally:
+        loop.close()
+    return results
+
+
+def bench_encode(iterations: int) -> Dict:
+    results = {}
+    for mode in ("NVG", "THERMAL"):
+        room = make_room(mode, LENS_POSITIONS["center"])
+        img = compose_frame(room.images, room.frame_key(1, mode))
+        for fmt in available_formats():
+            params = DEFAULT_PARAMS._replace(format=fmt)
+            name = f"{mode}/{fmt}"
+            # PNG (sans perte) reste bien plus lent que les formats avec perte : moins d'itérations
+            runs = iterations if fmt in LOSSY_FORMATS else max(1, iterations // 10)
+            results[name] = measure(lambda img=img, params=params: encode(img, params), runs, warmup=min(5, runs))
+            results[name]["bytes"] = len(encode(img, params))
+    return results
+
+
+def bench_check_drone_detection(iterations: int) -> Dict:
+    hit = hottest_click()
+    cases = {
+        "hit": ("THERMAL", hit, True),
+        "miss": ("THERMAL", (5.0, 5.0), True),
+        "out_of_bounds": ("THERMAL", (-40.0, 900.0), True),
+        "not_thermal": ("NVG", hit, True),
+        "cannot_see": ("THERMAL", hit, False),
+    }
+    results = {}
+    for name, (mode, position, can_see) in cases.items():
+        room = make_room(mode, position, can_see_drone=can_see)
+        x, y = position
+        results[name] = measure(lambda room=room, x=x, y=y: room.check_drone_detection(1, x, y), iterations * 10)
+        results[name]["detected"] = bool(room.check_drone_detection(1, x, y))
+    return results
+
+
+BENCHMARKS = {
+    "load_images": bench_load_images,
+    "render": bench_render,
+    "encode": bench_encode,
+    "check_drone_detection": bench_check_drone_detection,
+}
+
+
+def print_results(results: Dict, indent: str = "") -> None:
+    for name, value in results.items():
+        if isinstance(value, dict) and "p50_ms" in value:
+            print(f"{indent}{name:<34} p50 {value['p50_ms']:>9.3f} ms  p95 {value['p95_ms']:>9.3f} ms"
+                  f"  p99 {value['p99_ms']:>9.3f} ms  {value['ops_per_s']:>10.1f} ops/s")
+        elif isinstance(value, dict):
+            print(f"{indent}{name}")
+            print_results(value, indent + "  ")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks de GameRoom")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--only", choices=sorted(BENCHMARKS), action="append")
+    parser.add_argument("--output", help="Fichier JSON de sortie (benchmarks/results/ par défaut)")
+    parser.add_argument("--compare", help="Résultats JSON d'un run précédent à comparer")
+    args = parser.parse_args()
+
+    asset_registry.get()
+    asset_registry.detector("thermal")
+    probe = ResourceProbe()
+    probe.start()
+    results = {}
+    for name in args.only or BENCHMARKS:
+        print(f"▶ {name}")
+        results[name] = BENCHMARKS[name](args.iterations)
+        print_results(results[name], "  ")
+    run = {"results": results, "resources": probe.stop(), "iterations": args.iterations}
+    backend.log_writer.flush()
+
+    path = save_results("micro", run, args.output)
+    print(f"Résultats écrits dans {os.path.relpath(path)}")
+    if args.compare:
+        print("\n".join(compare(args.compare, run)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
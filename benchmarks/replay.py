@@ -0,0 +1,196 @@
+"""Rejoue hors ligne des journaux de commandes (RECORD_DIR) à travers la logique de GameRoom.
+
+    python benchmarks/replay.py data/recordings/session-*.wsrec            # vitesse maximale
+    python benchmarks/replay.py journal.wsrec --speed 1                     # temps réel
+    python benchmarks/replay.py journal.wsrec --compare benchmarks/results/replay-<date>.json
+
+Chaque salle enregistrée est recréée ; les déplacements et changements de mode rendent
+une frame (composition + encodage, avec le cache de frames), les clics passent par la
+détection du drone. Le rapport donne les frames rendues, l'issue des détections et le
+temps de traitement par type de commande. Aucun socket n'est ouvert : les diffusions aux
+salles n'ont pas de destinataire.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from common import ResourceProbe, compare, save_results, summarize_ms  # ajoute aussi backend/ au chemin d'import
+
+import app as backend
+from encoders import EncodeParams
+from frame_cache import FrameCache
+from recorder import KIND_CLICK, KIND_JOIN, KIND_LEAVE, KIND_MOVE, KIND_ROOM, read_events
+from render import FrameRenderer, RenderExecutor
+
+
+class Replay:
+    def __init__(self, args):
+        self.args = args
+        self.executor = RenderExecutor(args.executor)
+        self.cache = FrameCache(max_bytes=int(args.cache_mb * 1024 * 1024), grid=backend.FRAME_CACHE_GRID)
+        self.rooms: Dict[str, backend.GameRoom] = {}
+        self.renderers: Dict[tuple, FrameRenderer] = {}
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+        self.frames = 0
+        self.frame_bytes = 0
+        self.detections = {"hit": 0, "miss": 0}
+        self.events = 0
+        self.lag: List[float] = []
+
+    def _renderer(self, room_id: str, player_id: int) -> FrameRenderer:
+        renderer = self.renderers.get((room_id, player_id))
+        if renderer is None:
+            # Joueur déjà connecté au début de l'enregistrement : réglages par défaut
+            renderer = self.renderers[(room_id, player_id)] = FrameRenderer(self.executor, self.cache)
+        return renderer
+
+    async def _frame(self, room: "backend.GameRoom", player_id: int) -> None:
+        renderer = self._renderer(room.room_id, player_id)
+        mode = room.game_state[f"player{player_id}"]["mode"]
+        data = await renderer.render(room.frame_key(player_id, mode, renderer.size))
+        self.frames += 1
+        self.frame_bytes += len(data)
+
+    async def apply(self, event) -> None:
+        """Même effet sur la salle que la commande correspondante dans websocket_endpoint"""
+        if event.kind == KIND_ROOM:
+            info = event.data
+            if info["room_id"] not in self.rooms:
+                self.rooms[info["room_id"]] = backend.GameRoom(
+                    info["room_id"], is_private=info["is_private"], solo=info["solo"], game_type=info["game_type"],
+                    scene_id=info.get("scene_id"))
+            return
+        room = self.rooms[event.room_id]
+        player_id = event.player_id
+        if event.kind == KIND_JOIN:
+            params = EncodeParams(**event.data.get("params", {}))
+            self.renderers[(room.room_id, player_id)] = FrameRenderer(
+                self.executor, self.cache, backend.RENDER_MAX_INFLIGHT,
+                backend.AdaptiveQuality(params, min_quality=backend.FRAME_MIN_QUALITY), size=event.data["size"])
+            room.can_see_drone.setdefault(player_id, True)
+            if room.game_type != "desktop":
+                await self._frame(room, player_id)
+            return
+        if event.kind == KIND_LEAVE:
+            self.renderers.pop((room.room_id, player_id), None)
+            return
+
+        started = time.perf_counter()
+        player = room.game_state[f"player{player_id}"]
+        scale = self._renderer(room.room_id, player_id).scale
+        if event.kind == KIND_MOVE:
+            kind = "move"
+            player["position"] = backend.from_client_position(event.data["x"], event.data["y"], scale)
+            if room.game_type != "desktop":
+                await self._frame(room, player_id)
+        elif event.kind == KIND_CLICK:
+            kind = "click"
+            click = backend.from_client_position(event.data["x"], event.data["y"], scale)
+            hit = room.game_type != "desktop" and room.register_click(player_id, click["x"], click["y"])
+            self.detections["hit" if hit else "miss"] += 1
+        else:
+            command = event.data
+            kind = backend.command_label(command.get("type"), backend.KNOWN_COMMANDS)
+            if kind == "mode_change" and room.game_type != "desktop":
+                player["mode"] = command.get("mode", player["mode"])
+                await self._frame(room, player_id)
+            elif kind == "set_name":
+                room.player_names[player_id] = str(command.get("name", "")).strip()[:32]
+            elif kind == "switch_player":
+                room.game_state["current_player"] = 2 if room.game_state["current_player"] == 1 else 1
+            elif kind == "trigger_alarm":
+                await room.start_alarm_timer()
+            elif kind == "stop_alarm":
+                await room.stop_alarm_timer()
+        self.timings[kind].append(time.perf_counter() - started)
+
+    async def run(self, paths: List[str]) -> Dict:
+        self.executor.start()
+        speed = self.args.speed
+        try:
+            for path in paths:
+                origin = time.perf_counter()
+                first_t = None
+                for event in read_events(path):
+                    if self.args.room and event.kind != KIND_ROOM and event.room_id not in self.args.room:
+                        continue
+                    if speed > 0:
+                        # Temps réel (ou accéléré) : attendre l'instant enregistré. `t` part du
+                        # démarrage de l'enregistreur ; l'inactivité avant le premier événement n'est pas rejouée
+                        if first_t is None:
+                            first_t = event.t
+                        due = origin + (event.t - first_t) / speed
+                        delay = due - time.perf_counter()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                        else:
+                            self.lag.append(-delay)
+                    self.events += 1
+                    await self.apply(event)
+        finally:
+            self.executor.shutdown()
+        return self.report()
+
+    def report(self) -> Dict:
+        total = sum(sum(samples) for samples in self.timings.values())
+        results = {
+            "events": self.events,
+            "rooms": len(self.rooms),
+            "frames": self.frames,
+            "frame_kb": round(self.frame_bytes / 1024.0, 1),
+            "detections": dict(self.detections),
+            "commands": {kind: summarize_ms(samples) for kind, samples in sorted(self.timings.items())},
+            "processing_s": round(total, 3),
+            "frame_cache": self.cache.stats(),
+        }
+        if self.args.speed > 0:
+            results["lag"] = summarize_ms(self.lag)
+        return results
+
+
+def print_report(results: Dict) -> None:
+    print(f"Événements: {results['events']}  salles: {results['rooms']}  frames: {results['frames']} "
+          f"({results['frame_kb']} Ko)")
+    print(f"Détections: {results['detections']['hit']} réussies, {results['detections']['miss']} manquées")
+    for kind, summary in results["commands"].items():
+        if summary.get("count"):
+            print(f"  {kind:<16} n={summary['count']:<6} p50 {summary['p50_ms']:.3f} ms  "
+                  f"p95 {summary['p95_ms']:.3f} ms  max {summary['max_ms']:.3f} ms")
+    if "lag" in results and results["lag"].get("count"):
+        print(f"Retard sur le temps réel: p95 {results['lag']['p95_ms']:.1f} ms  max {results['lag']['max_ms']:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rejoue des journaux de commandes à travers GameRoom")
+    parser.add_argument("logs", nargs="+", help="Fichiers .wsrec (RECORD_DIR)")
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = temps réel, 2 = deux fois plus vite, 0 = maximum")
+    parser.add_argument("--room", action="append", help="Ne rejouer que cette salle (répétable)")
+    parser.add_argument("--executor", default="inline", choices=("inline", "thread", "process"))
+    parser.add_argument("--cache-mb", type=float, default=backend.FRAME_CACHE_MB, help="0 = sans cache de frames")
+    parser.add_argument("--output", help="Fichier JSON de sortie (benchmarks/results/ par défaut)")
+    parser.add_argument("--compare", help="Résultats JSON d'un run précédent à comparer")
+    args = parser.parse_args()
+
+    backend.scene_catalog.preload()
+    probe = ResourceProbe()
+    probe.start()
+    started = time.perf_counter()
+    results = asyncio.run(Replay(args).run(args.logs))
+    results["wall_s"] = round(time.perf_counter() - started, 3)
+    run = {"results": results, "resources": probe.stop(), "logs": [os.path.basename(p) for p in args.logs],
+           "speed": args.speed}
+    backend.log_writer.flush()
+
+    print_report(results)
+    path = save_results("replay", run, args.output)
+    print(f"Résultats écrits dans {os.path.relpath(path)}")
+    if args.compare:
+        print("\n".join(compare(args.compare, run)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
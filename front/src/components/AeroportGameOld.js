@@ -492,6 +492,11 @@ function GameEmbed({ roomId, playerName, onGameComplete, droneFound = false }) {
       try {
         const data = JSON.parse(event.data);
         
+        // Battement de cœur du serveur : répondre pour ne pas être considéré comme déconnecté
+        if (data.type === 'ping') {
+          ws.send(JSON.stringify({ type: 'pong', id: data.id }));
+          return;
+        }
         if (data.type === 'game_state') {
           setGameState(data.game_state);
           setPlayerId(data.player_id);
@@ -57,7 +57,9 @@ function DesktopGameEmbedContent({ roomId, playerName, onBack }) {
     if (!roomId) return;
     
     const backendUrl = process.env.REACT_APP_BACKEND_URL || 'ws://localhost:8000';
-    const ws = new WebSocket(`${backendUrl}/ws/${roomId}`);
+    // Largeur de l'écran en pixels physiques : le serveur répond avec un fond d'écran à cette taille
+    const viewport = Math.round(window.innerWidth * (window.devicePixelRatio || 1));
+    const ws = new WebSocket(`${backendUrl}/ws/${roomId}?viewport=${viewport}`);
     
     ws.onopen = () => {
       setWsConnection(ws);
@@ -68,6 +70,15 @@ function DesktopGameEmbedContent({ roomId, playerName, onBack }) {
     ws.onmessage = (event) => {
       const msg = JSON.parse(event.data);
 
+      // Battement de cœur du serveur : répondre pour ne pas être considéré comme déconnecté
+      if (msg.type === "ping") {
+        ws.send(JSON.stringify({ type: "pong", id: msg.id }));
+        return;
+      }
+      if (msg.type === "desktop_wallpaper" && msg.url) {
+        setWallpaper(msg.url);
+        return;
+      }
       if (msg.type === "alarm_state") {
         const active = !!msg.active;
         setAlertActive(active);
@@ -18,7 +18,8 @@ function GameEmbed({ roomId, playerName, onGameComplete, droneFound = false }) {
 
   useEffect(() => {
     const API_BASE_URL = BACKEND_WS_BASE;
-    const ws = new WebSocket(`${API_BASE_URL}/ws/${roomId}`);
+    // sync=tick : si le serveur a une boucle de tick, l'état arrive en deltas (ignoré sinon)
+    const ws = new WebSocket(`${API_BASE_URL}/ws/${roomId}?sync=tick`);
     wsRef.current = ws;
 
     ws.onopen = () => {
@@ -34,6 +35,11 @@ function GameEmbed({ roomId, playerName, onGameComplete, droneFound = false }) {
       try {
         const data = JSON.parse(event.data);
         
+        // Battement de cœur du serveur : répondre pour ne pas être considéré comme déconnecté
+        if (data.type === 'ping') {
+          ws.send(JSON.stringify({ type: 'pong', id: data.id }));
+          return;
+        }
         if (data.type === 'game_state') {
           setGameState(data.game_state);
           setPlayerId(data.player_id);
@@ -49,6 +55,24 @@ function GameEmbed({ roomId, playerName, onGameComplete, droneFound = false }) {
             }
           }));
           setMousePosition({ x: data.position.x, y: data.position.y });
+        } else if (data.type === 'tick') {
+          // Champs modifiés depuis la dernière version acquittée ("player2.position", "current_player"...)
+          setGameState(prev => {
+            const next = { ...prev };
+            Object.entries(data.changes || {}).forEach(([path, value]) => {
+              const [key, field] = path.split('.');
+              if (field) {
+                next[key] = { ...(next[key] || {}), [field]: value };
+              } else {
+                next[key] = value;
+              }
+            });
+            return next;
+          });
+          const own = (data.changes || {})[`player${playerIdRef.current}.position`];
+          if (own) setMousePosition({ x: own.x, y: own.y });
+          if (data.image_data) setImageData(data.image_data);
+          ws.send(JSON.stringify({ type: 'ack', version: data.version }));
         } else if (data.type === 'drone_detected') {
           // Seul le joueur qui a trouvé le drone voit l'image
           if (data.player_id === playerIdRef.current) {
@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
 
-import { BACKEND_HTTP_BASE } from '../config';
+import { BACKEND_HTTP_BASE, BACKEND_WS_BASE } from '../config';
 
 const API_BASE_URL = BACKEND_HTTP_BASE;
 
@@ -23,6 +23,12 @@ const Lobby = () => {
   }, [playerName]);
 
   useEffect(() => {
+    // Flux du lobby (instantané puis événements) ; polling de secours si la WebSocket est indisponible
+    let ws = null;
+    let interval = null;
+    let reconnect = null;
+    let closed = false;
+
     const fetchRooms = async () => {
       try {
         const res = await axios.get(`${API_BASE_URL}/rooms`);
@@ -31,9 +37,59 @@ const Lobby = () => {
         // ignore lobby polling errors
       }
     };
-    fetchRooms();
-    const interval = setInterval(fetchRooms, 2000);
-    return () => clearInterval(interval);
+
+    const startPolling = () => {
+      if (interval) return;
+      fetchRooms();
+      interval = setInterval(fetchRooms, 2000);
+    };
+
+    const connect = () => {
+      try {
+        ws = new WebSocket(`${BACKEND_WS_BASE}/lobby/ws`);
+      } catch (e) {
+        startPolling();
+        return;
+      }
+      ws.onmessage = (event) => {
+        const msg = JSON.parse(event.data);
+        if (msg.type === 'lobby_snapshot') {
+          if (interval) {
+            clearInterval(interval);
+            interval = null;
+          }
+          const next = {};
+          msg.rooms.forEach((room) => {
+            next[room.room_id] = { players: room.players, game_started: room.game_started };
+          });
+          setRooms(next);
+        } else if (msg.type === 'room_deleted') {
+          setRooms((prev) => {
+            const next = { ...prev };
+            delete next[msg.room.room_id];
+            return next;
+          });
+        } else if (msg.room) {
+          setRooms((prev) => ({
+            ...prev,
+            [msg.room.room_id]: { players: msg.room.players, game_started: msg.room.game_started },
+          }));
+        }
+      };
+      ws.onclose = () => {
+        if (closed) return;
+        startPolling();
+        reconnect = setTimeout(connect, 5000);
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      if (ws) ws.close();
+      if (interval) clearInterval(interval);
+      if (reconnect) clearTimeout(reconnect);
+    };
   }, []);
 
   const confirmJoin = async () => {
@@ -68,6 +124,10 @@ const Lobby = () => {
       navigate(`/aeroport/${id}`); // Toujours aller vers aeroport
     } catch (error) {
       console.error('Erreur lors de la création de la salle:', error);
+      // 429 / 503 : serveur saturé, le message indique de réessayer plus tard
+      if (error.response && (error.response.status === 429 || error.response.status === 503)) {
+        setError('Serveur saturé, réessayez dans quelques instants');
+      }
     }
   };
 
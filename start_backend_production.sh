@@ -0,0 +1,16 @@
+#!/bin/bash
+
+# Script pour démarrer le backend en production (plusieurs workers + routeur)
+echo "🚀 Démarrage du backend multi-processus..."
+
+# Activer l'environnement virtuel si il existe
+if [ -d "venv" ]; then
+    echo "📦 Activation de l'environnement virtuel..."
+    source venv/bin/activate
+fi
+
+# Nombre de workers (par défaut: nombre de CPU)
+WORKERS=${BACKEND_WORKERS:-$(nproc 2>/dev/null || echo 2)}
+
+echo "🌐 Routeur sur http://localhost:${BACKEND_PORT:-8000} avec $WORKERS workers"
+python backend/launcher.py --workers "$WORKERS"